@@ -16,10 +16,13 @@ const ChatPage = ({ apiBaseUrl = "ws://localhost:8000" }) => {
     const [currentUser, setCurrentUser] = useState('');
     const [currentUserId, setCurrentUserId] = useState('');
     const [onlineCount, setOnlineCount] = useState(0);
+    const [olderCursor, setOlderCursor] = useState(null);
+    const [loadingOlder, setLoadingOlder] = useState(false);
 
     const pathName = usePathname();
     const groupId = pathName.split('/')[2];
     const messagesEndRef = useRef(null);
+    const skipScrollRef = useRef(false);
     const websocketRef = useRef(null);
     const reconnectTimeoutRef = useRef(null);
     const reconnectAttempts = useRef(0);
@@ -59,7 +62,7 @@ const ChatPage = ({ apiBaseUrl = "ws://localhost:8000" }) => {
                 throw new Error(`HTTP ${res.status}: ${res.statusText}`);
             }
             
-            const history = await res.json();
+            const { items: history, next } = await res.json();
             const transformed = history.map((msg, i) => ({
                 id: msg.id || i + 1,
                 userId: msg.user,
@@ -69,6 +72,7 @@ const ChatPage = ({ apiBaseUrl = "ws://localhost:8000" }) => {
                 isCurrentUser: msg.user === currentUserId,
             }));
             setMessages(transformed);
+            setOlderCursor(next);
             setConnectionError(null);
             console.log('Message history loaded:', transformed.length, 'messages'); // Debug log
         } catch (err) {
@@ -79,6 +83,42 @@ const ChatPage = ({ apiBaseUrl = "ws://localhost:8000" }) => {
         }
     }, [apiBaseUrl, groupId, currentUserId]);
 
+    // Page further back through history, keyed on the oldest message shown
+    const loadOlderMessages = useCallback(async () => {
+        if (!groupId || !olderCursor || loadingOlder) return;
+
+        try {
+            setLoadingOlder(true);
+            const httpUrl = apiBaseUrl.replace('ws://', 'http://').replace('wss://', 'https://');
+            const res = await fetch(`${httpUrl}/chat/history/${groupId}?before=${encodeURIComponent(olderCursor)}`, {
+                headers: {
+                    'x-api-key': process.env.NEXT_PUBLIC_CHAT_API_KEY || '',
+                },
+            });
+
+            if (!res.ok) {
+                throw new Error(`HTTP ${res.status}: ${res.statusText}`);
+            }
+
+            const { items: history, next } = await res.json();
+            const older = history.map((msg) => ({
+                id: msg.id,
+                userId: msg.user,
+                username: msg.username,
+                message: msg.message,
+                timestamp: msg.timestamp,
+                isCurrentUser: msg.user === currentUserId,
+            }));
+            skipScrollRef.current = true;
+            setMessages((prev) => [...older, ...prev.filter(m => !older.some(o => o.id === m.id))]);
+            setOlderCursor(next);
+        } catch (err) {
+            console.error('Error fetching older messages:', err);
+        } finally {
+            setLoadingOlder(false);
+        }
+    }, [apiBaseUrl, groupId, currentUserId, olderCursor, loadingOlder]);
+
     // Fetch online members
     const fetchOnlineMembers = useCallback(async () => {
         if (!groupId) return;
@@ -120,6 +160,10 @@ const ChatPage = ({ apiBaseUrl = "ws://localhost:8000" }) => {
                 console.log('WebSocket connected'); // Debug log
                 setIsConnected(true);
                 setConnectionError(null);
+                // Messages sent while we were away (or evicted as a slow client)
+                if (reconnectAttempts.current > 0) {
+                    fetchMessageHistory();
+                }
                 reconnectAttempts.current = 0;
                 fetchOnlineMembers();
                 
@@ -163,6 +207,10 @@ const ChatPage = ({ apiBaseUrl = "ws://localhost:8000" }) => {
                     } else if (data.type === 'online_count') {
                         console.log('Updating online count:', data.count); // Debug log
                         setOnlineCount(data.count);
+                    } else if (data.type === 'error') {
+                        setConnectionError(data.error === 'message_too_long'
+                            ? `Messages can be at most ${data.maxLength} characters.`
+                            : data.error);
                     } else {
                         // Handle legacy format or unknown types
                         console.log('Unknown message type or legacy format:', data);
@@ -175,6 +223,12 @@ const ChatPage = ({ apiBaseUrl = "ws://localhost:8000" }) => {
             websocketRef.current.onclose = (e) => {
                 console.log('WebSocket closed:', e.code, e.reason); // Debug log
                 setIsConnected(false);
+
+                // 1008: the server doesn't know us as a member; retrying won't help
+                if (e.code === 1008) {
+                    setConnectionError('You are not a member of this group.');
+                    return;
+                }
                 
                 // Only attempt reconnection if it wasn't a clean close and we haven't exceeded max attempts
                 if (e.code !== 1000 && reconnectAttempts.current < maxReconnectAttempts) {
@@ -198,7 +252,7 @@ const ChatPage = ({ apiBaseUrl = "ws://localhost:8000" }) => {
             console.error('Failed to create WebSocket:', err);
             setConnectionError('Failed to connect to server: ' + err.message);
         }
-    }, [apiBaseUrl, groupId, currentUserId, currentUser, fetchOnlineMembers]);
+    }, [apiBaseUrl, groupId, currentUserId, currentUser, fetchOnlineMembers, fetchMessageHistory]);
 
     // Init
     useEffect(() => {
@@ -219,6 +273,11 @@ const ChatPage = ({ apiBaseUrl = "ws://localhost:8000" }) => {
     }, [groupId, currentUser, currentUserId, fetchMessageHistory, connectWebSocket]);
 
     useEffect(() => {
+        // Keep the reader where they are when older messages are prepended
+        if (skipScrollRef.current) {
+            skipScrollRef.current = false;
+            return;
+        }
         messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
     }, [messages]);
 
@@ -402,6 +461,17 @@ const ChatPage = ({ apiBaseUrl = "ws://localhost:8000" }) => {
 
             {/* Messages Container */}
             <div className="flex-1 overflow-y-auto p-4 space-y-4">
+                {olderCursor && (
+                    <div className="flex justify-center">
+                        <button
+                            onClick={loadOlderMessages}
+                            disabled={loadingOlder}
+                            className="text-sm text-orange-600 underline hover:no-underline disabled:opacity-50"
+                        >
+                            {loadingOlder ? 'Loading...' : 'Load older messages'}
+                        </button>
+                    </div>
+                )}
                 {messages.map((message) => (
                     <div
                         key={message.id}
@@ -496,6 +566,7 @@ const ChatPage = ({ apiBaseUrl = "ws://localhost:8000" }) => {
                                 value={newMessage}
                                 onChange={(e) => setNewMessage(e.target.value)}
                                 onKeyPress={handleKeyPress}
+                                maxLength={1000}
                                 placeholder={isConnected ? "Type a message..." : "Connecting..."}
                                 rows={1}
                                 disabled={!isConnected}
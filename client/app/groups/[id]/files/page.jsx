@@ -1,6 +1,6 @@
 'use client';
 
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { usePathname } from 'next/navigation';
 import { 
   Search, 
@@ -33,6 +33,8 @@ import {
   TooltipTrigger,
 } from "@/components/ui/tooltip";
 import { Button } from "@/components/ui/button";
+import { fetchPage } from '@/utils/pagination';
+import LoadMore from '@/components/LoadMore';
 import { Input } from "@/components/ui/input";
 import { Label } from "@/components/ui/label";
 
@@ -46,6 +48,10 @@ const FilePage = () => {
   const [uploadDialog, setUploadDialog] = useState(false);
   const [selectedFiles, setSelectedFiles] = useState([]);
   const [uploading, setUploading] = useState(false);
+  const [loadMoreFiles, setLoadMoreFiles] = useState(null); // Next page of files, if any
+  // Bumped by every new listing, so a page still loading for the previous
+  // one isn't added to this one
+  const fetchRun = useRef(0);
 
   // Get file type from content type
   const getFileTypeFromContentType = (contentType) => {
@@ -67,55 +73,68 @@ const FilePage = () => {
     return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
   };
 
-  // Fetch files using the backend API
+  // Thumbnail served (and cached by the browser) from the previews endpoint
+  const previewUrl = (fileId) => {
+    const backendUrl = process.env.NEXT_PUBLIC_API_BACKEND_URL || 'http://localhost:8000';
+    const currentUserId = localStorage.getItem('userId');
+    return `${backendUrl}/file/preview/${fileId}?userId=${encodeURIComponent(currentUserId)}`;
+  };
+
+  // Fetch files using the backend API, one page at a time
   const fetchFiles = async (searchQuery = '') => {
+    const run = ++fetchRun.current;
     try {
-      const backendUrl = process.env.NEXT_PUBLIC_API_BACKEND_URL || 'http://localhost:8000';
-      
-      // Use the correct endpoint with query parameter
-      const url = `${backendUrl}/file/${groupId}?name=${encodeURIComponent(searchQuery)}`;
-      
-      const response = await fetch(url, {
-        headers: {
-          'x-api-key': process.env.NEXT_PUBLIC_FILE_API_KEY || '',
-          'Content-Type': 'application/json',
-        }
-      });
-
-      if (response.ok) {
-        const data = await response.json();
-        // Map the backend response to frontend format
-        const mappedFiles = data.map(file => ({
-          id: file.file_id,
-          fileName: file.name,
-          fileType: getFileTypeFromContentType(file.contentType),
-          fileSize: formatFileSize(file.size),
-          uploadDate: new Date(file.uploadedAt).toLocaleDateString(),
-          uploadedBy: file.uploadedBy,
-          contentType: file.contentType,
-          pinned: file.pinned
-        }));
-        
-        // Sort files: pinned files first, then by upload date (newest first)
-        mappedFiles.sort((a, b) => {
-          if (a.pinned && !b.pinned) return -1;
-          if (!a.pinned && b.pinned) return 1;
-          return new Date(b.uploadDate) - new Date(a.uploadDate);
-        });
-        
-        setFiles(mappedFiles);
-      } else {
-        console.error('Failed to fetch files');
-        setFiles([]);
-      }
+      await loadFiles(searchQuery, null, run);
     } catch (error) {
       console.error('Error fetching files:', error);
       setFiles([]);
+      setLoadMoreFiles(null);
     } finally {
       setLoading(false);
     }
   };
 
+  // The first page replaces the list, later ones add to it
+  const loadFiles = async (searchQuery, cursor, run) => {
+    const backendUrl = process.env.NEXT_PUBLIC_API_BACKEND_URL || 'http://localhost:8000';
+    
+    // Use the correct endpoint with query parameter
+    const url = `${backendUrl}/file/${groupId}?name=${encodeURIComponent(searchQuery)}`;
+
+    const { response, items: fetchedFiles, next } = await fetchPage(url, {
+      headers: {
+        'x-api-key': process.env.NEXT_PUBLIC_FILE_API_KEY || '',
+        'Content-Type': 'application/json',
+      }
+    }, cursor);
+
+    if (!response.ok) {
+      throw new Error('Failed to fetch files');
+    }
+    if (run !== fetchRun.current) return;
+
+    // Map the backend response to frontend format
+    const mappedFiles = fetchedFiles.map(file => ({
+      id: file.file_id,
+      fileName: file.name,
+      fileType: getFileTypeFromContentType(file.contentType),
+      fileSize: formatFileSize(file.size),
+      uploadDate: new Date(file.uploadedAt).toLocaleDateString(),
+      uploadedBy: file.uploadedBy,
+      contentType: file.contentType,
+      pinned: file.pinned,
+      hasPreview: file.hasPreview
+    }));
+    
+    // Sort files: pinned files first, then by upload date (newest first)
+    setFiles(previous => (cursor ? [...previous, ...mappedFiles] : mappedFiles).sort((a, b) => {
+      if (a.pinned && !b.pinned) return -1;
+      if (!a.pinned && b.pinned) return 1;
+      return new Date(b.uploadDate) - new Date(a.uploadDate);
+    }));
+    setLoadMoreFiles(next ? () => () => loadFiles(searchQuery, next, run) : null);
+  };
+
   // Initial fetch
   useEffect(() => {
     if (groupId) {
@@ -473,9 +492,18 @@ const FilePage = () => {
                         <td className="w-2/5 px-6 py-4">
                           <div className="flex items-center space-x-3">
                             <div className="flex-shrink-0 relative">
-                              <div className={`w-10 h-10 rounded-lg ${typeDisplay.bgColor} flex items-center justify-center shadow-md`}>
-                                <TypeIcon className="w-5 h-5 text-white" />
-                              </div>
+                              {file.hasPreview ? (
+                                <img
+                                  src={previewUrl(file.id)}
+                                  alt={file.fileName}
+                                  loading="lazy"
+                                  className="w-10 h-10 rounded-lg object-cover shadow-md"
+                                />
+                              ) : (
+                                <div className={`w-10 h-10 rounded-lg ${typeDisplay.bgColor} flex items-center justify-center shadow-md`}>
+                                  <TypeIcon className="w-5 h-5 text-white" />
+                                </div>
+                              )}
                               {file.pinned && (
                                 <div className="absolute -top-1 -right-1 w-4 h-4 bg-yellow-400 rounded-full flex items-center justify-center">
                                   <Pin className="w-3 h-3 text-yellow-800" />
@@ -600,6 +628,7 @@ const FilePage = () => {
                 )}
               </tbody>
             </table>
+            <LoadMore onLoadMore={loadMoreFiles} />
           </div>
           
           {/* Scroll Indicator */}
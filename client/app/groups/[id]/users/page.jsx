@@ -4,6 +4,8 @@ import React, { useState, useEffect } from 'react';
 import { usePathname } from 'next/navigation';
 import { Search, Plus, X, Trash2, Crown, Shield, User, Pencil, Eye } from 'lucide-react';
 import ProfilePicture from '@/components/ProfilePicture';
+import { fetchPage } from '@/utils/pagination';
+import LoadMore from '@/components/LoadMore';
 import {
   Dialog,
   DialogContent,
@@ -42,6 +44,7 @@ const UsersPage = () => {
   const [searchResults, setSearchResults] = useState([]);
   const [selectedUsers, setSelectedUsers] = useState([]);
   const [searchLoading, setSearchLoading] = useState(false);
+  const [loadMoreUsers, setLoadMoreUsers] = useState(null); // Next page of members, if any
 
   // Get role display info
   const getRoleDisplay = (role) => {
@@ -85,32 +88,36 @@ const UsersPage = () => {
     }
   };
 
+  // Fetch one page of group users: the first replaces the list, later ones add to it
+  const loadUsers = async (cursor = null) => {
+    const backendUrl = process.env.NEXT_PUBLIC_API_BACKEND_URL || 'http://localhost:8000';
+
+    const { response, items: data, next } = await fetchPage(`${backendUrl}/user/displayuser?groupId=${groupId}`, {
+      headers: {
+        'x-api-key': process.env.NEXT_PUBLIC_USERSERVICES_API_KEY || '',
+        'Content-Type': 'application/json',
+      }
+    }, cursor);
+
+    if (!response.ok) {
+      throw new Error('Failed to fetch users');
+    }
+
+    const mappedUsers = data.map(user => ({
+      userId: user._id,
+      userName: user.name,
+      userEmail: user.email,
+      role: user.role
+    }));
+    setUsers(previous => cursor ? [...previous, ...mappedUsers] : mappedUsers);
+    setLoadMoreUsers(next ? () => () => loadUsers(next) : null);
+  };
+
   // Fetch group users using the backend API
   useEffect(() => {
     const fetchUsers = async () => {
       try {
-        const backendUrl = process.env.NEXT_PUBLIC_API_BACKEND_URL || 'http://localhost:8000';
-        
-        const response = await fetch(`${backendUrl}/user/displayuser?groupId=${groupId}`, {
-          headers: {
-            'x-api-key': process.env.NEXT_PUBLIC_USERSERVICES_API_KEY || '',
-            'Content-Type': 'application/json',
-          }
-        });
-
-        if (response.ok) {
-          const data = await response.json();
-          const mappedUsers = data.map(user => ({
-            userId: user._id,
-            userName: user.name,
-            userEmail: user.email,
-            role: user.role
-          }));
-          setUsers(mappedUsers);
-        } else {
-          console.error('Failed to fetch users');
-          setUsers([]);
-        }
+        await loadUsers();
       } catch (error) {
         console.error('Error fetching users:', error);
         setUsers([]);
@@ -229,23 +236,7 @@ const UsersPage = () => {
 
       if (response.ok) {
         // Refresh users list
-        const displayResponse = await fetch(`${backendUrl}/user/displayuser?groupId=${groupId}`, {
-          headers: {
-            'x-api-key': process.env.NEXT_PUBLIC_USERSERVICES_API_KEY || '',
-            'Content-Type': 'application/json',
-          }
-        });
-
-        if (displayResponse.ok) {
-          const data = await displayResponse.json();
-          const mappedUsers = data.map(user => ({
-            userId: user._id,
-            userName: user.name,
-            userEmail: user.email,
-            role: user.role
-          }));
-          setUsers(mappedUsers);
-        }
+        await loadUsers().catch(error => console.error('Error refreshing users:', error));
 
         // Reset state
         setSelectedUsers([]);
@@ -492,6 +483,7 @@ const UsersPage = () => {
                 )}
               </tbody>
             </table>
+            <LoadMore onLoadMore={loadMoreUsers} />
           </div>
           
           {/* Scroll Indicator */}
@@ -7,6 +7,7 @@ import ProfileDropdown from '@/components/ProfileDropDown';
 import SearchBar from '@/components/SearchBar';
 import Sidebar from '@/components/SideBar';
 import GroupsTable from '@/components/GroupsTable';
+import LoadMore from '@/components/LoadMore';
 import CustomTooltip from '@/components/CustomTooltip';
 import Image from 'next/image';
 import { useRouter } from 'next/navigation';
@@ -33,6 +34,7 @@ const Header = ({ isSmall = false }) => {
 // Main Drive Home Page Component
 const HomePage = () => {
   const [groups , setGroups] = useState([]); // State to hold groups
+  const [loadMore, setLoadMore] = useState(null); // Next page of groups, if any
   const [activeSection, setActiveSection] = useState('starred');
   const [isMobile, setIsMobile] = useState(false);
   const userName = getData('username') || 'User'; // Get username from localStorage
@@ -133,7 +135,7 @@ const HomePage = () => {
         <div className={`flex-1 min-w-0 ${isMobile ? 'p-4' : 'p-8'} bg-[#fdfbf7]`}>
           {/* Search Bar */}
           <div className={`${isMobile ? 'mb-6' : 'mb-8'}`}>
-            <SearchBar isSmall={isMobile} groups={groups} setGroups={setGroups} />
+            <SearchBar isSmall={isMobile} groups={groups} setGroups={setGroups} setLoadMore={setLoadMore} />
           </div>
           
           {/* Welcome Section */}
@@ -144,6 +146,7 @@ const HomePage = () => {
           
           {/* Groups Table */}
           <GroupsTable isSmall={isMobile} groups={groups} starred={true}/>
+          <LoadMore isSmall={isMobile} onLoadMore={loadMore} />
         </div>
       </div>
     </div>
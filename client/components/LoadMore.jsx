@@ -0,0 +1,49 @@
+'use client';
+
+import React, { useState, useEffect, useRef } from 'react';
+
+// Goes under a paged list. Loads the next page when scrolled into view, or
+// on click; renders nothing when there is no next page (onLoadMore is null).
+const LoadMore = ({ onLoadMore, isSmall = false }) => {
+  const sentinel = useRef(null);
+  const [loading, setLoading] = useState(false);
+
+  const load = async () => {
+    if (!onLoadMore || loading) return;
+    setLoading(true);
+    try {
+      await onLoadMore();
+    } catch (error) {
+      console.error('Error loading more:', error);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  // Re-observed for every new page, so a list still shorter than the
+  // screen keeps filling it
+  useEffect(() => {
+    if (!onLoadMore || loading || !sentinel.current) return;
+    const observer = new IntersectionObserver((entries) => {
+      if (entries[0].isIntersecting) load();
+    });
+    observer.observe(sentinel.current);
+    return () => observer.disconnect();
+  }, [onLoadMore, loading]);
+
+  if (!onLoadMore) return null;
+
+  return (
+    <div ref={sentinel} className={`flex justify-center ${isSmall ? 'py-2' : 'py-4'}`}>
+      <button
+        onClick={load}
+        disabled={loading}
+        className={`${isSmall ? 'text-xs' : 'text-sm'} text-orange-600 hover:text-orange-700 disabled:text-gray-400 transition-colors`}
+      >
+        {loading ? 'Loading...' : 'Load more'}
+      </button>
+    </div>
+  );
+};
+
+export default LoadMore;
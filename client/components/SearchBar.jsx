@@ -1,15 +1,21 @@
 'use client';
 
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { usePathname } from 'next/navigation';
 import { Search } from 'lucide-react';
 import { getData } from '@/utils/localStorage';
+import { fetchPage } from '@/utils/pagination';
 
-// Search Bar Component
-const SearchBar = ({ isSmall = false, groups, setGroups }) => {
+// Search Bar Component. Shows the first page of results; `setLoadMore`
+// receives the loader of the next page (null on the last one) for a LoadMore
+// under the list.
+const SearchBar = ({ isSmall = false, groups, setGroups, setLoadMore }) => {
   const [searchValue, setSearchValue] = useState('');
   const pathname = usePathname();
   const id = getData('userId');
+  // Bumped by every new search, so a page still loading for the previous
+  // one isn't appended to this one's results
+  const searchRun = useRef(0);
 
   const API_KEY = process.env.NEXT_PUBLIC_GROUP_API_KEY;
   const API_BASE_URL = process.env.NEXT_PUBLIC_API_BACKEND_URL || 'http://localhost:8000';
@@ -103,6 +109,47 @@ const SearchBar = ({ isSmall = false, groups, setGroups }) => {
     });
   };
 
+  // Fetch one page of results: the first replaces the list, later ones add to it
+  const loadPage = async (endpoint, cursor, run) => {
+    const { response, items: data, next } = await fetchPage(endpoint, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+        'x-api-key': `${API_KEY}`
+      }
+    }, cursor);
+
+    if (!response.ok) {
+      const errorText = await response.text();
+      console.error('Search API Error:', errorText);
+      throw new Error(`HTTP ${response.status}: ${errorText}`);
+    }
+    if (run !== searchRun.current) return;
+
+    console.log('Search results received:', data);
+
+    // Transform the data based on the current route
+    let transformedData;
+    
+    if (pathname === '/storage') {
+      // For storage route, use storage-specific transformation
+      transformedData = transformGroupData(data || [], true);
+    } else if (pathname === '/starred') {
+      // For starred route, filter only starred groups
+      const allGroups = transformGroupData(data || [], false);
+      transformedData = allGroups.filter(group => group.starred === true);
+    } else {
+      // For home route, show all groups
+      transformedData = transformGroupData(data || [], false);
+    }
+
+    console.log('Transformed data:', transformedData);
+    setGroups(previous => cursor ? [...previous, ...transformedData] : transformedData);
+    if (setLoadMore) {
+      setLoadMore(next ? () => () => loadPage(endpoint, next, run) : null);
+    }
+  };
+
   useEffect(() => {
     const searchString = searchValue.trim() || '__empty__';
     
@@ -112,49 +159,16 @@ const SearchBar = ({ isSmall = false, groups, setGroups }) => {
         return;
       }
 
+      const run = ++searchRun.current;
       try {
         const endpoint = getSearchEndpoint(searchString);
         console.log('Making search request to:', endpoint);
-
-        const response = await fetch(endpoint, {
-          method: 'GET',
-          headers: {
-            'Content-Type': 'application/json',
-            'x-api-key': `${API_KEY}`
-          }
-        });
-
-        if (!response.ok) {
-          const errorText = await response.text();
-          console.error('Search API Error:', errorText);
-          throw new Error(`HTTP ${response.status}: ${errorText}`);
-        }
-
-        const data = await response.json();
-        console.log('Search results received:', data);
-
-        // Transform the data based on the current route
-        let transformedData;
-        
-        if (pathname === '/storage') {
-          // For storage route, use storage-specific transformation
-          transformedData = transformGroupData(data || [], true);
-        } else if (pathname === '/starred') {
-          // For starred route, filter only starred groups
-          const allGroups = transformGroupData(data || [], false);
-          transformedData = allGroups.filter(group => group.starred === true);
-        } else {
-          // For home route, show all groups
-          transformedData = transformGroupData(data || [], false);
-        }
-
-        console.log('Transformed data:', transformedData);
-        setGroups(transformedData);
-
+        await loadPage(endpoint, null, run);
       } catch (error) {
         console.error('Error fetching search results:', error);
         // On error, set empty array to show no results
         setGroups([]);
+        if (setLoadMore) setLoadMore(null);
       }
     };
 
@@ -164,7 +178,7 @@ const SearchBar = ({ isSmall = false, groups, setGroups }) => {
     }, 300);
 
     return () => clearTimeout(debounceTimer);
-  }, [searchValue, id, API_BASE_URL, API_KEY, pathname, setGroups]);
+  }, [searchValue, id, API_BASE_URL, API_KEY, pathname, setGroups, setLoadMore]);
 
   // Get placeholder text based on current route
   const getPlaceholder = () => {
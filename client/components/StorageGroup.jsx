@@ -5,6 +5,8 @@ import { usePathname } from 'next/navigation';
 import { MoreHorizontal, Folder, Clock, Users, StarIcon, HardDrive, FileText, Image, Video, Music, Archive } from 'lucide-react';
 import CustomTooltip from '@/components/CustomTooltip';
 import { getData } from '@/utils/localStorage';
+import { fetchPage } from '@/utils/pagination';
+import LoadMore from '@/components/LoadMore';
 
 // Helper function to format file size
 const formatFileSize = (bytes) => {
@@ -75,6 +77,8 @@ const StorageGroup = ({ isSmall = false, starred = false, groups, setGroups }) =
   const userId = getData('userId');
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  // Loader of the next page, when this component fetched the list itself
+  const [loadMore, setLoadMore] = useState(null);
 
   const API_BASE_URL = process.env.NEXT_PUBLIC_API_BACKEND_URL || 'http://localhost:8000';
   const API_KEY = process.env.NEXT_PUBLIC_GROUP_API_KEY;
@@ -131,58 +135,62 @@ const StorageGroup = ({ isSmall = false, starred = false, groups, setGroups }) =
 
         const url = getEndpoint();
         console.log('Making request to:', url);
+        await loadPage(url, null);
 
-        const response = await fetch(url, {
-          method: 'GET',
-          headers: {
-            'Content-Type': 'application/json',
-            'x-api-key': API_KEY,
-          },
-        });
-
-        console.log('Response status:', response.status);
+      } catch (error) {
+        console.error('Error fetching group storage:', error);
+        setError(error.message);
+        setLoading(false);
+      }
+    };
 
-        if (!response.ok) {
-          const errorText = await response.text();
-          console.error('API Error Response:', errorText);
-          throw new Error(`HTTP ${response.status}: ${errorText}`);
-        }
+    // One page at a time: the first replaces the list, later ones add to it
+    const loadPage = async (url, cursor) => {
+      const { response, items: data, next } = await fetchPage(url, {
+        method: 'GET',
+        headers: {
+          'Content-Type': 'application/json',
+          'x-api-key': API_KEY,
+        },
+      }, cursor);
+
+      console.log('Response status:', response.status);
+
+      if (!response.ok) {
+        const errorText = await response.text();
+        console.error('API Error Response:', errorText);
+        throw new Error(`HTTP ${response.status}: ${errorText}`);
+      }
 
-        const data = await response.json();
-        console.log('Group storage data received:', data);
-
-        // Transform API data to match component structure
-        const transformedGroups = data.map((group, index) => ({
-          id: group.groupId || index,
-          name: group.groupName || 'Unnamed Group',
-          type: 'group',
-          modified: '2 hours ago', // You might want to add lastModified to your API
-          owner: 'me',
-          shared: false, // You might want to add this info to your API
-          starred: group.starred || false, // You might want to add this info to your API
-          storage: {
-            used: group.storageUsed || 0,
-            total: 15 * 1024 * 1024 * 1024, // 15GB default, you might want to make this configurable
-            files: {
-              documents: group.frequency?.documents?.count || 0,
-              photos: group.frequency?.photos?.count || 0,
-              videos: group.frequency?.videos?.count || 0,
-              audio: group.frequency?.audio?.count || 0,
-              others: group.frequency?.others?.count || 0
-            }
+      console.log('Group storage data received:', data);
+
+      // Transform API data to match component structure
+      const transformedGroups = data.map((group, index) => ({
+        id: group.groupId || index,
+        name: group.groupName || 'Unnamed Group',
+        type: 'group',
+        modified: '2 hours ago', // You might want to add lastModified to your API
+        owner: 'me',
+        shared: false, // You might want to add this info to your API
+        starred: group.starred || false, // You might want to add this info to your API
+        storage: {
+          used: group.storageUsed || 0,
+          total: 15 * 1024 * 1024 * 1024, // 15GB default, you might want to make this configurable
+          files: {
+            documents: group.frequency?.documents?.count || 0,
+            photos: group.frequency?.photos?.count || 0,
+            videos: group.frequency?.videos?.count || 0,
+            audio: group.frequency?.audio?.count || 0,
+            others: group.frequency?.others?.count || 0
           }
-        }));
-
-        if (setGroups) {
-          setGroups(transformedGroups);
         }
-        setLoading(false);
+      }));
 
-      } catch (error) {
-        console.error('Error fetching group storage:', error);
-        setError(error.message);
-        setLoading(false);
+      if (setGroups) {
+        setGroups(previous => cursor ? [...previous, ...transformedGroups] : transformedGroups);
       }
+      setLoadMore(next ? () => () => loadPage(url, next) : null);
+      setLoading(false);
     };
 
     fetchGroupStorage();
@@ -392,6 +400,7 @@ const StorageGroup = ({ isSmall = false, starred = false, groups, setGroups }) =
           </div>
         ))}
       </div>
+      <LoadMore isSmall={isSmall} onLoadMore={loadMore} />
     </div>
   );
 };
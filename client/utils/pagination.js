@@ -0,0 +1,15 @@
+// utils/pagination.js
+
+// List endpoints return { items, next }. Fetch one page; pass its `next` back
+// as `cursor` for the page after it (null once there are no more). The
+// response is handed back for error handling.
+export const fetchPage = async (url, options = {}, cursor = null) => {
+    const separator = url.includes('?') ? '&' : '?';
+    const pageUrl = cursor ? `${url}${separator}cursor=${encodeURIComponent(cursor)}` : url;
+
+    const response = await fetch(pageUrl, options);
+    if (!response.ok) return { response, items: [], next: null };
+
+    const page = await response.json();
+    return { response, items: page.items, next: page.next };
+}
@@ -0,0 +1,22 @@
+import os
+
+from app.db.connection import db
+from app.chat.backplane import Backplane, LocalBackplane, MongoBackplane
+
+# "local" is enough for a single uvicorn worker; run more than one worker
+# (or more than one host) with "mongo".
+CHAT_BACKPLANE = os.getenv("CHAT_BACKPLANE", "local")
+
+_backplane = None
+
+
+def get_backplane() -> Backplane:
+    global _backplane
+    if _backplane is None:
+        if CHAT_BACKPLANE == "local":
+            _backplane = LocalBackplane()
+        elif CHAT_BACKPLANE == "mongo":
+            _backplane = MongoBackplane(db)
+        else:
+            raise ValueError(f"Unknown chat backplane: {CHAT_BACKPLANE}")
+    return _backplane
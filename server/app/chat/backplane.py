@@ -0,0 +1,83 @@
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+import asyncio
+
+# Events are plain dicts: {"origin": worker id, "kind": "message" | "presence" | "revoke",
+# "groupId": ..., ...}. Every worker receives every event, its own included,
+# and decides what to do with it.
+
+
+class Backplane(ABC):
+    """Carries chat events between the workers serving websockets."""
+
+    name: str
+
+    @abstractmethod
+    async def publish(self, event: dict):
+        ...
+
+    @abstractmethod
+    async def run(self, handler):
+        """Deliver every published event to `handler(event)` until cancelled."""
+
+
+class LocalBackplane(Backplane):
+    """Single process: events go straight to the subscribers in this process."""
+
+    name = "local"
+
+    def __init__(self):
+        self.handlers = []
+
+    async def publish(self, event: dict):
+        for handler in list(self.handlers):
+            try:
+                await handler(event)
+            except Exception as e:
+                print(f"Backplane handler failed: {e}")
+
+    async def run(self, handler):
+        self.handlers.append(handler)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.handlers.remove(handler)
+
+
+class MongoBackplane(Backplane):
+    """Across processes and hosts: events are inserted into `chatEvents` and
+    every worker tails the inserts with a change stream. Needs mongod to run
+    as a replica set, which transactions already require."""
+
+    name = "mongo"
+    RETRY_SECONDS = 1
+
+    def __init__(self, db):
+        self.collection = db.chatEvents
+
+    async def publish(self, event: dict):
+        await self.collection.insert_one({**event, "createdAt": datetime.now(timezone.utc)})
+
+    async def run(self, handler):
+        resume_token = None
+        while True:
+            try:
+                async with self.collection.watch(
+                    [{"$match": {"operationType": "insert"}}],
+                    resume_after=resume_token
+                ) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        event = change["fullDocument"]
+                        event.pop("_id", None)
+                        event.pop("createdAt", None)
+                        try:
+                            await handler(event)
+                        except Exception as e:
+                            print(f"Backplane handler failed: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Resumes after the last delivered event, so nothing is missed or repeated
+                print(f"Chat change stream interrupted: {e}")
+                await asyncio.sleep(self.RETRY_SECONDS)
@@ -0,0 +1,118 @@
+import asyncio
+import collections
+import os
+
+from app.chat.protocol import CODECS, MAX_BATCH
+
+# Frames waiting to be written to one socket. A client that falls this far
+# behind is handled according to the overflow policy:
+#   disconnect - close it (1013, try again later); the client reconnects and
+#                reloads history
+#   drop       - discard the oldest queued frame
+#   coalesce   - replace a queued frame with the same coalesce key (online
+#                counts, which only matter in their latest state), else drop
+#                the oldest queued frame
+SEND_QUEUE_SIZE = int(os.getenv("CHAT_SEND_QUEUE_SIZE", "256"))
+OVERFLOW_POLICY = os.getenv("CHAT_OVERFLOW_POLICY", "disconnect")
+OVERFLOW_POLICIES = {"disconnect", "drop", "coalesce"}
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+if OVERFLOW_POLICY not in OVERFLOW_POLICIES:
+    raise ValueError(f"Unknown CHAT_OVERFLOW_POLICY: {OVERFLOW_POLICY}")
+
+
+class ClientConnection:
+    """One websocket with its own send queue and writer task, so a slow
+    client only ever delays itself. Frames are queued already encoded with
+    the connection's codec (app.chat.protocol)."""
+
+    def __init__(self, websocket, codec=CODECS["json"], max_queue: int = SEND_QUEUE_SIZE, policy: str = OVERFLOW_POLICY):
+        self.websocket = websocket
+        self.codec = codec
+        self.max_queue = max_queue
+        self.policy = policy
+        # Entries are [coalesce key, frame]; `pending` maps a key to its queued entry
+        self.queue = collections.deque()
+        self.pending = {}
+        self.wakeup = asyncio.Event()
+        self.closed = False
+        self.writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, frame, key: str = None):
+        """Queue a frame without waiting. Returns what happened to it:
+        "queued", "coalesced", "dropped" (an older frame made room),
+        "evicted" (this frame overflowed the queue) or "closed"."""
+        if self.closed:
+            return "closed"
+
+        if key is not None and self.policy == "coalesce" and key in self.pending:
+            self.pending[key][1] = frame
+            return "coalesced"
+
+        outcome = "queued"
+        if len(self.queue) >= self.max_queue:
+            if self.policy == "disconnect":
+                self.close(SLOW_CONSUMER_CLOSE_CODE)
+                return "evicted"
+            self._forget(self.queue.popleft())
+            outcome = "dropped"
+
+        entry = [key, frame]
+        self.queue.append(entry)
+        if key is not None:
+            self.pending[key] = entry
+        self.wakeup.set()
+        return outcome
+
+    def _forget(self, entry):
+        if entry[0] is not None and self.pending.get(entry[0]) is entry:
+            del self.pending[entry[0]]
+
+    async def _write_loop(self):
+        try:
+            while True:
+                while not self.queue:
+                    self.wakeup.clear()
+                    await self.wakeup.wait()
+                frame = self._next_frame()
+                if self.codec.binary:
+                    await self.websocket.send_bytes(frame)
+                else:
+                    await self.websocket.send_text(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The receive loop sees the socket go away and cleans up
+            print(f"Failed to send to connection: {e}")
+            self.close()
+
+    def _next_frame(self):
+        entry = self.queue.popleft()
+        self._forget(entry)
+        if not self.queue or not self.codec.batches:
+            return entry[1]
+        # Behind: send what has piled up as one frame
+        frames = [entry[1]]
+        while self.queue and len(frames) < MAX_BATCH:
+            entry = self.queue.popleft()
+            self._forget(entry)
+            frames.append(entry[1])
+        return self.codec.join(frames)
+
+    def close(self, code: int = None):
+        """Stop writing. With a close code, also close the socket so the
+        client notices and reconnects."""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        self.pending.clear()
+        self.writer.cancel()
+        if code is not None:
+            asyncio.create_task(self._close_socket(code))
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
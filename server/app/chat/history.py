@@ -0,0 +1,205 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from fastapi import HTTPException
+from bson import ObjectId
+import bisect
+import os
+
+from app.utils.user_cache import user_cache
+
+# The newest RECENT_MESSAGES of each group are kept in memory, fed by the
+# messages every worker receives from the backplane, so opening a chat is
+# served without touching Mongo. Older history is paged from Mongo with
+# `before=<messageId>`. Buffers of idle groups are evicted, least recently
+# used first, once all of them together pass BUFFER_BYTES.
+RECENT_MESSAGES = 100
+BUFFER_BYTES = int(os.getenv("CHAT_BUFFER_BYTES", str(64 * 1024 * 1024)))
+# Rough per-message cost of the dict, strings and sort key beyond the text
+MESSAGE_OVERHEAD = 400
+
+
+def history_item(msg: dict, username: str):
+    """A `chat` document in the shape the history endpoint returns."""
+    timestamp = msg.get("timestamp")
+    if timestamp:
+        if isinstance(timestamp, datetime):
+            formatted_ts = timestamp.isoformat()
+        else:
+            formatted_ts = timestamp
+    else:
+        formatted_ts = datetime.now(timezone.utc).isoformat()
+
+    return {
+        "id": str(msg.get("_id", "")),
+        "user": msg.get("senderId", "anonymous"),
+        "username": username,
+        "message": msg.get("message", ""),
+        "timestamp": formatted_ts
+    }
+
+
+def sort_key(item: dict):
+    try:
+        timestamp = datetime.fromisoformat(item["timestamp"])
+    except (TypeError, ValueError):
+        timestamp = datetime.min
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp, item["id"]
+
+
+class _GroupBuffer:
+    __slots__ = ("messages", "ids", "complete", "has_older", "size")
+
+    def __init__(self):
+        # [(sort key, item)], oldest first
+        self.messages = []
+        self.ids = set()
+        # Loaded from Mongo at least once; until then only live messages are here
+        self.complete = False
+        self.has_older = False
+        self.size = 0
+
+
+class RecentMessages:
+    def __init__(self, per_group: int = RECENT_MESSAGES, max_bytes: int = BUFFER_BYTES):
+        self.per_group = per_group
+        self.max_bytes = max_bytes
+        self.groups = OrderedDict()
+        self.size = 0
+
+    def _buffer(self, group_id: str):
+        buffer = self.groups.get(group_id)
+        if buffer is None:
+            buffer = self.groups[group_id] = _GroupBuffer()
+        else:
+            self.groups.move_to_end(group_id)
+        return buffer
+
+    def _add(self, buffer: _GroupBuffer, item: dict):
+        if item["id"] in buffer.ids:
+            return
+        entry = (sort_key(item), item)
+        # Almost always the newest; messages relayed by other workers can interleave
+        if not buffer.messages or entry[0] >= buffer.messages[-1][0]:
+            buffer.messages.append(entry)
+        else:
+            bisect.insort(buffer.messages, entry, key=lambda e: e[0])
+        buffer.ids.add(item["id"])
+        size = MESSAGE_OVERHEAD + len(item["message"]) + len(item["username"] or "")
+        buffer.size += size
+        self.size += size
+
+        if len(buffer.messages) > self.per_group:
+            _, dropped = buffer.messages.pop(0)
+            buffer.ids.discard(dropped["id"])
+            size = MESSAGE_OVERHEAD + len(dropped["message"]) + len(dropped["username"] or "")
+            buffer.size -= size
+            self.size -= size
+            buffer.has_older = True
+
+    def _evict(self):
+        # Never the group just touched, which is last
+        while self.size > self.max_bytes and len(self.groups) > 1:
+            _, buffer = self.groups.popitem(last=False)
+            self.size -= buffer.size
+
+    def append(self, group_id: str, item: dict):
+        self._add(self._buffer(group_id), item)
+        self._evict()
+
+    def drop(self, group_id: str):
+        """Forget a group's messages, for a group that is deleted."""
+        buffer = self.groups.pop(group_id, None)
+        if buffer is not None:
+            self.size -= buffer.size
+
+    def load(self, group_id: str, items: list, has_older: bool):
+        """Fill a group's buffer from Mongo, merged with the live messages
+        already seen (some of which may not be written yet)."""
+        buffer = self._buffer(group_id)
+        for item in items:
+            self._add(buffer, item)
+        buffer.complete = True
+        buffer.has_older = buffer.has_older or has_older
+        self._evict()
+
+    def recent(self, group_id: str, limit: int):
+        """The newest `limit` messages and whether older ones exist, or None
+        if the buffer can't answer."""
+        buffer = self.groups.get(group_id)
+        if buffer is None or not buffer.complete or limit > self.per_group:
+            return None
+        self.groups.move_to_end(group_id)
+        items = [item for _, item in buffer.messages[-limit:]]
+        return items, buffer.has_older or len(buffer.messages) > limit
+
+    def find(self, group_id: str, message_id: str):
+        buffer = self.groups.get(group_id)
+        if buffer is None or message_id not in buffer.ids:
+            return None
+        return next(item for _, item in buffer.messages if item["id"] == message_id)
+
+
+recent_messages = RecentMessages()
+
+
+async def render_history(db, docs):
+    docs = list(docs)
+    # Legacy messages without senderName: one batched lookup for the page
+    names = await user_cache.get_names(
+        db,
+        [msg.get("senderId", "anonymous") for msg in docs if not msg.get("senderName")]
+    )
+    return [
+        history_item(msg, msg.get("senderName") or names.get(msg.get("senderId", "anonymous")) or "Anonymous")
+        for msg in docs
+    ]
+
+
+async def before_position(db, group_id: str, before: str):
+    """(timestamp, _id) of the message `before` names, the keyset position."""
+    try:
+        message_id = ObjectId(before)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid before message id")
+
+    doc = await db.chat.find_one({"_id": message_id, "groupId": group_id}, {"timestamp": 1})
+    if doc is not None:
+        return doc["timestamp"], message_id
+
+    # Possibly not written yet (write-behind); the buffer has it
+    item = recent_messages.find(group_id, before)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return sort_key(item)[0], message_id
+
+
+async def history_page(db, group_id: str, before: str = None, limit: int = RECENT_MESSAGES):
+    """A page of history, oldest first, and whether older messages exist."""
+    if before is None:
+        cached = recent_messages.recent(group_id, limit)
+        if cached is not None:
+            return cached
+
+    match = {"groupId": group_id}
+    if before is not None:
+        timestamp, message_id = await before_position(db, group_id, before)
+        match["$or"] = [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": message_id}}
+        ]
+
+    # Opening a chat loads a whole buffer's worth, even for a smaller page
+    fetch = max(limit, recent_messages.per_group) if before is None else limit
+    docs = await db.chat.find(match).sort([("timestamp", -1), ("_id", -1)]).to_list(length=fetch + 1)
+    has_older = len(docs) > fetch
+    items = await render_history(db, reversed(docs[:fetch]))
+
+    if before is None:
+        recent_messages.load(group_id, items, has_older)
+        cached = recent_messages.recent(group_id, limit)
+        if cached is not None:
+            return cached
+        return items[-limit:], has_older or len(items) > limit
+    return items, has_older
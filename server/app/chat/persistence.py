@@ -0,0 +1,105 @@
+from pymongo.errors import BulkWriteError
+import asyncio
+import os
+
+# Chat messages are broadcast first and written to Mongo behind the
+# broadcast, in batches: a batch goes out once FLUSH_SIZE messages are
+# waiting or FLUSH_INTERVAL after the first of them arrived.
+FLUSH_SIZE = int(os.getenv("CHAT_FLUSH_SIZE", "200"))
+FLUSH_INTERVAL = int(os.getenv("CHAT_FLUSH_INTERVAL_MS", "50")) / 1000
+# While Mongo is unreachable, senders wait once this many messages are buffered
+MAX_PENDING = 10000
+RETRY_DELAY = 0.1
+MAX_RETRY_DELAY = 5
+SHUTDOWN_TIMEOUT = 10
+
+DUPLICATE_KEY = 11000
+# Per-document write errors worth another attempt (elections, shutdowns,
+# timeouts). Anything else, like a failed validation (121), fails the same
+# way every time: the document is logged and skipped so it can't hold up
+# the messages behind it.
+RETRYABLE_WRITE_CODES = {6, 7, 50, 89, 91, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436}
+
+
+class MessageWriter:
+    """Write-behind buffer for one collection. Documents must carry their
+    `_id` (ObjectIds are generated locally), which makes retries idempotent:
+    a document already written by an attempt whose reply was lost shows up
+    as a duplicate key and counts as written."""
+
+    def __init__(self, collection, flush_size: int = FLUSH_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        self.collection = collection
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.has_pending = asyncio.Event()
+        self.batch_full = asyncio.Event()
+        self.has_room = asyncio.Event()
+        self.has_room.set()
+        self.task = None
+
+    async def add(self, doc: dict):
+        while len(self.pending) >= MAX_PENDING:
+            self.has_room.clear()
+            await self.has_room.wait()
+        self.pending.append(doc)
+        self.has_pending.set()
+        if len(self.pending) >= self.flush_size:
+            self.batch_full.set()
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self.has_pending.wait()
+            try:
+                await asyncio.wait_for(self.batch_full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self):
+        """Write everything buffered, retrying with backoff until it succeeds."""
+        delay = RETRY_DELAY
+        while self.pending:
+            batch = self.pending[:self.flush_size]
+            try:
+                await self._insert(batch)
+            except Exception as e:
+                print(f"Chat flush of {len(batch)} messages failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+                continue
+            del self.pending[:len(batch)]
+            self.has_room.set()
+            delay = RETRY_DELAY
+        self.has_pending.clear()
+        self.batch_full.clear()
+
+    async def _insert(self, batch):
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if e.details.get("writeConcernErrors") or any(
+                error["code"] in RETRYABLE_WRITE_CODES for error in errors
+            ):
+                raise
+            for error in errors:
+                if error["code"] != DUPLICATE_KEY:
+                    doc = batch[error["index"]]
+                    print(f"Chat message {doc.get('_id')} dropped, not retryable ({error['code']}): {error.get('errmsg')}")
+
+    async def close(self):
+        """Stop the background flusher and write out whatever is left."""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await asyncio.wait_for(self.flush(), SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"Chat shutdown: {len(self.pending)} messages could not be saved")
@@ -0,0 +1,58 @@
+from collections import defaultdict, Counter
+
+# Connections that haven't identified yet don't count as anyone.
+
+
+class PresenceIndex:
+    """Who is connected to this worker, by group and by user. Every update is
+    O(1); a user with several tabs open in a group is one user."""
+
+    def __init__(self):
+        # connection key -> (group_id, user_id or None)
+        self.connections = {}
+        # group_id -> user_id -> open connections
+        self.group_users = defaultdict(Counter)
+        # user_id -> group_id -> open connections
+        self.user_groups = defaultdict(Counter)
+        self.usernames = {}
+
+    def add(self, key, group_id: str, user_id: str = None, username: str = None):
+        self.connections[key] = (group_id, user_id)
+        if user_id is not None:
+            self._count(group_id, user_id, 1)
+            self.usernames[user_id] = username
+
+    def identify(self, key, user_id: str, username: str = None):
+        """Attach (or change) the user behind an existing connection."""
+        group_id, previous = self.connections[key]
+        if previous is not None:
+            self._count(group_id, previous, -1)
+        self.connections[key] = (group_id, user_id)
+        self._count(group_id, user_id, 1)
+        self.usernames[user_id] = username
+
+    def remove(self, key):
+        entry = self.connections.pop(key, None)
+        if entry is not None and entry[1] is not None:
+            self._count(entry[0], entry[1], -1)
+
+    def _count(self, group_id: str, user_id: str, delta: int):
+        users = self.group_users[group_id]
+        users[user_id] += delta
+        groups = self.user_groups[user_id]
+        groups[group_id] += delta
+        if users[user_id] <= 0:
+            del users[user_id]
+            del groups[group_id]
+            if not users:
+                del self.group_users[group_id]
+            if not groups:
+                del self.user_groups[user_id]
+                self.usernames.pop(user_id, None)
+
+    def users(self, group_id: str):
+        """{user_id: username} of the users online in `group_id`."""
+        return {user_id: self.usernames.get(user_id) for user_id in self.group_users.get(group_id, ())}
+
+    def groups_of(self, user_id: str):
+        return set(self.user_groups.get(user_id, ()))
@@ -0,0 +1,92 @@
+import json
+import struct
+
+import msgpack
+
+# Chat websockets speak one of two protocols, picked per connection:
+#
+# JSON (default, no subprotocol): text frames of the event dicts as the
+# server builds them, one event per frame. The client sends
+#   {"type": "identify", "user": ..., "username": ...}
+#   {"type": "message", "user": ..., "username": ..., "message": ...}
+#
+# MessagePack (subprotocol "chat.msgpack.v1"): binary frames with short keys
+# and nothing the connection already implies. The group is the one in the
+# URL and the sender is whoever identified, so the client sends
+#   {"t": "i", "u": user, "n": username}     once
+#   {"t": "m", "m": text}                    per message
+# and receives
+#   {"t": "m", "i": id, "u": user, "n": username, "m": text, "ts": iso time}
+#   {"t": "c", "c": online count}
+# A frame holding an array instead of a map is a batch of such events, sent
+# when the connection has fallen behind.
+#
+# Either protocol can also receive {"type": "error", "error": ..., ...} for a
+# message the server refused (e.g. "message_too_long"); nothing else changes.
+MSGPACK_SUBPROTOCOL = "chat.msgpack.v1"
+MAX_BATCH = 64
+
+
+class JsonCodec:
+    name = "json"
+    binary = False
+    batches = False
+
+    def encode(self, event: dict):
+        return json.dumps(event)
+
+    def decode(self, frame):
+        return json.loads(frame)
+
+
+class MsgpackCodec:
+    name = "msgpack"
+    binary = True
+    batches = True
+
+    def encode(self, event: dict):
+        if event["type"] == "message":
+            compact = {
+                "t": "m",
+                "i": event["id"],
+                "u": event["user"],
+                "n": event["username"],
+                "m": event["message"],
+                "ts": event["timestamp"]
+            }
+        elif event["type"] == "online_count":
+            compact = {"t": "c", "c": event["count"]}
+        else:
+            compact = event
+        return msgpack.packb(compact)
+
+    def join(self, frames: list):
+        """One array frame out of already encoded events, without re-encoding."""
+        count = len(frames)
+        if count < 16:
+            header = bytes([0x90 | count])
+        else:
+            header = b"\xdc" + struct.pack(">H", count)
+        return header + b"".join(frames)
+
+    def decode(self, frame):
+        data = msgpack.unpackb(frame)
+        kind = data.get("t")
+        if kind == "i":
+            return {"type": "identify", "user": data.get("u"), "username": data.get("n")}
+        if kind == "m":
+            return {"type": "message", "message": data.get("m", "")}
+        return {"type": kind}
+
+
+CODECS = {
+    "json": JsonCodec(),
+    "msgpack": MsgpackCodec(),
+}
+
+
+def negotiate(offered: list):
+    """(codec, subprotocol to accept) for the subprotocols a client offered."""
+    if MSGPACK_SUBPROTOCOL in offered:
+        return CODECS["msgpack"], MSGPACK_SUBPROTOCOL
+    return CODECS["json"], None
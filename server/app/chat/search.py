@@ -0,0 +1,107 @@
+from fastapi import HTTPException
+from bson import ObjectId
+from bson.errors import InvalidId
+import os
+import re
+import unicodedata
+
+from app.utils.pagination import decode_cursor, paginate
+
+# Chat search runs on the `groupId_message_text` index (app.db.indexes): a
+# compound text index with groupId as its equality prefix, so a search only
+# ever touches the index keys of one group. The index has no language, so
+# terms match whole words (case and diacritics aside), without stemming,
+# which keeps highlighting exact in any language.
+#
+# Ranking needs every match in memory, so it is bounded: only the first
+# CHAT_SEARCH_MAX_CANDIDATES matches the index yields are scored and sorted,
+# carrying nothing but their id and score; the page's messages are looked up
+# after the sort. A search matching more messages than that (a very common
+# word in a busy group) ranks a subset of them; more terms narrow it down.
+MAX_CANDIDATES = int(os.getenv("CHAT_SEARCH_MAX_CANDIDATES", "2000"))
+MAX_TERMS = 10
+SNIPPET_RADIUS = 60
+# How far a snippet edge may move to avoid cutting a word
+MAX_WORD_EXTENSION = 20
+WORD_RE = re.compile(r"[^\W_]+")
+
+
+def normalize_word(word: str):
+    # What the text index does to a word, near enough: fold case and accents
+    decomposed = unicodedata.normalize("NFKD", word.casefold())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def search_terms(query: str):
+    terms = []
+    for word in WORD_RE.findall(query):
+        term = normalize_word(word)
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+def chat_search_pipeline(group_id: str, terms: list, cursor: str = None, limit: int = 50):
+    """Messages of `group_id` containing any of `terms`, best matches first
+    and newest first among equals, among at most MAX_CANDIDATES matches.
+    Fetches one extra row for the cursor."""
+    pipeline = [
+        {"$match": {"groupId": group_id, "$text": {"$search": " ".join(terms)}}},
+        {"$limit": MAX_CANDIDATES},
+        {"$project": {"_id": 1, "score": {"$meta": "textScore"}}}
+    ]
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        try:
+            after_score, after_id = float(position["score"]), ObjectId(position["id"])
+        except (KeyError, TypeError, ValueError, InvalidId):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        pipeline.append({"$match": {"$or": [
+            {"score": {"$lt": after_score}},
+            {"score": after_score, "_id": {"$lt": after_id}}
+        ]}})
+
+    pipeline += [
+        {"$sort": {"score": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        # Only now the messages themselves, for the rows of this page
+        {"$lookup": {"from": "chat", "localField": "_id", "foreignField": "_id", "as": "doc"}},
+        {"$unwind": "$doc"},
+        {"$replaceWith": {"$mergeObjects": ["$doc", {"score": "$score"}]}}
+    ]
+    return pipeline
+
+
+def next_chat_search_cursor(docs: list, limit: int):
+    return paginate(docs, limit, lambda doc: {"score": doc["score"], "id": str(doc["_id"])})
+
+
+def highlight(message: str, terms: list):
+    """A snippet of `message` around the first hit, with the [start, end)
+    offsets of every matched word inside the snippet."""
+    wanted = set(terms)
+    hits = [
+        (match.start(), match.end())
+        for match in WORD_RE.finditer(message)
+        if normalize_word(match.group()) in wanted
+    ]
+    if not hits:
+        return {"snippet": message[:SNIPPET_RADIUS * 2], "highlights": []}
+
+    start = max(0, hits[0][0] - SNIPPET_RADIUS)
+    end = min(len(message), hits[0][1] + SNIPPET_RADIUS)
+    # Don't cut words in half (within reason: URLs and the like)
+    floor, ceiling = max(0, start - MAX_WORD_EXTENSION), min(len(message), end + MAX_WORD_EXTENSION)
+    while start > floor and message[start - 1].isalnum():
+        start -= 1
+    while end < ceiling and message[end].isalnum():
+        end += 1
+
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(message) else ""
+    shift = len(prefix) - start
+    return {
+        "snippet": prefix + message[start:end] + suffix,
+        "highlights": [[s + shift, e + shift] for s, e in hits if s >= start and e <= end]
+    }
@@ -5,4 +5,6 @@ files= db["files"]
 activities = db["activities"]
 chat = db["chat"]
 group = db["group"]
-groupmembers=db["groupMembers"]
\ No newline at end of file
+groupmembers=db["groupMembers"]
+blobs = db["blobs"]
+previews = db["previews"]
\ No newline at end of file
@@ -0,0 +1,147 @@
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+
+# Indexes the route modules rely on, created at startup and by
+# scripts/manage_indexes.py. Each one names the queries it serves;
+# benchmarks/index_usage.py checks with explain() that those queries use it.
+# Indexes are looked up by name, so changing a definition means a new name
+# (or --drop-conflicting).
+INDEXES = {
+    "files": [
+        # File name search (app.utils.file_search), per group and global
+        IndexModel([("groupId", ASCENDING), ("nameLower", ASCENDING)], name="groupId_nameLower"),
+        IndexModel([("groupId", ASCENDING), ("nameGrams", ASCENDING)], name="groupId_nameGrams"),
+        IndexModel([("nameLower", ASCENDING)], name="nameLower"),
+        IndexModel([("nameGrams", ASCENDING)], name="nameGrams"),
+        # Unfiltered group listing, newest first; also every other by-group
+        # query (zip download, group deletion)
+        IndexModel([("groupId", ASCENDING), ("_id", DESCENDING)], name="groupId_id"),
+    ],
+    "previews": [
+        # Group deletion drops a group's previews in one go
+        IndexModel([("groupId", ASCENDING)], name="groupId"),
+    ],
+    "chat": [
+        # History keyset (app.chat.history), newest first
+        IndexModel([("groupId", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="groupId_timestamp_id"),
+        # Message search (app.chat.search), always scoped to one group
+        IndexModel([("groupId", ASCENDING), ("message", TEXT)], name="groupId_message_text", default_language="none"),
+    ],
+    "chatEvents": [
+        # Backplane events are only needed while workers catch up
+        IndexModel([("createdAt", ASCENDING)], name="createdAt_ttl", expireAfterSeconds=3600),
+    ],
+    "groupMembers": [
+        # Role checks (app.utils.membership) and the member's own group lookups
+        IndexModel([("userId", ASCENDING), ("groupId", ASCENDING)], name="userId_groupId"),
+        # Member listing keyset (/user/displayuser)
+        IndexModel([("groupId", ASCENDING), ("_id", ASCENDING)], name="groupId_id"),
+        # A group's owner, for the storage counters on upload and delete
+        IndexModel([("groupId", ASCENDING), ("role", ASCENDING)], name="groupId_role"),
+        # Owned groups keyset (/group/groupstorage, /group/userstorage)
+        IndexModel([("userId", ASCENDING), ("role", ASCENDING), ("groupId", ASCENDING)], name="userId_role_groupId"),
+    ],
+    "activities": [
+        # A group's activity, newest first
+        IndexModel([("groupId", ASCENDING), ("timestamp", DESCENDING)], name="groupId_timestamp"),
+    ],
+    "starred": [
+        # The user's stars in the group listing, star and unstar
+        IndexModel([("userId", ASCENDING), ("groupId", ASCENDING)], name="userId_groupId"),
+        # Group deletion
+        IndexModel([("groupId", ASCENDING)], name="groupId"),
+    ],
+    "otp_store": [
+        # One code per email, upserted on send, matched on verify
+        IndexModel([("email", ASCENDING)], name="email", unique=True),
+        # Codes expire in auth; this only clears out the ones never used
+        IndexModel([("createdAt", ASCENDING)], name="createdAt_ttl", expireAfterSeconds=86400),
+    ],
+    "user": [
+        # Login, signup and password reset
+        IndexModel([("email", ASCENDING)], name="email"),
+    ],
+    "uploadSessions": [
+        # Abandoned session cleanup (app.utils.upload_sessions)
+        IndexModel([("updatedAt", ASCENDING)], name="updatedAt"),
+    ],
+}
+
+# Index options that change what an index does; anything else (background,
+# version, ...) is ignored when comparing definitions
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "default_language", "partialFilterExpression")
+# Server error codes for an index that exists under the name or keys with a
+# different definition
+INDEX_CONFLICT_CODES = {85, 86}
+
+
+def _key_matches(spec: dict, found: dict):
+    wanted = list(spec["key"].items())
+    if any(kind == TEXT for _, kind in wanted):
+        # Text indexes are listed as _fts/_ftsx plus the other fields, with
+        # the text fields under `weights`
+        prefix = [(field, kind) for field, kind in wanted if kind != TEXT]
+        fields = {field for field, kind in wanted if kind == TEXT}
+        listed = [(field, kind) for field, kind in found["key"].items() if field not in ("_fts", "_ftsx")]
+        return listed == prefix and set(found.get("weights", {})) == fields
+    return [(field, kind) for field, kind in found["key"].items()] == wanted
+
+
+def index_problems(spec: dict, found: dict):
+    """How an existing index differs from its registered definition."""
+    problems = []
+    if found is None:
+        return ["missing"]
+    if not _key_matches(spec, found):
+        problems.append(f"keys are {dict(found['key'])}")
+    for option in COMPARED_OPTIONS:
+        if option == "default_language" and option not in spec:
+            continue
+        if spec.get(option) != found.get(option):
+            problems.append(f"{option} is {found.get(option)!r}, expected {spec.get(option)!r}")
+    return problems
+
+
+async def verify_indexes(db):
+    """{collection: {index name: [problems]}} for registered indexes that are
+    missing or defined differently; empty when everything is in place."""
+    report = {}
+    for collection, indexes in INDEXES.items():
+        existing = {doc["name"]: doc async for doc in db[collection].list_indexes()}
+        for index in indexes:
+            spec = index.document
+            problems = index_problems(spec, existing.get(spec["name"]))
+            if problems:
+                report.setdefault(collection, {})[spec["name"]] = problems
+    return report
+
+
+async def ensure_indexes(db, drop_conflicting: bool = False):
+    """Create the registered indexes (a no-op for those already in place) and
+    return verify_indexes' report of whatever is still wrong.
+
+    An index that clashes with an existing one of the same name or keys is
+    left alone and reported, unless `drop_conflicting`, which rebuilds it.
+    """
+    for collection, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                await db[collection].create_indexes([index])
+            except OperationFailure as e:
+                if not drop_conflicting or e.code not in INDEX_CONFLICT_CODES:
+                    print(f"Index {collection}.{index.document['name']} not created: {e}")
+                    continue
+                await _drop_clashing(db[collection], index.document)
+                await db[collection].create_indexes([index])
+                print(f"Index {collection}.{index.document['name']} rebuilt")
+    return await verify_indexes(db)
+
+
+async def _drop_clashing(collection, spec: dict):
+    clashing = [
+        found["name"]
+        async for found in collection.list_indexes()
+        if found["name"] != "_id_" and (found["name"] == spec["name"] or _key_matches(spec, found))
+    ]
+    for name in clashing:
+        await collection.drop_index(name)
@@ -0,0 +1,46 @@
+db.createCollection("blobs", {
+  validator: {
+    $jsonSchema: {
+      bsonType: "object",
+      required: ["_id", "GridFSId", "size", "refCount", "createdAt"],
+      properties: {
+        _id: {
+          bsonType: "string",
+          description: "SHA-256 of the stored content"
+        },
+        GridFSId: {
+          bsonType: "objectId",
+          description: "Blob shared by every file with this content"
+        },
+        storage: {
+          enum: ["gridfs", "local"],
+          description: "Storage backend holding the blob"
+        },
+        size: {
+          bsonType: "long",
+          minimum: 0,
+          description: "Size of the content in bytes"
+        },
+        compression: {
+          enum: ["gzip", null],
+          description: "Encoding of the stored blob, null when stored as is"
+        },
+        storedSize: {
+          bsonType: "long",
+          minimum: 0,
+          description: "Bytes the blob takes at rest"
+        },
+        refCount: {
+          bsonType: "int",
+          description: "Number of files documents pointing at this blob"
+        },
+        createdAt: {
+          bsonType: "date",
+          description: "Time the content was first stored"
+        }
+      }
+    }
+  },
+  validationLevel: "strict",
+  validationAction: "error"
+})
@@ -29,13 +29,30 @@ db.createCollection(
           },
           GridFSId: {
             bsonType: "objectId",
-            description: "Reference ID to the actual file stored in GridFS"
+            description: "Blob id of the content in its storage backend (GridFS id for gridfs)"
           },
           size: {
             bsonType: "long",
             minimum: 0,
             description: "Size of the file in bytes (must be a positive integer)"
           },
+          storage: {
+            enum: ["gridfs", "local"],
+            description: "Storage backend holding the blob referenced by GridFSId"
+          },
+          contentHash: {
+            bsonType: "string",
+            description: "SHA-256 of the content, key into the blobs collection"
+          },
+          compression: {
+            enum: ["gzip", null],
+            description: "Encoding of the stored blob, null when stored as is"
+          },
+          storedSize: {
+            bsonType: "long",
+            minimum: 0,
+            description: "Bytes the blob takes at rest"
+          },
           groupId: {
             bsonType: "string",
             description: "Reference ID to the group (or workspace/vault) this file belongs to"
@@ -44,6 +61,19 @@ db.createCollection(
             bsonType: "string",
             description : "content type must be a string"
           },
+          preview: {
+            enum: ["ready", "failed"],
+            description: "Whether a preview was rendered into the previews collection"
+          },
+          nameLower: {
+            bsonType: "string",
+            description: "Normalized (casefolded) name used for search"
+          },
+          nameGrams: {
+            bsonType: "array",
+            items: { bsonType: "string" },
+            description: "Edge n-grams of the words in the name, used for search"
+          },
           pinned: {
             bsonType: "bool",
             description: "Boolean flag indicating if the file is pinned"
@@ -31,6 +31,55 @@ db.createCollection(
                     storageUsed:{
                         bsonType: "long",
                         description: "must be of long int"
+                    },
+                    storedBytes:{
+                        bsonType: "long",
+                        description: "bytes at rest after compression, must be of long int"
+                    },
+                    lastActivityAt:{
+                        bsonType: "date",
+                        description: "time of the latest activity in the group, must be of type date"
+                    },
+                    frequency:{
+                        bsonType: "object",
+                        description: "file count and size per category",
+                        properties: {
+                            documents: {
+                                bsonType: "object",
+                                properties: {
+                                    count: { bsonType: ["int", "long"] },
+                                    size: { bsonType: ["int", "long"] }
+                                }
+                            },
+                            videos: {
+                                bsonType: "object",
+                                properties: {
+                                    count: { bsonType: ["int", "long"] },
+                                    size: { bsonType: ["int", "long"] }
+                                }
+                            },
+                            photos: {
+                                bsonType: "object",
+                                properties: {
+                                    count: { bsonType: ["int", "long"] },
+                                    size: { bsonType: ["int", "long"] }
+                                }
+                            },
+                            audio: {
+                                bsonType: "object",
+                                properties: {
+                                    count: { bsonType: ["int", "long"] },
+                                    size: { bsonType: ["int", "long"] }
+                                }
+                            },
+                            others: {
+                                bsonType: "object",
+                                properties: {
+                                    count: { bsonType: ["int", "long"] },
+                                    size: { bsonType: ["int", "long"] }
+                                }
+                            }
+                        }
                     }
                 }
             }
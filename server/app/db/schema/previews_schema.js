@@ -0,0 +1,44 @@
+db.createCollection("previews", {
+  validator: {
+    $jsonSchema: {
+      bsonType: "object",
+      required: ["_id", "groupId", "contentType", "data", "etag", "createdAt"],
+      properties: {
+        _id: {
+          bsonType: "objectId",
+          description: "Id of the file this preview belongs to"
+        },
+        groupId: {
+          bsonType: "string",
+          description: "Group of the file, for access checks"
+        },
+        contentType: {
+          bsonType: "string",
+          description: "Content type of the preview image"
+        },
+        data: {
+          bsonType: "binData",
+          description: "Rendered preview image"
+        },
+        width: {
+          bsonType: "int",
+          description: "Preview width in pixels"
+        },
+        height: {
+          bsonType: "int",
+          description: "Preview height in pixels"
+        },
+        etag: {
+          bsonType: "string",
+          description: "Validator for conditional requests"
+        },
+        createdAt: {
+          bsonType: "date",
+          description: "Time the preview was rendered"
+        }
+      }
+    }
+  },
+  validationLevel: "strict",
+  validationAction: "error"
+})
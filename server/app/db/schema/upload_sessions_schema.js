@@ -0,0 +1,61 @@
+db.createCollection("uploadSessions", {
+  validator: {
+    $jsonSchema: {
+      bsonType: "object",
+      required: ["_id", "userId", "groupId", "filename", "contentType", "size", "chunkSize", "totalChunks", "status", "createdAt", "updatedAt"],
+      properties: {
+        _id: {
+          bsonType: "string",
+          description: "upload session id"
+        },
+        userId: {
+          bsonType: "string",
+          description: "uploader id"
+        },
+        groupId: {
+          bsonType: "string",
+          description: "group the file will belong to"
+        },
+        filename: {
+          bsonType: "string",
+          description: "name of the file"
+        },
+        contentType: {
+          bsonType: "string",
+          description: "content type of the file"
+        },
+        size: {
+          bsonType: ["int", "long"],
+          minimum: 0,
+          description: "total size of the file in bytes"
+        },
+        chunkSize: {
+          bsonType: ["int", "long"],
+          description: "bytes per chunk"
+        },
+        totalChunks: {
+          bsonType: ["int", "long"],
+          description: "number of chunks expected"
+        },
+        status: {
+          enum: ["open", "completed"],
+          description: "open until the file has been committed"
+        },
+        fileId: {
+          bsonType: ["objectId", "null"],
+          description: "files document created on completion"
+        },
+        createdAt: {
+          bsonType: "date",
+          description: "time the session was opened"
+        },
+        updatedAt: {
+          bsonType: "date",
+          description: "time of the last chunk or status change"
+        }
+      }
+    }
+  },
+  validationLevel: "strict",
+  validationAction: "error"
+})
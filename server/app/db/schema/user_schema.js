@@ -33,6 +33,10 @@ db.createCollection(
           storageUsed: {
             bsonType:"long",
             description: "must be a long integer"
+          },
+          storedBytes: {
+            bsonType:"long",
+            description: "bytes at rest after compression, must be a long integer"
           }
         }
       }
@@ -1,5 +1,6 @@
 from pydantic import BaseModel,Field
 from datetime import datetime
+from typing import Optional, List
 
 
 class File(BaseModel):
@@ -7,12 +8,35 @@ class File(BaseModel):
     name : str = Field(...,description="name of the file")
     uploadedBy : str = Field(...,description="uploader id of the file")
     uploadedAt : datetime = Field(...,description="uploaded date")
-    GridFSId : str = Field(...,description="grid fs identifier")
+    GridFSId : str = Field(...,description="blob identifier in the storage backend")
+    storage : str = Field("gridfs",description="storage backend holding the blob")
     size : int = Field(...,description="size of the file")
+    contentHash : Optional[str] = Field(None,description="sha256 of the content, shared blob key")
+    compression : Optional[str] = Field(None,description="encoding of the stored blob, None if stored as is")
+    storedSize : Optional[int] = Field(None,description="bytes the blob takes at rest")
     groupId : str = Field(...,description="Group id to which file is associated")
     pinned : bool = Field(...,description="Whether pinned or not")
+    preview : Optional[str] = Field(None,description="ready / failed once a preview was attempted")
 
 
 class FileAccess(BaseModel):
     userId : str = Field(..., description="user who request for delete")
-    fileId : str = Field(..., description= "file to be deleted")
\ No newline at end of file
+    fileId : str = Field(..., description= "file to be deleted")
+
+class UploadSessionInit(BaseModel):
+    userId : str = Field(...,description="uploader id")
+    groupId : str = Field(...,description="group the file will belong to")
+    filename : str = Field(...,description="name of the file")
+    contentType : str = Field(...,description="content type of the file")
+    size : int = Field(...,description="total size of the file in bytes")
+    chunkSize : Optional[int] = Field(None,ge=1,description="bytes per chunk, server default if omitted")
+
+
+class UploadSessionAccess(BaseModel):
+    userId : str = Field(...,description="uploader id that opened the session")
+
+
+class ZipDownloadModel(BaseModel):
+    userId : str = Field(...,description="user requesting the archive")
+    fileIds : Optional[List[str]] = Field(None,description="files to include")
+    groupId : Optional[str] = Field(None,description="include every file of this group")
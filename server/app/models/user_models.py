@@ -10,6 +10,7 @@ class User(BaseModel):
     createAt:datetime=Field(...,description="User signup time")
     lastAccessed:datetime=Field(...,description="last login time")
     storageUsed: Int64 = Field(default=Int64(0), description="User storage")
+    storedBytes: Int64 = Field(default=Int64(0), description="User storage at rest")
     
     class Config:
         validate_by_name = True
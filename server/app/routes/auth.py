@@ -154,7 +154,8 @@ async def setuserid_api(request: UserModel):
             "email": request.email,
             "createAt": created_at,
             "lastAccessed": datetime.now(timezone.utc),
-            "storageUsed": Int64(0)
+            "storageUsed": Int64(0),
+            "storedBytes": Int64(0)
         })
 
         token = auth_util.generate_token({
@@ -304,7 +305,8 @@ async def auth(request: Request):
                 "pwd": "",
                 "createAt": datetime.now(timezone.utc),
                 "lastAccessed": datetime.now(timezone.utc),
-                "storageUsed": Int64(0) 
+                "storageUsed": Int64(0),
+                "storedBytes": Int64(0)
             })
         else:
             user_id = user_doc["_id"]
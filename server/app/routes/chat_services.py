@@ -1,11 +1,25 @@
-from fastapi import WebSocket, WebSocketDisconnect, APIRouter, HTTPException, Depends, Request
+from fastapi import WebSocket, WebSocketDisconnect, APIRouter, HTTPException, Depends, Request, Query
+import asyncio
 import collections
-import json
+import time
+import uuid
 from app.db.connection import get_db
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from app.db.connection import db as chat_db
+from app.chat import get_backplane
+from app.chat.persistence import MessageWriter
+from app.chat.history import RECENT_MESSAGES, recent_messages, history_page, render_history
+from app.chat.search import search_terms, chat_search_pipeline, next_chat_search_cursor, highlight
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, page_response
+from typing import Optional
+from app.chat.connection import ClientConnection, OVERFLOW_POLICY, SEND_QUEUE_SIZE
+from app.chat.presence import PresenceIndex
+from app.chat.protocol import negotiate
+from app.utils.membership import membership
 
 load_dotenv()
 
@@ -20,61 +34,335 @@ def verify_chat_api(request: Request):
             detail="Access Forbidden"
         )
 
+# Workers re-announce who is online on them this often; a worker silent
+# for PRESENCE_TTL seconds (crashed, not shut down) stops counting.
+PRESENCE_HEARTBEAT_SECONDS = 30
+PRESENCE_TTL = PRESENCE_HEARTBEAT_SECONDS * 3
+# Pause before restarting a backplane receiver that stopped or failed
+RECEIVER_RESTART_SECONDS = 1
+# Joins and leaves within this window go out as one count per group, and
+# each group's sockets get at most one online_count frame per window.
+PRESENCE_DEBOUNCE_SECONDS = int(os.getenv("CHAT_PRESENCE_DEBOUNCE_MS", "250")) / 1000
+# Sent when a socket speaks for someone who isn't a member of its group, and
+# to the sockets of a member who is removed or whose group is deleted
+NOT_A_MEMBER_CLOSE_CODE = 1008
+# A socket without ?userId= must send its identify frame within this time;
+# nothing is delivered to it until that member has been checked
+IDENTIFY_TIMEOUT_SECONDS = int(os.getenv("CHAT_IDENTIFY_TIMEOUT_SECONDS", "10"))
+# Longest message chat_schema.js accepts; longer ones are refused up front
+# rather than broadcast and then rejected by the write-behind insert
+MAX_MESSAGE_LENGTH = 1000
+
+def log_task_failure(task: asyncio.Task):
+    # Background tasks nobody awaits would otherwise drop their errors
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Chat background task failed: {task.exception()!r}")
+
 class GroupConnectionManager:
-    def __init__(self):
-        self.groups = collections.defaultdict(list)
-        self.user_info = {}
-
-    async def connect(self, group_id: str, websocket: WebSocket, user_id: str = None, username: str = None):
-        await websocket.accept()
-        self.groups[group_id].append(websocket)
-        connection_key = f"{group_id}_{id(websocket)}"
-        self.user_info[connection_key] = {
-            "user_id": user_id,
-            "username": username,
-            "group_id": group_id
+    """Sockets connected to this worker. Messages and presence changes go out
+    through the backplane and come back to every worker (this one included),
+    which then writes them to its own sockets."""
+
+    def __init__(self, backplane):
+        # group_id -> websocket -> ClientConnection
+        self.groups = collections.defaultdict(dict)
+        self.presence = PresenceIndex()
+        self.backplane = backplane
+        self.worker_id = uuid.uuid4().hex
+        # group_id -> worker id -> ({user_id: username} online there, last heard)
+        self.remote_users = collections.defaultdict(dict)
+        # group_id -> send outcomes ("dropped", "coalesced", "evicted", ...),
+        # for groups with sockets here; folded into send_totals once the
+        # last one leaves, so groups come and go without piling up
+        self.send_stats = collections.defaultdict(collections.Counter)
+        self.send_totals = collections.Counter()
+        # group_id -> scheduled publish of our count / online_count frame
+        self.pending_presence = {}
+        self.pending_count_frames = {}
+        # group_id -> (online count, when it was computed)
+        self.count_snapshots = {}
+
+    async def accept(self, websocket: WebSocket):
+        """Accept the socket in the protocol it asked for and return the codec.
+        It isn't part of any group until connect()."""
+        codec, subprotocol = negotiate(websocket.scope.get("subprotocols", []))
+        await websocket.accept(subprotocol=subprotocol)
+        return codec
+
+    def connect(self, group_id: str, websocket: WebSocket, codec, user_id: str, username: str = None):
+        """Start delivering the group's messages to an accepted socket, once
+        `user_id` is known to be a member."""
+        connection = ClientConnection(websocket, codec)
+        self.groups[group_id][websocket] = connection
+        self.presence.add(websocket, group_id, user_id, username)
+        self.presence_changed(group_id)
+        return connection
+
+    def identify(self, group_id: str, websocket: WebSocket, user_id: str, username: str):
+        if websocket in self.groups.get(group_id, {}):
+            self.presence.identify(websocket, user_id, username)
+            self.presence_changed(group_id)
+
+    def disconnect(self, group_id: str, websocket: WebSocket, code: int = None):
+        """Forget the socket; True if it was connected."""
+        if websocket not in self.groups.get(group_id, {}):
+            return False
+        self.groups[group_id].pop(websocket).close(code)
+        if not self.groups[group_id]:
+            del self.groups[group_id]
+            self.send_totals.update(self.send_stats.pop(group_id, {}))
+            self.count_snapshots.pop(group_id, None)
+        self.presence.remove(websocket)
+        return True
+
+    async def revoke(self, group_id: str, user_id: str = None):
+        """Close `user_id`'s sockets in the group (everyone's, if None) on
+        every worker. Called after a member is removed or the group deleted."""
+        event = {
+            "origin": self.worker_id,
+            "kind": "revoke",
+            "groupId": group_id,
+            "userId": user_id
         }
-        await self.broadcast_online_count(group_id)
-
-    def disconnect(self, group_id: str, websocket: WebSocket):
-        if websocket in self.groups[group_id]:
-            self.groups[group_id].remove(websocket)
-            connection_key = f"{group_id}_{id(websocket)}"
-            if connection_key in self.user_info:
-                del self.user_info[connection_key]
-
-    async def send_to_group(self, group_id: str, message: dict, exclude_websocket: WebSocket = None):
-        message_str = json.dumps(message)
-        connections_to_remove = []
-        
-        print(f"Sending to group {group_id}: {message_str}")
-        
-        for connection in self.groups[group_id]:
-            if exclude_websocket and connection == exclude_websocket:
+        try:
+            await self.backplane.publish(event)
+        except Exception as e:
+            # The membership change has committed; at least close ours
+            print(f"Revoke for group {group_id} not published: {e}")
+            await self.handle_event(event)
+
+    def send_to_group(self, group_id: str, message: dict, exclude_websocket: WebSocket = None, key: str = None):
+        """Queue `message` on every local socket in the group. Returns as soon
+        as it is queued; each connection's writer task does the sending."""
+        if group_id not in self.groups:
+            return
+        # Encoded once per protocol in use, not once per socket
+        frames = {}
+        stats = self.send_stats[group_id]
+        for websocket, connection in self.groups[group_id].items():
+            if exclude_websocket and websocket == exclude_websocket:
                 continue
-                
+            codec = connection.codec
+            if codec.name not in frames:
+                frames[codec.name] = codec.encode(message)
+            stats[connection.enqueue(frames[codec.name], key)] += 1
+
+    async def publish_message(self, group_id: str, message: dict):
+        await self.backplane.publish({
+            "origin": self.worker_id,
+            "kind": "message",
+            "groupId": group_id,
+            "message": message
+        })
+
+    async def broadcast_online_count(self, group_id: str, heartbeat: bool = False):
+        await self.backplane.publish({
+            "origin": self.worker_id,
+            "kind": "presence",
+            "groupId": group_id,
+            "users": self.presence.users(group_id),
+            "heartbeat": heartbeat
+        })
+
+    def _debounce(self, pending: dict, group_id: str, action):
+        """Run `action(group_id)` once, PRESENCE_DEBOUNCE_SECONDS from the
+        first of any number of calls for the group in the meantime."""
+        if group_id in pending:
+            return
+
+        async def later():
+            await asyncio.sleep(PRESENCE_DEBOUNCE_SECONDS)
+            # Removed first: a change while `action` runs schedules another round
+            del pending[group_id]
+            await action(group_id)
+
+        pending[group_id] = asyncio.create_task(later())
+        pending[group_id].add_done_callback(log_task_failure)
+
+    def presence_changed(self, group_id: str):
+        self._debounce(self.pending_presence, group_id, self.broadcast_online_count)
+
+    async def send_online_count(self, group_id: str):
+        if group_id in self.groups:
+            count = self.get_active_members(group_id)
+            self.count_snapshots[group_id] = (count, time.monotonic())
+            online_message = {
+                "type": "online_count",
+                "count": count,
+                "group_id": group_id
+            }
+            self.send_to_group(group_id, online_message, key="online_count")
+
+    async def handle_event(self, event: dict):
+        group_id = event["groupId"]
+        if event["kind"] == "message":
+            message = event["message"]
+            self.send_to_group(group_id, message)
+            recent_messages.append(group_id, {
+                "id": message["id"],
+                "user": message["user"],
+                "username": message["username"],
+                "message": message["message"],
+                "timestamp": message["timestamp"]
+            })
+
+        elif event["kind"] == "revoke":
+            user_id = event["userId"]
+            # The write went through one worker; every other one may still
+            # have the old role cached
+            if user_id is None:
+                # The whole group is gone, its history with it
+                membership.invalidate_group(group_id)
+                recent_messages.drop(group_id)
+            else:
+                membership.invalidate(user_id, group_id)
+            closed = False
+            for websocket in list(self.groups.get(group_id, {})):
+                entry = self.presence.connections.get(websocket)
+                if user_id is None or (entry is not None and entry[1] == user_id):
+                    closed = self.disconnect(group_id, websocket, NOT_A_MEMBER_CLOSE_CODE) or closed
+            if closed:
+                self.presence_changed(group_id)
+
+        elif event["kind"] == "presence":
+            origin = event["origin"]
+            if origin != self.worker_id:
+                if event["users"]:
+                    self.remote_users[group_id][origin] = (event["users"], time.monotonic())
+                else:
+                    self.remote_users[group_id].pop(origin, None)
+                    if not self.remote_users[group_id]:
+                        del self.remote_users[group_id]
+            # Heartbeats only refresh the counts, they don't change them
+            if group_id in self.groups and not event.get("heartbeat"):
+                self._debounce(self.pending_count_frames, group_id, self.send_online_count)
+
+    def prune_remote_users(self):
+        """Forget the counts of workers silent for PRESENCE_TTL (crashed, not
+        shut down), and groups left with none."""
+        cutoff = time.monotonic() - PRESENCE_TTL
+        for group_id in list(self.remote_users):
+            workers = self.remote_users[group_id]
+            for origin in [origin for origin, (_, seen) in workers.items() if seen < cutoff]:
+                del workers[origin]
+            if not workers:
+                del self.remote_users[group_id]
+
+    def online_users(self, group_id: str):
+        """{user_id: username} of everyone online in the group, on any worker."""
+        users = {}
+        cutoff = time.monotonic() - PRESENCE_TTL
+        for remote, seen in self.remote_users.get(group_id, {}).values():
+            if seen >= cutoff:
+                users.update(remote)
+        users.update(self.presence.users(group_id))
+        return users
+
+    def online_groups(self, user_id: str):
+        """Groups `user_id` is online in, on any worker."""
+        groups = self.presence.groups_of(user_id)
+        cutoff = time.monotonic() - PRESENCE_TTL
+        for group_id, workers in self.remote_users.items():
+            if group_id not in groups and any(
+                user_id in remote and seen >= cutoff for remote, seen in workers.values()
+            ):
+                groups.add(group_id)
+        return groups
+
+    def get_active_members(self, group_id: str):
+        return len(self.online_users(group_id))
+
+    def get_online_count(self, group_id: str):
+        """get_active_members, recomputed at most once per debounce window."""
+        now = time.monotonic()
+        snapshot = self.count_snapshots.get(group_id)
+        if snapshot is None or now - snapshot[1] >= PRESENCE_DEBOUNCE_SECONDS:
+            snapshot = (self.get_active_members(group_id), now)
+            # Kept only while the group has sockets here (disconnect drops it)
+            if group_id in self.groups:
+                self.count_snapshots[group_id] = snapshot
+        return snapshot[0]
+
+    def get_metrics(self):
+        groups = {}
+        totals = collections.Counter(self.send_totals)
+        for group_id, connections in self.groups.items():
+            depths = [len(connection.queue) for connection in connections.values()]
+            stats = self.send_stats.get(group_id, collections.Counter())
+            totals.update(stats)
+            groups[group_id] = {
+                "connections": len(depths),
+                "queuedFrames": sum(depths),
+                "maxQueueDepth": max(depths, default=0),
+                "dropped": stats["dropped"],
+                "coalesced": stats["coalesced"],
+                "evicted": stats["evicted"]
+            }
+        return {
+            "policy": OVERFLOW_POLICY,
+            "queueSize": SEND_QUEUE_SIZE,
+            "groups": groups,
+            # Every group this worker has served, including those now empty
+            "totals": {
+                "dropped": totals["dropped"],
+                "coalesced": totals["coalesced"],
+                "evicted": totals["evicted"]
+            },
+            "membership": membership.metrics()
+        }
+
+    async def receive(self):
+        """Deliver backplane events to handle_event, restarting the receiver
+        whenever it stops, so one failure doesn't cut this worker off."""
+        while True:
             try:
-                await connection.send_text(message_str)
-                print(f"Message sent to connection successfully")
+                await self.backplane.run(self.handle_event)
+                print("Chat backplane receiver stopped, restarting")
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                print(f"Failed to send message to connection: {e}")
-                connections_to_remove.append(connection)
-        for connection in connections_to_remove:
-            self.disconnect(group_id, connection)
-
-    async def broadcast_online_count(self, group_id: str):
-        online_count = self.get_active_members(group_id)
-        online_message = {
-            "type": "online_count",
-            "count": online_count,
-            "group_id": group_id
-        }
-        await self.send_to_group(group_id, online_message)
+                print(f"Chat backplane receiver failed, restarting: {e}")
+            await asyncio.sleep(RECEIVER_RESTART_SECONDS)
 
-    def get_active_members(self, group_id: str):
-        return len(self.groups[group_id])
+    async def run(self):
+        """Receive backplane events and keep this worker's counts fresh on the
+        others. Runs for the lifetime of the app."""
+        receiver = asyncio.create_task(self.receive())
+        try:
+            while True:
+                await asyncio.sleep(PRESENCE_HEARTBEAT_SECONDS)
+                self.prune_remote_users()
+                for group_id in list(self.groups):
+                    # A failed heartbeat is retried by the next one
+                    try:
+                        await self.broadcast_online_count(group_id, heartbeat=True)
+                    except Exception as e:
+                        print(f"Presence heartbeat for group {group_id} failed: {e}")
+        finally:
+            receiver.cancel()
 
-manager = GroupConnectionManager()
+    async def close(self):
+        for task in [*self.pending_presence.values(), *self.pending_count_frames.values()]:
+            task.cancel()
+        # Tell the other workers our sockets are gone
+        for group_id in list(self.groups):
+            for websocket, connection in self.groups.pop(group_id).items():
+                connection.close()
+                self.presence.remove(websocket)
+            self.send_totals.update(self.send_stats.pop(group_id, {}))
+            self.count_snapshots.pop(group_id, None)
+            try:
+                await self.broadcast_online_count(group_id)
+            except Exception as e:
+                print(f"Presence for group {group_id} not published on shutdown: {e}")
+
+manager = GroupConnectionManager(get_backplane())
+message_writer = MessageWriter(chat_db.chat)
+
+async def receive_frame(websocket: WebSocket, codec):
+    if codec.binary:
+        return codec.decode(await websocket.receive_bytes())
+    return codec.decode(await websocket.receive_text())
 
 @chat_engine.websocket("/ws/{group_id}")
 async def group_chat(
@@ -82,45 +370,68 @@ async def group_chat(
     group_id: str,
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    user_id = None
-    username = None
+    user_id = websocket.query_params.get("userId")
+    username = websocket.query_params.get("username")
     
     try:
-        await manager.connect(group_id, websocket)
-        print(f"WebSocket connected for group {group_id}")
+        codec = await manager.accept(websocket)
+        
+        # The socket is authorized before it joins the group: the member is
+        # named in the query or by the identify frame it sends first
+        if user_id is None:
+            try:
+                data = await asyncio.wait_for(receive_frame(websocket, codec), IDENTIFY_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                data = {}
+            if data.get("type") == "identify":
+                user_id = data.get("user")
+                username = data.get("username")
+        if not user_id or await membership.role(db, user_id, group_id) is None:
+            print(f"Rejected {user_id}: not a member of group {group_id}")
+            await websocket.close(code=NOT_A_MEMBER_CLOSE_CODE)
+            return
+        username = username or "Anonymous"
+        
+        connection = manager.connect(group_id, websocket, codec, user_id, username)
+        print(f"WebSocket connected for group {group_id} ({codec.name}): {username} ({user_id})")
         
         while True:
-            data = await websocket.receive_json()
-            print(f"Received data: {data}")
+            data = await receive_frame(websocket, codec)
             message_type = data.get("type", "message")
+
+            # A socket speaks only for the member it was authorized as
+            if message_type in ("identify", "message") and data.get("user", user_id) != user_id:
+                manager.disconnect(group_id, websocket, NOT_A_MEMBER_CLOSE_CODE)
+                manager.presence_changed(group_id)
+                break
             
             if message_type == "identify":
-                user_id = data.get("user", "anonymous")
-                username = data.get("username", "Anonymous")
+                username = data.get("username") or username
                 
                 print(f"User identified: {username} ({user_id})")
-                connection_key = f"{group_id}_{id(websocket)}"
-                if connection_key in manager.user_info:
-                    manager.user_info[connection_key].update({
-                        "user_id": user_id,
-                        "username": username
-                    })
-                await manager.broadcast_online_count(group_id)
+                manager.identify(group_id, websocket, user_id, username)
                 continue
             
             elif message_type == "message":
-                user_id = data.get("user", "anonymous")
-                username = data.get("username", "Anonymous")
+                # JSON clients repeat their identity; msgpack ones rely on identify
+                username = data.get("username", username) or "Anonymous"
                 message = data.get("message", "")
                 
-                if not message.strip():
+                if not isinstance(message, str) or not message.strip():
+                    continue
+                if len(message) > MAX_MESSAGE_LENGTH:
+                    connection.enqueue(codec.encode({
+                        "type": "error",
+                        "error": "message_too_long",
+                        "maxLength": MAX_MESSAGE_LENGTH
+                    }))
                     continue
-                
-                print(f"Processing message from {username}: {message}")
                 
                 timestamp = datetime.now(timezone.utc)
                 
+                # Id assigned here so the message can go out before it is saved
                 chat_doc = {
+                    "_id": ObjectId(),
                     "groupId": group_id,
                     "senderId": user_id,
                     "senderName": username,
@@ -128,11 +439,9 @@ async def group_chat(
                     "timestamp": timestamp
                 }
                 
-                result = await db.chat.insert_one(chat_doc)
-                print(f"Message saved to DB with ID: {result.inserted_id}")
                 broadcast_message = {
                     "type": "message",
-                    "id": str(result.inserted_id),
+                    "id": str(chat_doc["_id"]),
                     "user": user_id,
                     "username": username,
                     "message": message,
@@ -140,8 +449,8 @@ async def group_chat(
                     "group_id": group_id
                 }
                 
-                print(f"Broadcasting message to {len(manager.groups[group_id])} connections")
-                await manager.send_to_group(group_id, broadcast_message)
+                await manager.publish_message(group_id, broadcast_message)
+                await message_writer.add(chat_doc)
                 
     except WebSocketDisconnect:
         print(f"WebSocket disconnected for group {group_id}")
@@ -150,48 +459,81 @@ async def group_chat(
         import traceback
         traceback.print_exc()
     finally:
-        manager.disconnect(group_id, websocket)
-
-        await manager.broadcast_online_count(group_id)
+        if manager.disconnect(group_id, websocket):
+            manager.presence_changed(group_id)
         print(f"Cleaned up connection for group {group_id}")
 
 @chat_engine.get("/history/{group_id}", dependencies=[Depends(verify_chat_api)])
-async def get_messages(group_id: str, db=Depends(get_db)):
+async def get_messages(
+    group_id: str,
+    before: Optional[str] = None,
+    limit: int = Query(RECENT_MESSAGES, ge=1, le=MAX_PAGE_SIZE),
+    db=Depends(get_db)
+):
+    # Oldest first; `next` is the `before` for the page of older messages
     try:
-        cursor = db.chat.find({"groupId": group_id}).sort("timestamp", -1)
-        prev_messages = await cursor.to_list(length=100)
-
-        messages_with_usernames = []
-        for msg in reversed(prev_messages):
-            sender_id = msg.get("senderId", "anonymous")
-            username = msg.get("senderName")
-            if not username:
-                user_data = await db.user.find_one({"_id": sender_id})
-                username = user_data["name"] if user_data else "Anonymous"
-            timestamp = msg.get("timestamp")
-            if timestamp:
-                if isinstance(timestamp, datetime):
-                    formatted_ts = timestamp.isoformat()
-                else:
-                    formatted_ts = timestamp
-            else:
-                formatted_ts = datetime.now(timezone.utc).isoformat()
-
-            messages_with_usernames.append({
-                "id": str(msg.get("_id", "")),
-                "user": sender_id,
-                "username": username,
-                "message": msg.get("message", ""),
-                "timestamp": formatted_ts
-            })
-
-        return messages_with_usernames
+        items, has_older = await history_page(db, group_id, before, limit)
+        return page_response(items, items[0]["id"] if has_older and items else None)
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching message history: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@chat_engine.get("/search/{group_id}", dependencies=[Depends(verify_chat_api)])
+async def search_messages(
+    group_id: str,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db=Depends(get_db)
+):
+    terms = search_terms(q)
+    if not terms:
+        return page_response([], None)
+
+    try:
+        pipeline = chat_search_pipeline(group_id, terms, cursor=cursor, limit=limit)
+        docs = await db.chat.aggregate(pipeline).to_list(length=limit + 1)
+        page, next_cursor = next_chat_search_cursor(docs, limit)
+        items = await render_history(db, page)
+
+        return page_response(
+            [
+                {**item, "score": doc["score"], **highlight(item["message"], terms)}
+                for item, doc in zip(items, page)
+            ],
+            next_cursor
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error searching messages: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@chat_engine.get('/metrics', dependencies=[Depends(verify_chat_api)])
+def get_chat_metrics():
+    return manager.get_metrics()
+
+@chat_engine.get('/online/{group_id}', dependencies=[Depends(verify_chat_api)])
+def get_online_users(group_id: str):
+    users = manager.online_users(group_id)
+    return {
+        "group_id": group_id,
+        "count": len(users),
+        "users": [
+            {"userId": user_id, "username": username}
+            for user_id, username in sorted(users.items(), key=lambda item: item[1] or "")
+        ]
+    }
+
+@chat_engine.get('/online/user/{user_id}', dependencies=[Depends(verify_chat_api)])
+def get_user_online_groups(user_id: str):
+    return {"user_id": user_id, "groups": sorted(manager.online_groups(user_id))}
+
 @chat_engine.get('/onlinemembers/{group_id}', dependencies=[Depends(verify_chat_api)])
 def get_online_members(group_id: str):
-    online_count = manager.get_active_members(group_id)
+    online_count = manager.get_online_count(group_id)
     return {"online": online_count, "group_id": group_id}
\ No newline at end of file
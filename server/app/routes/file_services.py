@@ -1,9 +1,10 @@
-from app.db.connection import get_db,get_fs
+from app.db.connection import get_db
+from app.storage import get_storage, get_backend
 from app.db.collections import files,activities
-from fastapi import APIRouter, UploadFile, File, HTTPException,Request,Depends,Form,Query
-from fastapi.responses import StreamingResponse
-from io import BytesIO
-from app.models.file_model import File as FileModel, FileAccess
+from fastapi import APIRouter, UploadFile, File, HTTPException,Request,Depends,Form,Query,BackgroundTasks
+from fastapi.responses import StreamingResponse, FileResponse, Response
+from email.utils import format_datetime
+from app.models.file_model import File as FileModel, FileAccess, UploadSessionInit, UploadSessionAccess, ZipDownloadModel
 from starlette.status import HTTP_403_FORBIDDEN, HTTP_404_NOT_FOUND
 from datetime import datetime,timezone
 from bson import ObjectId, Int64
@@ -11,6 +12,16 @@ from dotenv import load_dotenv
 load_dotenv()
 import os
 from app.utils.auth_util import verify_role
+from app.utils.upload_sessions import MAX_CHUNK_SIZE, create_session, get_session, store_chunk, received_chunks, complete_session
+from app.utils.file_utils import iter_upload_file, stream_to_storage, commit_file, release_blob, delete_released, seed_stored_bytes, iter_file_content, parse_range_header, if_range_matches
+from app.utils.zip_stream import ZIP_BATCH_SIZE, iter_zip
+from app.utils.group_utils import record_activity, record_activities, frequency_inc
+from app.utils.compression import accepts_gzip, iter_decompressed_range
+from app.utils.previews import generate_preview
+from app.utils.file_search import search_pipeline, next_search_cursor
+from app.utils.response_cache import response_cache
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, page_response
+from typing import Optional
 
 file_engine = APIRouter(prefix="/file")
 
@@ -26,82 +37,128 @@ def verify_file_api(request : Request):
 
 @file_engine.post("/upload", dependencies=[Depends(verify_file_api)]) 
 async def upload_file(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     contentType: str = Form(...),
     userId: str = Form(...),
     groupId: str = Form(...),
     db = Depends(get_db),
-    fs = Depends(get_fs)
+    storage = Depends(get_storage)
 ):
     # Role check first
     print(f"User ID: {userId}, Group ID: {groupId}, Content Type: {contentType}")
     await verify_role(user_id=userId, group_id=groupId, roles={"owner", "admin", "editor"})
 
-    async with await db.client.start_session() as session:
-        async with session.start_transaction():
-            try:
-                contents = await file.read()
-                file_id = await fs.upload_from_stream(file.filename, contents)
-
-                file_size = Int64(len(contents))
-
-                # Insert file metadata
-                file_data = {
-                    "name": file.filename,
-                    "uploadedBy": userId,
-                    "uploadedAt": datetime.now(timezone.utc),
-                    "GridFSId": file_id,
-                    "size": file_size,
-                    "groupId": groupId,
-                    "contentType": contentType,
-                    "pinned": False
-                }
-
-                insert_result = await db.files.insert_one(file_data, session=session)
-
-                owner_doc = await db.groupMembers.find_one(
-                    {"groupId": groupId, "role": "owner"},
-                    {"_id": 0, "userId": 1},
-                    session=session
-                )
-
-                if owner_doc is not None:
-                    await db.user.update_one(
-                        {"_id": owner_doc["userId"]},
-                        {"$inc": {"storageUsed": file_size}},
-                        session=session
-                    )
-
-                await db.group.update_one(
-                    {"_id": groupId},
-                    {"$inc": {"storageUsed": file_size}},
-                    session=session
-                )
+    try:
+        stored = await stream_to_storage(storage, iter_upload_file(file), file.filename, contentType)
+        response = await commit_file(
+            db,
+            storage,
+            stored,
+            filename=file.filename,
+            content_type=contentType,
+            user_id=userId,
+            group_id=groupId
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
-                activity_data = {
-                    "userId": userId,
-                    "groupId": groupId,
-                    "activityType": "FILE_UPLOADED",
-                    "fileId": insert_result.inserted_id,
-                    "timestamp": datetime.now(timezone.utc)
-                }
+    response_cache.invalidate(("activity", groupId), ("storage", groupId))
+    # Rendered after the response is sent, in a worker process
+    background_tasks.add_task(generate_preview, db, ObjectId(response["file_id"]))
+    return response
 
-                await db.activities.insert_one(activity_data, session=session)
+@file_engine.post("/session/init", dependencies=[Depends(verify_file_api)])
+async def init_upload_session(
+    data: UploadSessionInit,
+    db = Depends(get_db)
+):
+    await verify_role(user_id=data.userId, group_id=data.groupId, roles={"owner", "admin", "editor"})
+
+    upload_session = await create_session(
+        db,
+        user_id=data.userId,
+        group_id=data.groupId,
+        filename=data.filename,
+        content_type=data.contentType,
+        size=data.size,
+        chunk_size=data.chunkSize
+    )
+    return {
+        "sessionId": upload_session["_id"],
+        "chunkSize": upload_session["chunkSize"],
+        "totalChunks": upload_session["totalChunks"]
+    }
+
+@file_engine.put("/session/{session_id}/chunk/{index}", dependencies=[Depends(verify_file_api)])
+async def upload_session_chunk(
+    session_id: str,
+    index: int,
+    request: Request,
+    userId: str = Query(...),
+    db = Depends(get_db)
+):
+    # The chunk is the raw request body, read as it arrives and refused once
+    # it passes MAX_CHUNK_SIZE, whether or not Content-Length said so
+    upload_session = await get_session(db, session_id, userId)
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=413, detail="Chunk too large")
+    parts, received = [], 0
+    async for part in request.stream():
+        received += len(part)
+        if received > MAX_CHUNK_SIZE:
+            raise HTTPException(status_code=413, detail="Chunk too large")
+        parts.append(part)
+    data = b"".join(parts)
+    await store_chunk(db, upload_session, index, data)
+    return {"sessionId": session_id, "index": index, "size": len(data)}
+
+@file_engine.get("/session/{session_id}", dependencies=[Depends(verify_file_api)])
+async def upload_session_status(
+    session_id: str,
+    userId: str = Query(...),
+    db = Depends(get_db)
+):
+    upload_session = await get_session(db, session_id, userId)
+    received = await received_chunks(db, session_id)
+    return {
+        "sessionId": session_id,
+        "status": upload_session["status"],
+        "size": upload_session["size"],
+        "chunkSize": upload_session["chunkSize"],
+        "totalChunks": upload_session["totalChunks"],
+        "receivedChunks": received,
+        "fileId": str(upload_session["fileId"]) if upload_session["fileId"] else None
+    }
+
+@file_engine.post("/session/{session_id}/complete", dependencies=[Depends(verify_file_api)])
+async def complete_upload_session(
+    session_id: str,
+    data: UploadSessionAccess,
+    background_tasks: BackgroundTasks,
+    db = Depends(get_db),
+    storage = Depends(get_storage)
+):
+    upload_session = await get_session(db, session_id, data.userId)
+    await verify_role(user_id=data.userId, group_id=upload_session["groupId"], roles={"owner", "admin", "editor"})
 
-                return {
-                    "file_id": str(insert_result.inserted_id),
-                    "filename": file.filename,
-                    "size": file_size
-                }
+    try:
+        response = await complete_session(db, storage, upload_session)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    if upload_session["status"] != "completed":
+        response_cache.invalidate(("activity", upload_session["groupId"]), ("storage", upload_session["groupId"]))
+        background_tasks.add_task(generate_preview, db, ObjectId(response["file_id"]))
+    return response
 
 @file_engine.delete("/delete", dependencies=[Depends(verify_file_api)])
 async def delete_file(
     data: FileAccess,
-    db=Depends(get_db),
-    fs=Depends(get_fs)
+    db=Depends(get_db)
 ):
     async with await db.client.start_session() as session:
         async with session.start_transaction():
@@ -110,7 +167,7 @@ async def delete_file(
 
                 filedata = await db.files.find_one(
                     {"_id": ObjectId(file_id)},
-                    {"GridFSId": 1, "groupId": 1, "size": 1},
+                    {"GridFSId": 1, "storage": 1, "groupId": 1, "size": 1, "storedSize": 1, "contentHash": 1, "contentType": 1},
                     session=session
                 )
 
@@ -137,21 +194,29 @@ async def delete_file(
                 owner_id = owner_doc["userId"]
 
                 # Decrement storage usage
+                stored_size = filedata.get("storedSize", filedata["size"])
+                await seed_stored_bytes(db.user, owner_id, session=session)
                 await db.user.update_one(
                     {"_id": owner_id},
-                    {"$inc": {"storageUsed": -filedata["size"]}},
+                    {"$inc": {"storageUsed": -filedata["size"], "storedBytes": -stored_size}},
                     session=session
                 )
 
+                await seed_stored_bytes(db.group, filedata["groupId"], session=session)
                 await db.group.update_one(
                     {"_id": filedata["groupId"]},
-                    {"$inc": {"storageUsed": -filedata["size"]}},
+                    {"$inc": {
+                        "storageUsed": -filedata["size"],
+                        "storedBytes": -stored_size,
+                        **frequency_inc(filedata.get("contentType"), -filedata["size"], files=-1)
+                    }},
                     session=session
                 )
 
-                # Delete file from GridFS and DB
-                await fs.delete(filedata["GridFSId"])
+                # Drop the blob reference; the stored blob goes only with the last one
+                released = await release_blob(db, filedata, session=session)
                 await db.files.delete_one({"_id": ObjectId(file_id)}, session=session)
+                await db.previews.delete_one({"_id": ObjectId(file_id)}, session=session)
 
                 # Log activity
                 activity_data = {
@@ -162,117 +227,327 @@ async def delete_file(
                     "timestamp": datetime.now(timezone.utc)
                 }
 
-                await db.activities.insert_one(activity_data, session=session)
-
-                return {"message": f"{file_id} file deleted successfully"}
+                await record_activity(db, activity_data, session=session)
 
             except Exception as e:
                 print(e)
                 raise HTTPException(status_code=500, detail=f"Deletion failed: {str(e)}")
 
-@file_engine.post("/download")
-async def download_file(
-    data: FileAccess,
+    response_cache.invalidate(("activity", filedata["groupId"]), ("storage", filedata["groupId"]))
+
+    # Only remove the bytes once the metadata changes have committed
+    if released is not None:
+        await delete_released([released])
+
+    return {"message": f"{file_id} file deleted successfully"}
+
+async def _download_response(
+    file_id: str,
+    user_id: str,
     request: Request,
-    db=Depends(get_db),
-    fs=Depends(get_fs)
+    db
 ):
     try:
-        file_id = data.fileId
         file_data = await db.files.find_one({'_id': ObjectId(file_id)})
 
         if file_data is None:
             raise HTTPException(status_code=404, detail="File data not found")
-        
+
         await verify_role(
-                    user_id=data.userId,
+                    user_id=user_id,
                     group_id=file_data["groupId"],
                     roles={"owner","admin","editor","viewer"}
                 )
 
-        gridfs_id = file_data['GridFSId']
+        blob_id = file_data['GridFSId']
         content_type = file_data['contentType']
         filename = file_data['name']
 
-        grid_out = await fs.open_download_stream(gridfs_id)
-        file_content = await grid_out.read()
+        reader = await get_backend(file_data.get("storage")).open_reader(blob_id)
+        compressed = file_data.get("compression") == "gzip"
+        # Ranges always address the original (logical) bytes
+        file_size = file_data["size"] if compressed else reader.length
 
-        activity_data = {
-            "userId": data.userId,
-            "groupId": file_data["groupId"],
-            "activityType": "FILE_DOWNLOADED",
-            "fileId": ObjectId(file_id),
-            "timestamp": datetime.now(timezone.utc)
+        # Blob content never changes under the same id, so the id is a strong validator.
+        etag = f'"{blob_id}"'
+        last_modified = format_datetime(reader.upload_date.replace(tzinfo=timezone.utc), usegmt=True)
+
+        byte_range = None
+        if if_range_matches(request.headers.get("if-range"), etag, last_modified):
+            byte_range = parse_range_header(request.headers.get("range"), file_size)
+
+        headers = {
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Accept-Ranges": "bytes",
+            "ETag": etag,
+            "Last-Modified": last_modified
         }
+        if compressed:
+            headers["Vary"] = "Accept-Encoding"
+
+        # A whole-file request from a gzip-capable client gets the stored
+        # gzip stream as is, with no inflate/deflate on either side.
+        passthrough = compressed and byte_range is None and accepts_gzip(request.headers.get("accept-encoding"))
+
+        if passthrough:
+            start, end = 0, file_size - 1
+            status_code = 200
+            headers["ETag"] = f'"{blob_id}-gzip"'
+            headers["Content-Encoding"] = "gzip"
+        elif byte_range is None:
+            start, end = 0, file_size - 1
+            status_code = 200
+        else:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+        headers["Content-Length"] = str(reader.length if passthrough else end - start + 1)
+
+        # Players seeking through a file issue many ranged requests; only the
+        # one that starts at the beginning counts as a download.
+        if start == 0:
+            activity_data = {
+                "userId": user_id,
+                "groupId": file_data["groupId"],
+                "activityType": "FILE_DOWNLOADED",
+                "fileId": ObjectId(file_id),
+                "timestamp": datetime.now(timezone.utc)
+            }
 
-        await db.activities.insert_one(activity_data)
+            await record_activity(db, activity_data)
+            response_cache.invalidate(("activity", file_data["groupId"]))
+
+        if passthrough:
+            body = reader.iter_range(0, reader.length - 1)
+        elif compressed:
+            body = iter_decompressed_range(reader.iter_range(0, reader.length - 1), start, end)
+        elif reader.path is not None:
+            # Local blobs are plain files: let FileResponse send them (and
+            # answer the Range itself) instead of copying through Python.
+            return FileResponse(
+                reader.path,
+                media_type=content_type,
+                filename=filename,
+                headers={"ETag": etag, "Last-Modified": last_modified}
+            )
+        else:
+            body = reader.iter_range(start, end)
 
         return StreamingResponse(
-            BytesIO(file_content),
-            status_code=200,
+            body,
+            status_code=status_code,
             media_type=content_type,
+            headers=headers
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@file_engine.post("/download")
+async def download_file(
+    data: FileAccess,
+    request: Request,
+    db=Depends(get_db)
+):
+    return await _download_response(data.fileId, data.userId, request, db)
+
+@file_engine.get("/download/{file_id}")
+async def download_file_by_id(
+    file_id: str,
+    request: Request,
+    userId: str = Query(...),
+    db=Depends(get_db)
+):
+    # GET variant so media players and download managers can issue Range requests directly.
+    return await _download_response(file_id, userId, request, db)
+
+@file_engine.get("/preview/{file_id}")
+async def get_preview(
+    file_id: str,
+    request: Request,
+    userId: str = Query(...),
+    db=Depends(get_db)
+):
+    # GET without the API key, like /download/{file_id}, so it can be an <img> src
+    try:
+        preview = await db.previews.find_one({"_id": ObjectId(file_id)})
+        if preview is None:
+            raise HTTPException(status_code=404, detail="Preview not found")
+
+        await verify_role(
+                    user_id=userId,
+                    group_id=preview["groupId"],
+                    roles={"owner","admin","editor","viewer"}
+                )
+
+        etag = f'"{preview["etag"]}"'
+        headers = {"ETag": etag, "Cache-Control": "private, max-age=86400"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+
+        return Response(
+            content=bytes(preview["data"]),
+            media_type=preview["contentType"],
+            headers=headers
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@file_engine.post("/download/zip")
+async def download_zip(
+    data: ZipDownloadModel,
+    db=Depends(get_db)
+):
+    try:
+        projection = {"name": 1, "size": 1, "uploadedAt": 1, "groupId": 1, "GridFSId": 1, "storage": 1, "compression": 1}
+
+        if data.groupId is not None:
+            query = {"groupId": data.groupId}
+        elif data.fileIds:
+            query = {"_id": {"$in": [ObjectId(file_id) for file_id in data.fileIds]}}
+        else:
+            raise HTTPException(status_code=400, detail="fileIds or groupId is required")
+
+        # Checked up front, before the response starts; the file metadata
+        # itself is only read while the archive streams
+        group_ids = [data.groupId] if data.groupId is not None else await db.files.distinct("groupId", query)
+        if await db.files.find_one(query, {"_id": 1}) is None:
+            raise HTTPException(status_code=404, detail="No files found")
+
+        # One role check per group, not per file
+        for group_id in group_ids:
+            await verify_role(
+                user_id=data.userId,
+                group_id=group_id,
+                roles={"owner","admin","editor","viewer"}
+            )
+
+        async def record_downloads(batch):
+            timestamp = datetime.now(timezone.utc)
+            try:
+                await record_activities(db, [
+                    {
+                        "userId": data.userId,
+                        "groupId": doc["groupId"],
+                        "activityType": "FILE_DOWNLOADED",
+                        "fileId": doc["_id"],
+                        "timestamp": timestamp
+                    }
+                    for doc in batch
+                ])
+            except Exception as e:
+                # The archive is already streaming; don't cut it short
+                print(f"Download activity not recorded: {e}")
+            response_cache.invalidate(*{("activity", doc["groupId"]) for doc in batch})
+
+        async def entries():
+            # ZIP_BATCH_SIZE documents in memory at a time, however many files
+            cursor = db.files.find(query, projection).sort("_id", 1).batch_size(ZIP_BATCH_SIZE)
+            batch = []
+            async for doc in cursor:
+                batch.append(doc)
+                if len(batch) < ZIP_BATCH_SIZE:
+                    continue
+                await record_downloads(batch)
+                for entry in batch:
+                    yield entry["name"], entry["size"], entry["uploadedAt"], iter_file_content(entry)
+                batch = []
+            if batch:
+                await record_downloads(batch)
+                for entry in batch:
+                    yield entry["name"], entry["size"], entry["uploadedAt"], iter_file_content(entry)
+
+        archive_name = f"{data.groupId}.zip" if data.groupId else "files.zip"
+
+        return StreamingResponse(
+            iter_zip(entries()),
+            media_type="application/zip",
             headers={
-                "Content-Disposition": f'attachment; filename="{filename}"'
+                "Content-Disposition": f'attachment; filename="{archive_name}"'
             }
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @file_engine.get("/search/{filename}",dependencies=[Depends(verify_file_api)])
 async def search_file(
     filename,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db=Depends(get_db)
     ):
 
-    match=db.files.find({
-        "name" : {
-            "$regex" : f"{filename}",
-            "$options" : "i"
-        }
-    })
+    pipeline = search_pipeline(filename, cursor=cursor, limit=limit, projection={"name": 1})
+    result = await db.files.aggregate(pipeline).to_list(length=limit + 1)
+    page, next_cursor = next_search_cursor(result, limit)
 
-    result=await match.to_list(length=None)
-    return [
-        {
-            "file_id":str(doc["_id"]),
-            "name":doc["name"]
-        }
-        for doc in result
-    ]
+    return page_response(
+        [
+            {
+                "file_id":str(doc["_id"]),
+                "name":doc["name"]
+            }
+            for doc in page
+        ],
+        next_cursor
+    )
 
 
 @file_engine.get("/{group_id}",dependencies=[Depends(verify_file_api)])
 async def get_files(
     group_id,
-    name,
+    name: str = "",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db=Depends(get_db)
     ):
 
     try:
-        cursor=db.files.find({
-            "groupId" : group_id,
-            "name" : {
-                "$regex" : name,
-                "$options" : "i"
+        pipeline = search_pipeline(
+            name,
+            group_id=group_id,
+            cursor=cursor,
+            limit=limit,
+            projection={
+                "name": 1,
+                "contentType": 1,
+                "size": 1,
+                "pinned": 1,
+                "uploadedAt": 1,
+                "uploadedBy": 1,
+                "preview": 1
             }
-        })
-        if cursor is None:
-            return []
-        matchfiles=await cursor.to_list(length=None)
-
-        return [
-            {
-                "file_id" : str(doc["_id"]),
-                "name" : doc["name"],
-                "contentType" : doc["contentType"],
-                "size" : doc["size"],
-                "pinned" : doc["pinned"],
-                "uploadedAt" : doc["uploadedAt"],
-                "uploadedBy" : doc["uploadedBy"]
-            }
-            for doc in matchfiles
-        ]
+        )
+        matchfiles = await db.files.aggregate(pipeline).to_list(length=limit + 1)
+        page, next_cursor = next_search_cursor(matchfiles, limit)
+
+        return page_response(
+            [
+                {
+                    "file_id" : str(doc["_id"]),
+                    "name" : doc["name"],
+                    "contentType" : doc["contentType"],
+                    "size" : doc["size"],
+                    "pinned" : doc["pinned"],
+                    "uploadedAt" : doc["uploadedAt"],
+                    "uploadedBy" : doc["uploadedBy"],
+                    "hasPreview" : doc.get("preview") == "ready"
+                }
+                for doc in page
+            ],
+            next_cursor
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
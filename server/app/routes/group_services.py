@@ -1,16 +1,20 @@
-from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi import APIRouter, Request, HTTPException, Depends, Query
 from starlette.status import HTTP_403_FORBIDDEN
 from dotenv import load_dotenv
 from app.db.connection import get_db 
 from app.db.collections import group, groupmembers, activities 
 from app.models.group_model import GroupCreateModel, GroupModifyModel, GroupSearchModel, GroupStarModel
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 from bson import ObjectId , int64
 import uuid
 import os
-from app.utils.group_utils import time_ago
+from app.utils.group_utils import time_ago, record_activity, empty_frequency, STORAGE_CATEGORIES
 from bson import Int64
+from typing import Optional
+from app.utils.response_cache import response_cache
+from app.utils.membership import membership
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, paginate, page_response
 
 load_dotenv()
 
@@ -43,14 +47,18 @@ async def create_group(
             group_id = groupname + "_" + uuid.uuid4().hex
             print(group_id)
             print(type(group_id))
+            created_at = datetime.now(timezone.utc)
             group_data = {
                 "_id": group_id,
                 "gname": groupname,
                 "description": create_data.description,
                 "createdBy": user_id,
-                "createdAt": datetime.now(timezone.utc),
+                "createdAt": created_at,
+                "lastActivityAt": created_at,
                 "starred" : False,
-                "storageUsed" : Int64(0)
+                "storageUsed" : Int64(0),
+                "storedBytes" : Int64(0),
+                "frequency" : empty_frequency()
             }
             await db.group.insert_one(group_data, session=session)
 
@@ -67,10 +75,12 @@ async def create_group(
                 "groupId": group_id,
                 "activityType": "GROUP_CREATED",
                 "fileId": None,
-                "timestamp": datetime.now(timezone.utc)
+                "timestamp": created_at
             }
             await db.activities.insert_one(activity_data, session=session)
 
+        membership.invalidate(user_id, group_id)
+        response_cache.invalidate(("user", user_id))
         return {
             "message": "Group created successfully",
             "groupId": group_id
@@ -88,13 +98,14 @@ async def rename_group_or_description(
     rename_data: GroupModifyModel,
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    async with await db.client.start_session() as session:
-        async with session.start_transaction():
-            try:
+    try:
+        async with await db.client.start_session() as session:
+            async with session.start_transaction():
                 # Update field dynamically
                 await db.group.update_one(
                     {"_id": rename_data.groupId},
-                    {"$set": {rename_data.fieldToUpdate: rename_data.newContent}}
+                    {"$set": {rename_data.fieldToUpdate: rename_data.newContent}},
+                    session=session
                 )
 
                 # Choose activity type
@@ -111,110 +122,170 @@ async def rename_group_or_description(
                     "timestamp": datetime.now(timezone.utc)
                 }
 
-                await db.activities.insert_one(activity_data)
+                await record_activity(db, activity_data, session=session)
 
-                return {
-                    "message": (
-                        "Group name changed successfully" 
-                        if rename_data.fieldToUpdate == "gname" 
-                        else "Group description changed successfully"
-                    )
-                }
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=str(e))
+        # Only once committed, so a concurrent read can't cache the old name
+        response_cache.invalidate(("group", rename_data.groupId), ("activity", rename_data.groupId))
+
+        return {
+            "message": (
+                "Group name changed successfully" 
+                if rename_data.fieldToUpdate == "gname" 
+                else "Group description changed successfully"
+            )
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def activity_position(doc: dict):
+    """Keyset position of a listing row: lastActivityAt as epoch milliseconds
+    (Mongo's own precision, so it round-trips exactly) and the groupId."""
+    at = doc.get("lastActivityAt")
+    if at is not None:
+        if at.tzinfo is None:
+            at = at.replace(tzinfo=timezone.utc)
+        at = (at - EPOCH) // timedelta(milliseconds=1)
+    return {"at": at, "groupId": doc["groupId"]}
+
+
+def after_activity_position(position: dict):
+    """Rows after `position` in (lastActivityAt desc, groupId desc) order.
+    Groups that never had any activity sort last."""
+    try:
+        at, group_id = position["at"], str(position["groupId"])
+        if at is not None:
+            at = EPOCH + timedelta(milliseconds=int(at))
+    except (KeyError, TypeError, ValueError, OverflowError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if at is None:
+        return {"lastActivityAt": None, "groupId": {"$lt": group_id}}
+    return {"$or": [
+        {"lastActivityAt": {"$lt": at}},
+        {"lastActivityAt": at, "groupId": {"$lt": group_id}},
+        {"lastActivityAt": None}
+    ]}
+
+
 @group_engine.get("/search/{user_id}/{name}", dependencies=[Depends(verify_group_api)])
 async def search(
     user_id: str,
     name: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     try:
-        async with await db.client.start_session() as session:
-            async with session.start_transaction():
-                try:
-                    if name == "__empty__":
-                        name = ""
-                    
-                    cursor = db.groupMembers.aggregate([
+        if name == "__empty__":
+            name = ""
+
+        key = ("search", user_id, name, limit, cursor)
+        found, cached = response_cache.get(key)
+        if found:
+            return cached
+        token = response_cache.token()
+
+        # One round trip: memberships, their groups and the user's stars,
+        # sorted by the group's lastActivityAt (kept by record_activity) and
+        # cut to the page in Mongo. Read-only, so no transaction.
+        pipeline = [
+            {
+                "$match": {
+                    "userId": user_id
+                }
+            },
+            {
+                "$lookup": {
+                    "from": "group",
+                    "localField": "groupId",
+                    "foreignField": "_id",
+                    "as": "rightj"
+                }
+            },
+            {
+                "$unwind": "$rightj"
+            }
+        ]
+        if name != "":
+            pipeline.append({
+                "$match": {
+                    "rightj.gname": {
+                        "$regex": name,
+                        "$options": "i"
+                    }
+                }
+            })
+
+        pipeline.append({
+            "$project": {
+                "_id": 0,
+                "groupId": 1,
+                "role": 1,
+                "gname": "$rightj.gname",
+                "lastActivityAt": {"$ifNull": ["$rightj.lastActivityAt", None]}
+            }
+        })
+
+        position = decode_cursor(cursor)
+        if position is not None:
+            pipeline.append({"$match": after_activity_position(position)})
+
+        pipeline += [
+            {
+                "$sort": {"lastActivityAt": -1, "groupId": -1}
+            },
+            {
+                "$limit": limit + 1
+            },
+            {
+                "$lookup": {
+                    "from": "starred",
+                    "let": {"groupId": "$groupId"},
+                    "pipeline": [
                         {
                             "$match": {
-                                "userId": user_id
+                                "userId": user_id,
+                                "$expr": {"$eq": ["$groupId", "$$groupId"]}
                             }
                         },
                         {
-                            "$lookup": {
-                                "from": "group",
-                                "localField": "groupId",
-                                "foreignField": "_id",
-                                "as": "rightj"
-                            }
-                        },
-                        {
-                            "$unwind": "$rightj"
-                        },
-                        {
-                            "$match": {
-                                "rightj.gname": {
-                                    "$regex": name,
-                                    "$options": "i"
-                                }
-                            }
+                            "$limit": 1
                         }
-                    ])
-                    
-                    result = await cursor.to_list(length=None)
-                    response = []
-                    
-                    for doc in result:
-                        group_id = doc["groupId"]
-                        role = doc["role"]
-                        gname = doc["rightj"]["gname"]
-                        
-                        latest_cursor = db.activities.find(
-                            {"groupId": group_id},
-                            sort=[("timestamp", -1)],
-                            limit=1
-                        )
-                        
-                        latest_list = await latest_cursor.to_list(length=1)
-                        latest_date = latest_list[0]["timestamp"] if latest_list else None
-                        
-                        starred = await db.starred.find_one({
-                            "userId": user_id,
-                            "groupId": group_id
-                        }) is not None
-                        
-                        response.append({
-                            "groupId": group_id,
-                            "groupName": gname,
-                            "role": role,
-                            "lastModified": latest_date,  # Store actual timestamp for sorting
-                            "starred": starred
-                        })
-                    
-                    # Sort by lastModified timestamp (most recent first)
-                    # Handle None values by putting them at the end
-                    response.sort(
-                        key=lambda x: x["lastModified"] if x["lastModified"] is not None else datetime.min,
-                        reverse=True
-                    )
-                    
-                    # Convert timestamps to human-readable format after sorting
-                    for item in response:
-                        item["lastModified"] = time_ago(item["lastModified"])
-                    
-                    print(response)
-                    return response
-                    
-                except Exception as e:
-                    print(e)
-                    raise HTTPException(
-                        status_code=500,
-                        detail=str(e)
-                    )
+                    ],
+                    "as": "stars"
+                }
+            }
+        ]
+
+        result = await db.groupMembers.aggregate(pipeline).to_list(length=limit + 1)
+        page, next_cursor = paginate(result, limit, activity_position)
+
+        response = page_response([
+            {
+                "groupId": doc["groupId"],
+                "groupName": doc["gname"],
+                "role": doc["role"],
+                "lastModified": time_ago(doc["lastActivityAt"]),
+                "starred": len(doc["stars"]) > 0
+            }
+            for doc in page
+        ], next_cursor)
+
+        # Any of the user's groups can move into this page, not just the
+        # ones on it
+        group_ids = await db.groupMembers.distinct("groupId", {"userId": user_id})
+        tags = [("user", user_id)]
+        tags += [(kind, group_id) for group_id in group_ids for kind in ("group", "activity")]
+        response_cache.put(key, response, tags, token)
+        return response
+
+    except HTTPException:
+        raise
     except Exception as e:
         print(e)
         raise HTTPException(
@@ -230,6 +301,12 @@ async def get_user_storage(
      db : AsyncIOMotorDatabase = Depends(get_db)
 ):
      try:
+          key = ("userstorage", user_id)
+          found, cached = response_cache.get(key)
+          if found:
+               return cached
+          token = response_cache.token()
+
           user_data=await db.user.find_one({
                "_id":user_id
           })
@@ -239,9 +316,16 @@ async def get_user_storage(
                     status_code=404,
                     detail="user not found"
                )
-          return {
-               "storageUsed":user_data["storageUsed"]
+          response = {
+               "storageUsed":user_data["storageUsed"],
+               "storedBytes":user_data.get("storedBytes", user_data["storageUsed"])
           }
+
+          # Uploads to any group the user owns count against the user
+          owned = await db.groupMembers.distinct("groupId", {"userId": user_id, "role": "owner"})
+          tags = [("user", user_id)] + [("storage", group_id) for group_id in owned]
+          response_cache.put(key, response, tags, token)
+          return response
      except Exception as e:
           raise HTTPException(
                status_code=500,
@@ -252,17 +336,28 @@ async def get_user_storage(
 async def get_group_storage(
     user_id: str,
     name: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     if name == "__empty__":
         name = ""
 
+    # Keyset on groupId, served by the (userId, role, groupId) index.
+    match = {
+        "userId": user_id,
+        "role": "owner"
+    }
+    position = decode_cursor(cursor)
+    if position is not None:
+        match["groupId"] = {"$gt": position.get("groupId")}
+
     pipeline = [
         {
-            "$match": {
-                "userId": user_id,
-                "role": "owner"
-            }
+            "$match": match
+        },
+        {
+            "$sort": {"groupId": 1}
         },
         {
             "$lookup": {
@@ -286,73 +381,11 @@ async def get_group_storage(
             }
         })
 
+    # The per-category breakdown is read off the group document (see
+    # app.utils.group_utils), so a page costs O(groups), not O(files).
     pipeline += [
         {
-            "$lookup": {
-                "from": "files",
-                "localField": "groupId",
-                "foreignField": "groupId",
-                "as": "files"
-            }
-        },
-        {
-            "$addFields": {
-                "categorized": {
-                    "$map": {
-                        "input": "$files",
-                        "as": "file",
-                        "in": {
-                            "type": {
-                                "$switch": {
-                                    "branches": [
-                                        {
-                                            "case": {
-                                                "$regexMatch": {
-                                                    "input": "$$file.contentType",
-                                                    "regex": "^(application|text)"
-                                                }
-                                            },
-                                            "then": "documents"
-                                        },
-                                        {
-                                            "case": {
-                                                "$regexMatch": {
-                                                    "input": "$$file.contentType",
-                                                    "regex": "^video/"
-                                                }
-                                            },
-                                            "then": "videos"
-                                        },
-                                        {
-                                            "case": {
-                                                "$regexMatch": {
-                                                    "input": "$$file.contentType",
-                                                    "regex": "^image/"
-                                                }
-                                            },
-                                            "then": "photos"
-                                        },
-                                        {
-                                            "case": {
-                                                "$regexMatch": {
-                                                    "input": "$$file.contentType",
-                                                    "regex": "^audio/"
-                                                }
-                                            },
-                                            "then": "audio"
-                                        }
-                                    ],
-                                    "default": "others"
-                                }
-                            },
-                            "size": "$$file.size"
-                        }
-                    }
-                },
-                "lastModified": {
-                    "$max": "$files.updatedAt"  # or "$files.lastModified" depending on your schema
-                }
-            }
+            "$limit": limit + 1
         },
         {
             "$project": {
@@ -360,56 +393,23 @@ async def get_group_storage(
                 "groupId": "$groupId",
                 "groupName": "$groupInfo.gname",
                 "storageUsed": "$groupInfo.storageUsed",
-                "lastModified": "$lastModified",  
+                "storedBytes": {"$ifNull": ["$groupInfo.storedBytes", "$groupInfo.storageUsed"]},
+                "lastModified": "$groupInfo.lastActivityAt",
                 "frequency": {
-                    "$arrayToObject": {
-                        "$map": {
-                            "input": ["documents", "videos", "photos", "audio", "others"],
-                            "as": "category",
-                            "in": {
-                                "k": "$$category",
-                                "v": {
-                                    "count": {
-                                        "$size": {
-                                            "$filter": {
-                                                "input": "$categorized",
-                                                "as": "item",
-                                                "cond": {"$eq": ["$$item.type", "$$category"]}
-                                            }
-                                        }
-                                    },
-                                    "size": {
-                                        "$sum": {
-                                            "$map": {
-                                                "input": {
-                                                    "$filter": {
-                                                        "input": "$categorized",
-                                                        "as": "item",
-                                                        "cond": {"$eq": ["$$item.type", "$$category"]}
-                                                    }
-                                                },
-                                                "as": "item",
-                                                "in": "$$item.size"
-                                            }
-                                        }
-                                    }
-                                }
-                            }
-                        }
+                    category: {
+                        "$ifNull": [f"$groupInfo.frequency.{category}", {"count": 0, "size": 0}]
                     }
+                    for category in STORAGE_CATEGORIES
                 }
             }
-        },
-        {
-            "$sort": {
-                "lastModified": -1  
-            }
         }
     ]
 
-    result = await db.groupMembers.aggregate(pipeline).to_list(length=None)
-    print(result)
-    return result
+    result = await db.groupMembers.aggregate(pipeline).to_list(length=limit + 1)
+    page, next_cursor = paginate(result, limit, lambda doc: {"groupId": doc["groupId"]})
+    for doc in page:
+        doc["lastModified"] = time_ago(doc.get("lastModified"))
+    return page_response(page, next_cursor)
 
 
 @group_engine.post("/staragroup", dependencies=[Depends(verify_group_api)])
@@ -423,7 +423,7 @@ async def star_a_group(
                 group_data = await db.starred.find_one({
                     "userId": data.userId,
                     "groupId": data.groupId
-                })
+                }, session=session)
 
                 if group_data is not None:
                     return {
@@ -433,11 +433,13 @@ async def star_a_group(
                 await db.starred.insert_one({
                     "userId": data.userId,
                     "groupId": data.groupId
-                })
+                }, session=session)
 
-                return {
-                    "message": "group is starred successfully"
-                }
+        response_cache.invalidate(("user", data.userId))
+
+        return {
+            "message": "group is starred successfully"
+        }
 
     except Exception as e:
         raise HTTPException(
@@ -453,27 +455,23 @@ async def unstar_a_group(
     try:
          async with await db.client.start_session() as session:
               async with session.start_transaction():
-                   try:
-                        result = await db.starred.delete_one(
-                            {
-                                "userId" : data.userId,
-                                "groupId" : data.groupId
-                            }
-                        )
-
-                        if result.deleted_count==0:
-                            return {
-                                "message" : "there is no such group is starred"
-                            }
-
-                        return {
-                            "message" : "group successfully unstarred"
-                        }
-                   except Exception as e:
-                        raise HTTPException(
-                            status_code=500,
-                            detail=str(e)
-                        )
+                   result = await db.starred.delete_one(
+                       {
+                           "userId" : data.userId,
+                           "groupId" : data.groupId
+                       },
+                       session=session
+                   )
+
+         if result.deleted_count==0:
+              return {
+                  "message" : "there is no such group is starred"
+              }
+         response_cache.invalidate(("user", data.userId))
+
+         return {
+             "message" : "group successfully unstarred"
+         }
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -487,6 +485,12 @@ async def get_group_details(
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     try:
+        key = ("getgroup", user_id, group_id)
+        found, cached = response_cache.get(key)
+        if found:
+            return cached
+        token = response_cache.token()
+
         # Find user role in groupMembers
         member = await db.groupMembers.find_one({
             "userId": user_id,
@@ -506,13 +510,15 @@ async def get_group_details(
                 detail="Group not found"
             )
 
-        return {
+        response = {
             "userId": user_id,
             "groupId": group_id,
             "role": member["role"],
             "groupName": group["gname"],
             "description": group["description"],
         }
+        response_cache.put(key, response, [("group", group_id)], token)
+        return response
 
     except Exception as e:
         raise HTTPException(
@@ -520,6 +526,10 @@ async def get_group_details(
             detail=f"Internal Server Error: {str(e)}"
         )
     
+@group_engine.get("/cachemetrics", dependencies=[Depends(verify_group_api)])
+async def get_cache_metrics():
+    return response_cache.metrics()
+
 @group_engine.get("/activities/{group_id}",dependencies=[Depends(verify_group_api)])
 async def get_group_activities(
         group_id,
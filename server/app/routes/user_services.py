@@ -10,8 +10,16 @@ from app.models.group_members_model import addUserModel,exitGroupModel,removeUse
 from starlette.status import HTTP_403_FORBIDDEN
 from app.db.connection import get_db
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import List
+from typing import List, Optional
 from app.utils.auth_util import verify_role
+from app.utils.file_utils import release_blob, delete_released
+from app.utils.group_utils import record_activity, empty_frequency
+from collections import Counter
+from app.utils.response_cache import response_cache
+from app.utils.membership import membership
+from app.routes.chat_services import manager as chat_manager
+from app.chat.history import recent_messages
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_object_id_cursor, paginate, page_response
 
 file_engine = APIRouter(prefix="/user")
 
@@ -104,6 +112,9 @@ async def add_user(
                         session=session
                     )
 
+        for doc in user_docs:
+            membership.invalidate(doc["userId"], doc["groupId"])
+            response_cache.invalidate(("user", doc["userId"]), ("group", doc["groupId"]), ("activity", doc["groupId"]))
         return {"message": "Inserted successfully"}
 
     except Exception as e:
@@ -114,41 +125,66 @@ async def add_user(
 @file_engine.get("/displayuser", dependencies=[Depends(verify_userservices_api)])
 async def display_user(
     groupId: str = Query(..., description="Group ID to fetch users for"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     try:
-        async with await db.client.start_session() as session:
-            async with session.start_transaction():
-                pipeline=[
-                    {
-                        "$match":{
-                            "groupId":groupId
-                        }
-                    },
-                    {
-                        "$lookup":{
-                            "from": "user",
-                            "localField": "userId",
-                            "foreignField": "_id",  # CORRECTED: Should match _id field
-                            "as": "userDetails"
-                        }
-                    },
-                    {"$unwind": "$userDetails"} ,
+        key = ("displayuser", groupId, limit, cursor)
+        found, cached = response_cache.get(key)
+        if found:
+            return cached
+        token = response_cache.token()
 
-                    {
-                        "$project":{
-                            "_id":"$userDetails._id",
-                            "name":"$userDetails.name",
-                            "email":"$userDetails.email",
-                            "role":"$role"
-                        }
-                    }
-                ]
+        # Keyset on the membership _id, served by the (groupId, _id) index
+        match = {"groupId": groupId}
+        after_id = decode_object_id_cursor(cursor)
+        if after_id is not None:
+            match["_id"] = {"$gt": after_id}
 
-                cursor = db.groupMembers.aggregate(pipeline)
-                results = await cursor.to_list(length=None)
-        return results
+        pipeline=[
+            {
+                "$match": match
+            },
+            {"$sort": {"_id": 1}},
+            {"$limit": limit + 1},
+            {
+                "$lookup":{
+                    "from": "user",
+                    "localField": "userId",
+                    "foreignField": "_id",  # CORRECTED: Should match _id field
+                    "as": "userDetails"
+                }
+            },
+            # Keep members whose user is gone so the page boundary stays on
+            # membership rows; they are dropped after paginating
+            {"$unwind": {"path": "$userDetails", "preserveNullAndEmptyArrays": True}},
+
+            {
+                "$project":{
+                    "_id":"$userDetails._id",
+                    "memberId":"$_id",
+                    "name":"$userDetails.name",
+                    "email":"$userDetails.email",
+                    "role":"$role"
+                }
+            }
+        ]
 
+        cursor = db.groupMembers.aggregate(pipeline)
+        results = await cursor.to_list(length=limit + 1)
+        page, next_cursor = paginate(results, limit, lambda doc: {"id": str(doc["memberId"])})
+        items = [
+            {key: value for key, value in doc.items() if key != "memberId"}
+            for doc in page
+            if "_id" in doc
+        ]
+        response = page_response(items, next_cursor)
+        response_cache.put(key, response, [("group", groupId)], token)
+        return response
+
+    except HTTPException:
+        raise
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail="Internal server error") 
@@ -167,12 +203,34 @@ async def delete_group(request:exitGroupModel,
                     roles={"owner"}
                     )
         
+        released = []
         async with await db.client.start_session() as session:
             async with session.start_transaction():
+                group_files = await db.files.find(
+                    {"groupId":groupId},
+                    {"GridFSId":1,"storage":1,"contentHash":1},
+                    session=session
+                ).to_list(length=None)
+
+                # One reference drop per distinct content, legacy files one by one
+                hash_counts = Counter(f["contentHash"] for f in group_files if f.get("contentHash"))
+                samples = {f["contentHash"]: f for f in group_files if f.get("contentHash")}
+                for content_hash, count in hash_counts.items():
+                    blob = await release_blob(db, samples[content_hash], count=count, session=session)
+                    if blob is not None:
+                        released.append(blob)
+                released += [(f["GridFSId"], f.get("storage", "gridfs")) for f in group_files if not f.get("contentHash")]
+
                 await db.chat.delete_many({"groupId":groupId},session=session)
                 await db.files.delete_many({"groupId":groupId},session=session)
+                await db.previews.delete_many({"groupId":groupId},session=session)
                 await db.groupMembers.delete_many({"groupId":groupId},session=session)
                 await db.starred.delete_many({"groupId":groupId},session=session)
+                await db.group.update_one(
+                    {"_id":groupId},
+                    {"$set":{"frequency":empty_frequency()}},
+                    session=session
+                )
                 await db.activities.insert_one({
                     "userId":userId,
                     "groupId":groupId,
@@ -182,7 +240,13 @@ async def delete_group(request:exitGroupModel,
                 },
                 session=session
                 )
-        
+
+        membership.invalidate_group(groupId)
+        response_cache.invalidate_group(groupId)
+        recent_messages.drop(groupId)
+        await chat_manager.revoke(groupId)
+        await delete_released(released)
+
         return {"message":"deletion successful"}
     
 
@@ -206,7 +270,7 @@ async def exit_group(request:exitGroupModel,
                         "userId":userId
                         },
                         session=session)
-                    await db.activities.insert_one({
+                    await record_activity(db, {
                         "userId":userId,
                         "groupId":groupId,
                         "activityType":"Exited from group",
@@ -215,6 +279,9 @@ async def exit_group(request:exitGroupModel,
                         },
                         session=session
                         )
+            membership.invalidate(userId, groupId)
+            response_cache.invalidate(("user", userId), ("group", groupId), ("activity", groupId))
+            await chat_manager.revoke(groupId, userId)
             return {"message":"group exited successfully"}
         else:
             async with await db.client.start_session() as session:
@@ -231,6 +298,11 @@ async def exit_group(request:exitGroupModel,
                         },
                         session=session
                     )
+            membership.invalidate_group(groupId)
+            response_cache.invalidate(("user", userId))
+            response_cache.invalidate_group(groupId)
+            recent_messages.drop(groupId)
+            await chat_manager.revoke(groupId)
             return {"message": "Group deleted successfully because owner exited"}
     except Exception as e:
                 raise HTTPException(status_code=500, detail=f"Deletion failed: {str(e)}")
@@ -282,14 +354,17 @@ async def remove_user_from_group(
                     )
                 
                 # Log the activity
-                await db.activities.insert_one({
+                await record_activity(db, {
                     "userId": userId,
                     "groupId": groupId,
                     "activityType": "Removed from group",
                     "fileId": None,
                     "timestamp": datetime.now(timezone.utc)
                 }, session=session)
-        
+
+        membership.invalidate(userId, groupId)
+        response_cache.invalidate(("user", userId), ("group", groupId), ("activity", groupId))
+        await chat_manager.revoke(groupId, userId)
         return {"message": "User removed from group successfully"}
     
     except HTTPException:
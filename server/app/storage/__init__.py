@@ -0,0 +1,29 @@
+import os
+
+from app.db.connection import get_fs
+from app.storage.base import StorageBackend, BlobWriter, BlobReader
+from app.storage.gridfs_storage import GridFSStorage
+from app.storage.local_storage import LocalStorage
+
+# Backend used for new uploads. Existing content is always read from the
+# backend recorded on its document, so both can be in use at once.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gridfs")
+LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", "storage")
+
+_backends = {}
+
+
+def get_backend(name: str = None) -> StorageBackend:
+    name = name or "gridfs"
+    if name not in _backends:
+        if name == "gridfs":
+            _backends[name] = GridFSStorage(get_fs())
+        elif name == "local":
+            _backends[name] = LocalStorage(LOCAL_STORAGE_ROOT)
+        else:
+            raise ValueError(f"Unknown storage backend: {name}")
+    return _backends[name]
+
+
+def get_storage() -> StorageBackend:
+    return get_backend(STORAGE_BACKEND)
@@ -0,0 +1,57 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+# Size of each read while serving a blob. Matches the GridFS chunk size so
+# GridFS reads never straddle more chunks than necessary.
+READ_SIZE = 255 * 1024
+
+
+class BlobWriter(ABC):
+    """Write handle for a new blob. `_id` is known before any data is written."""
+
+    _id = None
+
+    @abstractmethod
+    async def write(self, data: bytes):
+        ...
+
+    @abstractmethod
+    async def close(self):
+        """Finish the blob and make it readable."""
+
+    @abstractmethod
+    async def abort(self):
+        """Throw away everything written so far."""
+
+
+class BlobReader(ABC):
+    length: int
+    upload_date: datetime
+    # Set when the blob is a plain file on this host, so it can be sent
+    # with FileResponse instead of being copied through Python.
+    path: Optional[str] = None
+
+    @abstractmethod
+    def iter_range(self, start: int, end: int) -> AsyncIterator[bytes]:
+        """Yield bytes [start, end] (inclusive)."""
+
+
+class StorageBackend(ABC):
+    """Where file content lives. Blob ids are ObjectIds on every backend, so
+    `files.GridFSId` / `blobs.GridFSId` hold a blob id whatever the backend,
+    and the `storage` field on those documents names the backend."""
+
+    name: str
+
+    @abstractmethod
+    def open_writer(self, filename: str) -> BlobWriter:
+        ...
+
+    @abstractmethod
+    async def open_reader(self, blob_id) -> BlobReader:
+        ...
+
+    @abstractmethod
+    async def delete(self, blob_id):
+        ...
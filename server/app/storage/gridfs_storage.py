@@ -0,0 +1,37 @@
+from app.storage.base import StorageBackend, BlobReader, READ_SIZE
+
+GRIDFS_CHUNK_SIZE = 255 * 1024
+
+
+class GridFSReader(BlobReader):
+    def __init__(self, grid_out):
+        self.grid_out = grid_out
+        self.length = grid_out.length
+        self.upload_date = grid_out.upload_date
+
+    async def iter_range(self, start: int, end: int):
+        self.grid_out.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await self.grid_out.read(min(READ_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class GridFSStorage(StorageBackend):
+    name = "gridfs"
+
+    def __init__(self, fs):
+        self.fs = fs
+
+    def open_writer(self, filename: str):
+        # AsyncIOMotorGridIn already has write/close/abort and a preassigned _id
+        return self.fs.open_upload_stream(filename, chunk_size_bytes=GRIDFS_CHUNK_SIZE)
+
+    async def open_reader(self, blob_id):
+        return GridFSReader(await self.fs.open_download_stream(blob_id))
+
+    async def delete(self, blob_id):
+        await self.fs.delete(blob_id)
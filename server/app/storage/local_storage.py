@@ -0,0 +1,105 @@
+from bson import ObjectId
+from datetime import datetime, timezone
+import asyncio
+import os
+
+from app.storage.base import StorageBackend, BlobWriter, BlobReader, READ_SIZE
+
+
+class LocalBlobWriter(BlobWriter):
+    """Writes to `<path>.part` and renames into place on close, so readers
+    never see a half written blob."""
+
+    def __init__(self, path: str, blob_id: ObjectId):
+        self._id = blob_id
+        self.path = path
+        self.part_path = path + ".part"
+        self._file = None
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.part_path, "wb")
+
+    async def write(self, data: bytes):
+        if self._file is None:
+            await asyncio.to_thread(self._open)
+        await asyncio.to_thread(self._file.write, data)
+
+    def _finish(self):
+        if self._file is None:
+            self._open()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.part_path, self.path)
+
+    async def close(self):
+        await asyncio.to_thread(self._finish)
+
+    def _discard(self):
+        if self._file is not None:
+            self._file.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+    async def abort(self):
+        await asyncio.to_thread(self._discard)
+
+
+class LocalBlobReader(BlobReader):
+    def __init__(self, path: str):
+        stat = os.stat(path)
+        self.path = path
+        self.length = stat.st_size
+        self.upload_date = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+
+    def _open_at(self, start: int):
+        f = open(self.path, "rb")
+        f.seek(start)
+        return f
+
+    async def iter_range(self, start: int, end: int):
+        # Every file operation runs off the event loop, like the writer's
+        f = await asyncio.to_thread(self._open_at, start)
+        try:
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(READ_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            await asyncio.to_thread(f.close)
+
+
+class LocalStorage(StorageBackend):
+    """Blobs as plain files under `root`, sharded two levels deep by the
+    trailing bytes of the blob id (the ObjectId counter, so evenly spread):
+    <root>/<hex[-2:]>/<hex[-4:-2]>/<hex>."""
+
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def blob_path(self, blob_id):
+        hex_id = str(blob_id)
+        return os.path.join(self.root, hex_id[-2:], hex_id[-4:-2], hex_id)
+
+    def open_writer(self, filename: str):
+        blob_id = ObjectId()
+        return LocalBlobWriter(self.blob_path(blob_id), blob_id)
+
+    async def open_reader(self, blob_id):
+        path = self.blob_path(blob_id)
+        try:
+            return await asyncio.to_thread(LocalBlobReader, path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"no blob {blob_id} in local storage")
+
+    async def delete(self, blob_id):
+        try:
+            await asyncio.to_thread(os.remove, self.blob_path(blob_id))
+        except FileNotFoundError:
+            pass
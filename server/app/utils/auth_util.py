@@ -9,6 +9,7 @@ from fastapi import HTTPException
 import typing
 from app.db.collections import groupmembers
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.utils.membership import membership
 load_dotenv()
 
 bcrypt_context=CryptContext(schemes=["bcrypt"],deprecated="auto")
@@ -58,13 +59,9 @@ async def verify_role(
         group_id : str,
         roles : set,
 ):
-    member_data = await db.groupMembers.find_one( 
-        {
-            "userId":user_id,
-            "groupId":group_id }
-    )
+    role = await membership.role(db, user_id, group_id)
 
-    if member_data is None or member_data.get("role") not in roles:
+    if role is None or role not in roles:
         raise HTTPException(
             status_code=403,
             detail="unauthorized access to action"
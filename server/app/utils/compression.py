@@ -0,0 +1,85 @@
+import zlib
+
+# Compression at rest for the "documents" category (application/* and text/*,
+# as classified by /group/groupstorage). Content is stored as a gzip stream
+# so clients that accept gzip can be sent the stored bytes untouched.
+GZIP_WBITS = 31
+COMPRESSION_LEVEL = 6
+
+# Decide from the first SAMPLE_SIZE bytes: compress only if the sample
+# shrinks to at most MAX_SAMPLE_RATIO of its size.
+SAMPLE_SIZE = 64 * 1024
+MAX_SAMPLE_RATIO = 0.9
+
+# Largest piece of inflated output produced at once while serving a download.
+OUTPUT_SIZE = 256 * 1024
+
+# Formats in the documents category that are already compressed containers.
+ALREADY_COMPRESSED = (
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-bzip2",
+    "application/x-xz",
+    "application/x-7z-compressed",
+    "application/x-rar-compressed",
+    "application/vnd.rar",
+    "application/zstd",
+    "application/pdf",
+    "application/epub+zip",
+    "application/java-archive",
+    "application/vnd.openxmlformats-officedocument.",
+    "application/vnd.oasis.opendocument.",
+    "application/vnd.android.package-archive",
+)
+
+
+def is_compressible_type(content_type: str):
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if not content_type.startswith(("application/", "text/")):
+        return False
+    return not content_type.startswith(ALREADY_COMPRESSED)
+
+
+def sample_compresses(sample: bytes):
+    if not sample:
+        return False
+    compressed = zlib.compress(sample, COMPRESSION_LEVEL)
+    return len(compressed) <= len(sample) * MAX_SAMPLE_RATIO
+
+
+def gzip_compressor():
+    return zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, GZIP_WBITS)
+
+
+def accepts_gzip(accept_encoding: str):
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "x-gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+async def iter_decompressed_range(chunks, start: int, end: int):
+    """Inflate a stored gzip stream and yield logical bytes [start, end].
+
+    Seeking into deflate data is not possible, so bytes before `start` are
+    inflated and skipped; output stops as soon as `end` is reached. Each
+    inflate step is capped at OUTPUT_SIZE so highly compressible content
+    cannot balloon in memory.
+    """
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    position = 0
+    async for chunk in chunks:
+        pending = chunk
+        while pending:
+            data = decompressor.decompress(pending, OUTPUT_SIZE)
+            pending = decompressor.unconsumed_tail
+            if not data:
+                continue
+            piece_end = position + len(data)
+            if piece_end > start:
+                yield data[max(start - position, 0):end - position + 1]
+            position = piece_end
+            if position > end:
+                return
@@ -0,0 +1,124 @@
+from fastapi import HTTPException
+from bson import ObjectId
+from bson.errors import InvalidId
+import re
+import unicodedata
+
+from app.utils.pagination import decode_cursor, paginate
+
+# File names are indexed through two derived fields on `files`:
+#   nameLower  the normalized (NFKC + casefold) name, for exact and prefix hits
+#   nameGrams  edge n-grams of every word in the name, for "word starts with"
+# Both are plain equality / anchored-prefix lookups, so they are served by
+# the indexes in app.db.indexes instead of scanning every name with a regex.
+MAX_GRAM_LENGTH = 20
+WORD_RE = re.compile(r"[^\W_]+")
+
+SCORE_EXACT = 3
+SCORE_PREFIX = 2
+SCORE_WORD = 1
+
+
+def normalize_name(name: str):
+    return unicodedata.normalize("NFKC", name).casefold()
+
+
+def name_words(normalized: str):
+    return WORD_RE.findall(normalized)
+
+
+def name_search_fields(name: str):
+    normalized = normalize_name(name)
+    grams = set()
+    for word in name_words(normalized):
+        for length in range(1, min(len(word), MAX_GRAM_LENGTH) + 1):
+            grams.add(word[:length])
+    return {"nameLower": normalized, "nameGrams": sorted(grams)}
+
+
+def build_name_match(query: str, group_id: str = None):
+    """$match for names that start with `query` or whose words start with each
+    word of `query`. User input only ever reaches an escaped, anchored regex."""
+    match = {}
+    if group_id is not None:
+        match["groupId"] = group_id
+
+    normalized = normalize_name(query.strip())
+    if not normalized:
+        return match, normalized
+
+    alternatives = [{"nameLower": {"$regex": "^" + re.escape(normalized)}}]
+    words = name_words(normalized)
+    if words:
+        alternatives.append({"nameGrams": {"$all": [word[:MAX_GRAM_LENGTH] for word in words]}})
+    match["$or"] = alternatives
+    return match, normalized
+
+
+def search_pipeline(query: str, group_id: str = None, cursor: str = None, limit: int = 50, projection: dict = None):
+    """Ranked, keyset-paginated file name search.
+
+    Exact names rank first, then names starting with the query, then word
+    matches. Ties go to the newest upload. An empty query is the plain
+    listing, newest first, which walks the (groupId, _id) index instead of
+    scoring and sorting every file. Fetches one extra row so the caller can
+    tell whether there is a next page.
+    """
+    match, normalized = build_name_match(query, group_id)
+    pipeline = [{"$match": match}]
+    position = decode_cursor(cursor)
+
+    if not normalized:
+        if position is not None:
+            try:
+                pipeline.append({"$match": {"_id": {"$lt": ObjectId(position["id"])}}})
+            except (KeyError, TypeError, InvalidId):
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        pipeline += [
+            {"$sort": {"_id": -1}},
+            {"$limit": limit + 1}
+        ]
+        if projection:
+            pipeline.append({"$project": projection})
+        return pipeline
+
+    score = {
+        "$switch": {
+            "branches": [
+                {"case": {"$eq": ["$nameLower", normalized]}, "then": SCORE_EXACT},
+                {"case": {"$eq": [{"$indexOfCP": ["$nameLower", normalized]}, 0]}, "then": SCORE_PREFIX}
+            ],
+            "default": SCORE_WORD
+        }
+    }
+    pipeline.append({"$addFields": {"score": score}})
+
+    if position is not None:
+        try:
+            after_score, after_id = position["score"], ObjectId(position["id"])
+        except (KeyError, TypeError, InvalidId):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        pipeline.append({"$match": {"$or": [
+            {"score": {"$lt": after_score}},
+            {"score": after_score, "_id": {"$lt": after_id}}
+        ]}})
+
+    pipeline += [
+        {"$sort": {"score": -1, "_id": -1}},
+        {"$limit": limit + 1}
+    ]
+    if projection:
+        pipeline.append({"$project": {**projection, "score": 1}})
+    return pipeline
+
+
+def search_position(doc: dict):
+    # Listing pages (no query) carry no score and are keyed on _id alone
+    if "score" not in doc:
+        return {"id": str(doc["_id"])}
+    return {"score": doc["score"], "id": str(doc["_id"])}
+
+
+def next_search_cursor(docs: list, limit: int):
+    """Trim the look-ahead row and return (page, cursor or None)."""
+    return paginate(docs, limit, search_position)
@@ -0,0 +1,342 @@
+from fastapi import UploadFile, HTTPException
+from bson import Int64
+from pymongo import ReturnDocument
+from datetime import datetime, timezone
+import hashlib
+
+from app.storage import get_backend
+from app.storage.gridfs_storage import GRIDFS_CHUNK_SIZE
+from app.utils.file_search import name_search_fields
+from app.utils.group_utils import record_activity, frequency_inc
+from app.utils.compression import SAMPLE_SIZE, is_compressible_type, sample_compresses, gzip_compressor, iter_decompressed_range
+
+# Read the incoming upload in multiples of the GridFS chunk size (255 KiB) so
+# every write lines up with whole chunks and memory per upload stays bounded.
+UPLOAD_READ_SIZE = GRIDFS_CHUNK_SIZE * 4
+
+
+async def iter_upload_file(file: UploadFile):
+    """Read an UploadFile as a sequence of UPLOAD_READ_SIZE chunks."""
+    while True:
+        chunk = await file.read(UPLOAD_READ_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def stream_to_storage(storage, chunks, filename: str, content_type: str = None):
+    """Copy an async iterable of byte chunks into a new blob on `storage`.
+
+    Documents (see app.utils.compression) are gzip-compressed on the way in
+    when a sample of them compresses well. Returns the blob id, the logical
+    size and SHA-256 of the content, the compression applied (or None) and
+    the number of bytes actually stored. The partially written blob is
+    removed if anything goes wrong mid-stream.
+    """
+    writer = storage.open_writer(filename)
+    digest = hashlib.sha256()
+    size = 0
+    stored_size = 0
+    compressor = None
+    deciding = is_compressible_type(content_type)
+    sample = b""
+
+    async def put(data):
+        nonlocal stored_size
+        if compressor is not None:
+            data = compressor.compress(data)
+        if data:
+            await writer.write(data)
+            stored_size += len(data)
+
+    try:
+        async for chunk in chunks:
+            digest.update(chunk)
+            size += len(chunk)
+            if deciding:
+                sample += chunk
+                if len(sample) < SAMPLE_SIZE:
+                    continue
+                if sample_compresses(sample[:SAMPLE_SIZE]):
+                    compressor = gzip_compressor()
+                deciding = False
+                chunk, sample = sample, b""
+            await put(chunk)
+
+        # Content shorter than the sample is decided on what there is
+        if deciding and sample:
+            if sample_compresses(sample):
+                compressor = gzip_compressor()
+            await put(sample)
+
+        if compressor is not None:
+            tail = compressor.flush()
+            await writer.write(tail)
+            stored_size += len(tail)
+        await writer.close()
+    except BaseException:
+        await writer.abort()
+        raise
+
+    return {
+        "blobId": writer._id,
+        "size": Int64(size),
+        "contentHash": digest.hexdigest(),
+        "compression": "gzip" if compressor is not None else None,
+        "storedSize": Int64(stored_size)
+    }
+
+
+# Deduplicated blobs.
+#
+# Every distinct content hash owns exactly one stored blob, tracked in the
+# `blobs` collection as {_id: sha256, GridFSId, storage, size, compression,
+# storedSize, refCount}.
+# Each `files` document holding that content is one reference.
+#
+# Storage policy: quotas are logical. Every `files` document charges its full
+# size to the group and to the group owner's `storageUsed`, whether or not the
+# bytes are shared with other files. Deduplication is a saving on the server
+# side only, so a user's usage never changes because someone else uploaded or
+# deleted the same content, and deleting a file always frees exactly its size.
+# Next to the logical `storageUsed`, `storedBytes` counts the same files at
+# their size at rest (after compression), again once per file. Users and
+# groups from before it existed start it from their `storageUsed` (see
+# seed_stored_bytes and scripts/backfill_stored_bytes.py).
+
+
+async def seed_stored_bytes(collection, doc_id, session=None):
+    """Start a missing `storedBytes` at `storageUsed`, so the $inc that follows
+    doesn't create it holding only the new file. A no-op once it is set."""
+    await collection.update_one(
+        {"_id": doc_id, "storedBytes": {"$exists": False}},
+        [{"$set": {"storedBytes": {"$toLong": {"$ifNull": ["$storageUsed", 0]}}}}],
+        session=session
+    )
+
+async def acquire_blob(db, storage_name: str, stored: dict, session=None):
+    """Add a reference to the blob for the content described by `stored` (as
+    returned by stream_to_storage), registering the freshly written blob on
+    `storage_name` if the content is new.
+
+    Returns the blob document the file should point at. If its GridFSId
+    differs from `stored["blobId"]`, the freshly uploaded copy is a duplicate
+    and can be deleted.
+    """
+    blob = await db.blobs.find_one_and_update(
+        {"_id": stored["contentHash"]},
+        {
+            "$inc": {"refCount": 1},
+            "$setOnInsert": {
+                "GridFSId": stored["blobId"],
+                "storage": storage_name,
+                "size": stored["size"],
+                "compression": stored["compression"],
+                "storedSize": stored["storedSize"],
+                "createdAt": datetime.now(timezone.utc)
+            }
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    return blob
+
+
+async def release_blob(db, file_doc: dict, count: int = 1, session=None):
+    """Drop `count` references held by files like `file_doc`.
+
+    Returns the (blob id, storage name) to delete once the surrounding
+    transaction has committed, or None while other files still reference the
+    content. Files uploaded before deduplication own their blob outright.
+    """
+    content_hash = file_doc.get("contentHash")
+    if content_hash is None:
+        return file_doc["GridFSId"], file_doc.get("storage", "gridfs")
+
+    blob = await db.blobs.find_one_and_update(
+        {"_id": content_hash},
+        {"$inc": {"refCount": -count}},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    if blob is None:
+        return file_doc["GridFSId"], file_doc.get("storage", "gridfs")
+    if blob["refCount"] > 0:
+        return None
+
+    await db.blobs.delete_one({"_id": content_hash, "refCount": {"$lte": 0}}, session=session)
+    return blob["GridFSId"], blob.get("storage", "gridfs")
+
+
+async def delete_released(released):
+    """Delete blobs returned by release_blob, after the transaction committed."""
+    for blob_id, storage_name in released:
+        await get_backend(storage_name).delete(blob_id)
+
+
+async def iter_file_content(file_doc: dict, start: int = 0, end: int = None):
+    """Yield the logical bytes [start, end] of a `files` document from its
+    storage backend, inflating compressed content on the fly."""
+    if end is None:
+        end = file_doc["size"] - 1
+    reader = await get_backend(file_doc.get("storage")).open_reader(file_doc["GridFSId"])
+    if file_doc.get("compression") == "gzip":
+        async for chunk in iter_decompressed_range(reader.iter_range(0, reader.length - 1), start, end):
+            yield chunk
+    else:
+        async for chunk in reader.iter_range(start, end):
+            yield chunk
+
+
+def parse_range_header(range_header: str, file_size: int):
+    """Parse a single `bytes=` range into an inclusive (start, end) pair.
+
+    Returns None when the header is missing or not something we serve as a
+    partial response (multiple ranges, other units, malformed values), in
+    which case the caller sends the whole file. Raises 416 when the range is
+    well formed but lies outside the file.
+    """
+    if not range_header:
+        return None
+
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    start_str, sep, end_str = spec.strip().partition("-")
+    if not sep:
+        return None
+
+    try:
+        if start_str == "":
+            # Suffix range: the last N bytes.
+            length = int(end_str)
+            if length <= 0:
+                raise ValueError
+            start = max(file_size - length, 0)
+            end = file_size - 1
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else file_size - 1
+            if start < 0 or end < start:
+                return None
+            end = min(end, file_size - 1)
+    except ValueError:
+        return None
+
+    if start >= file_size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{file_size}"}
+        )
+
+    return start, end
+
+
+def if_range_matches(if_range: str, etag: str, last_modified: str):
+    """A Range is only honoured if If-Range (when sent) still names this file."""
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag
+    return if_range == last_modified
+
+
+async def commit_file(
+    db,
+    storage,
+    stored: dict,
+    filename: str,
+    content_type: str,
+    user_id: str,
+    group_id: str,
+    on_commit=None
+):
+    """Record content written to `storage` by stream_to_storage as a file of
+    `group_id`.
+
+    Takes a blob reference, inserts the `files` document, charges storage to
+    the group and its owner and logs FILE_UPLOADED in one transaction.
+    `on_commit(session, file_id)`, if given, runs inside the same transaction.
+    If the transaction fails, the uploaded copy is deleted again.
+    """
+    uploaded_id = stored["blobId"]
+    size = stored["size"]
+    async with await db.client.start_session() as session:
+        async with session.start_transaction():
+            try:
+                blob = await acquire_blob(db, storage.name, stored, session=session)
+                stored_size = blob.get("storedSize", size)
+                if blob["GridFSId"] != uploaded_id:
+                    # Identical content is already stored; point at the shared copy.
+                    await storage.delete(uploaded_id)
+                    uploaded_id = None
+
+                # Insert file metadata
+                file_data = {
+                    "name": filename,
+                    "uploadedBy": user_id,
+                    "uploadedAt": datetime.now(timezone.utc),
+                    "GridFSId": blob["GridFSId"],
+                    "storage": blob.get("storage", "gridfs"),
+                    "size": size,
+                    "contentHash": stored["contentHash"],
+                    "compression": blob.get("compression"),
+                    "storedSize": stored_size,
+                    "groupId": group_id,
+                    "contentType": content_type,
+                    "pinned": False,
+                    **name_search_fields(filename)
+                }
+
+                insert_result = await db.files.insert_one(file_data, session=session)
+
+                owner_doc = await db.groupMembers.find_one(
+                    {"groupId": group_id, "role": "owner"},
+                    {"_id": 0, "userId": 1},
+                    session=session
+                )
+
+                if owner_doc is not None:
+                    await seed_stored_bytes(db.user, owner_doc["userId"], session=session)
+                    await db.user.update_one(
+                        {"_id": owner_doc["userId"]},
+                        {"$inc": {"storageUsed": size, "storedBytes": stored_size}},
+                        session=session
+                    )
+
+                await seed_stored_bytes(db.group, group_id, session=session)
+                await db.group.update_one(
+                    {"_id": group_id},
+                    {"$inc": {"storageUsed": size, "storedBytes": stored_size, **frequency_inc(content_type, size)}},
+                    session=session
+                )
+
+                activity_data = {
+                    "userId": user_id,
+                    "groupId": group_id,
+                    "activityType": "FILE_UPLOADED",
+                    "fileId": insert_result.inserted_id,
+                    "timestamp": datetime.now(timezone.utc)
+                }
+
+                await record_activity(db, activity_data, session=session)
+
+                if on_commit is not None:
+                    await on_commit(session, insert_result.inserted_id)
+
+            except Exception:
+                # The blob reference is rolled back with the transaction, so a
+                # copy we uploaded ourselves is unreferenced again.
+                if uploaded_id is not None:
+                    await storage.delete(uploaded_id)
+                raise
+
+    return {
+        "file_id": str(insert_result.inserted_id),
+        "filename": filename,
+        "size": size
+    }
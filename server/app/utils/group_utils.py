@@ -1,4 +1,69 @@
 from datetime import datetime, timezone
+from bson import Int64
+import re
+
+
+# Per-category file counts and sizes kept on each group document under
+# `frequency`, in the shape /group/groupstorage returns. Maintained in the
+# upload and delete transactions; scripts/reconcile_group_storage.py rebuilds
+# them from the files collection.
+STORAGE_CATEGORIES = ["documents", "videos", "photos", "audio", "others"]
+CATEGORY_PATTERNS = [
+    (re.compile(r"^(application|text)"), "documents"),
+    (re.compile(r"^video/"), "videos"),
+    (re.compile(r"^image/"), "photos"),
+    (re.compile(r"^audio/"), "audio"),
+]
+
+
+def storage_category(content_type: str):
+    for pattern, category in CATEGORY_PATTERNS:
+        if content_type and pattern.match(content_type):
+            return category
+    return "others"
+
+
+def empty_frequency():
+    return {category: {"count": Int64(0), "size": Int64(0)} for category in STORAGE_CATEGORIES}
+
+
+def frequency_inc(content_type: str, size: int, files: int = 1):
+    """$inc fields moving `files` files of `size` bytes in or out (negative)."""
+    category = storage_category(content_type)
+    return {
+        f"frequency.{category}.count": Int64(files),
+        f"frequency.{category}.size": Int64(size)
+    }
+
+
+# Every activity also moves its group's lastActivityAt forward, which is what
+# the group listing (/group/search) sorts on. $max keeps it monotonic when
+# writers race or a backfill runs alongside them.
+async def record_activity(db, activity: dict, session=None):
+    await db.activities.insert_one(activity, session=session)
+    await db.group.update_one(
+        {"_id": activity["groupId"]},
+        {"$max": {"lastActivityAt": activity["timestamp"]}},
+        session=session
+    )
+
+
+async def record_activities(db, activities: list, session=None):
+    if not activities:
+        return
+    await db.activities.insert_many(activities, session=session)
+    latest = {}
+    for activity in activities:
+        group_id = activity["groupId"]
+        if group_id not in latest or activity["timestamp"] > latest[group_id]:
+            latest[group_id] = activity["timestamp"]
+    for group_id, timestamp in latest.items():
+        await db.group.update_one(
+            {"_id": group_id},
+            {"$max": {"lastActivityAt": timestamp}},
+            session=session
+        )
+
 
 def time_ago(dt):
     if not dt:
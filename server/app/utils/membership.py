@@ -0,0 +1,87 @@
+from collections import OrderedDict, Counter
+import os
+import time
+
+# In-process cache of group roles, behind verify_role and the chat websocket
+# join. Non-members are cached too, for a shorter time, so repeated denied
+# requests don't each cost a query. Routes that change membership invalidate
+# the pairs they touch (user_services, group creation); the TTLs bound how
+# long a change made through another worker process takes to show here.
+MEMBERSHIP_CACHE_TTL = int(os.getenv("MEMBERSHIP_CACHE_TTL_SECONDS", "60"))
+MEMBERSHIP_NEGATIVE_TTL = int(os.getenv("MEMBERSHIP_NEGATIVE_TTL_SECONDS", "10"))
+MEMBERSHIP_CACHE_SIZE = int(os.getenv("MEMBERSHIP_CACHE_SIZE", "50000"))
+
+
+class MembershipResolver:
+    def __init__(
+        self,
+        ttl: int = MEMBERSHIP_CACHE_TTL,
+        negative_ttl: int = MEMBERSHIP_NEGATIVE_TTL,
+        max_size: int = MEMBERSHIP_CACHE_SIZE
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        # (user_id, group_id) -> (expires at, role or None)
+        self.entries = OrderedDict()
+        # group_id -> user_ids with an entry, for invalidate_group
+        self.group_users = {}
+        # Bumped by every invalidation; a lookup that overlaps one isn't cached
+        self.generation = 0
+        self.stats = Counter()
+
+    async def role(self, db, user_id: str, group_id: str):
+        """The user's role in the group, or None if they aren't a member."""
+        key = (user_id, group_id)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] >= time.monotonic():
+            self.entries.move_to_end(key)
+            self.stats["hits" if entry[1] is not None else "negativeHits"] += 1
+            return entry[1]
+
+        self.stats["misses"] += 1
+        generation = self.generation
+        member = await db.groupMembers.find_one(
+            {"userId": user_id, "groupId": group_id},
+            {"_id": 0, "role": 1}
+        )
+        role = member.get("role") if member is not None else None
+        if generation == self.generation:
+            self._put(key, role)
+        return role
+
+    def _put(self, key: tuple, role):
+        ttl = self.ttl if role is not None else self.negative_ttl
+        self.entries[key] = (time.monotonic() + ttl, role)
+        self.entries.move_to_end(key)
+        self.group_users.setdefault(key[1], set()).add(key[0])
+        while len(self.entries) > self.max_size:
+            self._drop(next(iter(self.entries)))
+
+    def _drop(self, key: tuple):
+        self.entries.pop(key, None)
+        users = self.group_users.get(key[1])
+        if users is not None:
+            users.discard(key[0])
+            if not users:
+                del self.group_users[key[1]]
+
+    def invalidate(self, user_id: str, group_id: str):
+        self.generation += 1
+        self._drop((user_id, group_id))
+
+    def invalidate_group(self, group_id: str):
+        self.generation += 1
+        for user_id in list(self.group_users.get(group_id, ())):
+            self._drop((user_id, group_id))
+
+    def metrics(self):
+        return {
+            "entries": len(self.entries),
+            "hits": self.stats["hits"],
+            "negativeHits": self.stats["negativeHits"],
+            "misses": self.stats["misses"]
+        }
+
+
+membership = MembershipResolver()
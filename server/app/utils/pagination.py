@@ -0,0 +1,52 @@
+from fastapi import HTTPException
+from bson import ObjectId
+from bson.errors import InvalidId
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(position: dict):
+    """Opaque cursor for the position after the last item of a page."""
+    raw = json.dumps(position, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def decode_object_id_cursor(cursor: str):
+    """Decode a cursor whose position is a single ObjectId under "id"."""
+    position = decode_cursor(cursor)
+    if position is None:
+        return None
+    try:
+        return ObjectId(position["id"])
+    except (KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(docs: list, limit: int, position):
+    """Split a `limit + 1` row fetch into (page, next cursor).
+
+    `position(doc)` gives the sort key of a row as a JSON-able dict; the
+    cursor is None on the last page.
+    """
+    if len(docs) <= limit:
+        return docs, None
+    page = docs[:limit]
+    return page, encode_cursor(position(page[-1]))
+
+
+def page_response(items: list, next_cursor):
+    """The envelope every list endpoint returns."""
+    return {"items": items, "next": next_cursor}
@@ -0,0 +1,133 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from bson import Binary
+import asyncio
+import hashlib
+import io
+import os
+
+from app.utils.file_utils import iter_file_content
+
+# Thumbnails for images and the first page of PDFs, rendered after upload and
+# kept in `previews` as {_id: file id, groupId, contentType, data, width,
+# height, etag, createdAt}. `files.preview` is "ready" or "failed" once the
+# file has been looked at, so listings know whether to ask for one.
+PREVIEW_MAX_SIDE = 320
+PREVIEW_FORMAT = "WEBP"
+PREVIEW_CONTENT_TYPE = "image/webp"
+PREVIEW_QUALITY = 80
+
+# Originals are read into memory to be handed to a worker process.
+MAX_SOURCE_SIZE = 50 * 1024 * 1024
+PREVIEW_WORKERS = int(os.getenv("PREVIEW_WORKERS", "2"))
+
+# Formats Pillow decodes; everything else image/* (svg, heic, ...) is skipped
+IMAGE_TYPES = {
+    "image/jpeg",
+    "image/png",
+    "image/gif",
+    "image/webp",
+    "image/bmp",
+    "image/tiff",
+}
+PDF_TYPE = "application/pdf"
+
+_pool = None
+# At most this many originals held in memory, waiting for or inside a worker
+_slots = asyncio.Semaphore(PREVIEW_WORKERS * 2)
+
+
+def is_previewable(content_type: str, size: int):
+    if size > MAX_SOURCE_SIZE or not content_type:
+        return False
+    content_type = content_type.split(";")[0].strip().lower()
+    return content_type in IMAGE_TYPES or content_type == PDF_TYPE
+
+
+def render_preview(data: bytes, content_type: str):
+    """Render `data` to a thumbnail. Runs in a worker process.
+
+    Returns (image bytes, width, height).
+    """
+    from PIL import Image, ImageOps
+
+    if content_type.split(";")[0].strip().lower() == PDF_TYPE:
+        import pypdfium2 as pdfium
+
+        pdf = pdfium.PdfDocument(data)
+        try:
+            page = pdf[0]
+            # Page sizes are in points (1/72 inch); render straight at thumbnail size
+            scale = PREVIEW_MAX_SIDE / max(page.get_size())
+            image = page.render(scale=scale).to_pil()
+        finally:
+            pdf.close()
+    else:
+        image = Image.open(io.BytesIO(data))
+        # Lets JPEG decode at a reduced scale instead of full resolution
+        image.draft("RGB", (PREVIEW_MAX_SIDE, PREVIEW_MAX_SIDE))
+        image = ImageOps.exif_transpose(image)
+
+    image.thumbnail((PREVIEW_MAX_SIDE, PREVIEW_MAX_SIDE))
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+
+    out = io.BytesIO()
+    image.save(out, PREVIEW_FORMAT, quality=PREVIEW_QUALITY)
+    return out.getvalue(), image.width, image.height
+
+
+def get_preview_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PREVIEW_WORKERS)
+    return _pool
+
+
+def shutdown_preview_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def generate_preview(db, file_id):
+    """Render and store the preview for one file. Meant to run in the
+    background after the upload has committed; failures are recorded on the
+    file, never raised."""
+    file_doc = await db.files.find_one(
+        {"_id": file_id},
+        {"GridFSId": 1, "storage": 1, "size": 1, "compression": 1, "contentType": 1, "groupId": 1}
+    )
+    if file_doc is None or not is_previewable(file_doc.get("contentType"), file_doc["size"]):
+        return
+
+    try:
+        async with _slots:
+            data = b"".join([chunk async for chunk in iter_file_content(file_doc)])
+            loop = asyncio.get_running_loop()
+            image, width, height = await loop.run_in_executor(
+                get_preview_pool(), render_preview, data, file_doc["contentType"]
+            )
+    except Exception as e:
+        print(f"Preview failed for file {file_id}: {e}")
+        await db.files.update_one({"_id": file_id}, {"$set": {"preview": "failed"}})
+        return
+
+    await db.previews.replace_one(
+        {"_id": file_id},
+        {
+            "groupId": file_doc["groupId"],
+            "contentType": PREVIEW_CONTENT_TYPE,
+            "data": Binary(image),
+            "width": width,
+            "height": height,
+            "etag": hashlib.sha256(image).hexdigest()[:32],
+            "createdAt": datetime.now(timezone.utc)
+        },
+        upsert=True
+    )
+    result = await db.files.update_one({"_id": file_id}, {"$set": {"preview": "ready"}})
+    if result.matched_count == 0:
+        # The file was deleted while we were rendering
+        await db.previews.delete_one({"_id": file_id})
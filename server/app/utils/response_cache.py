@@ -0,0 +1,110 @@
+from collections import OrderedDict, Counter
+import os
+import time
+
+# In-process cache of the dashboard reads (/group/search, /group/getgroup,
+# /group/userstorage, /user/displayuser). Each entry is tagged with what it
+# was built from, and the write routes drop exactly the tags they change,
+# after their transaction has committed:
+#
+#   ("user", userId)       the user's memberships and stars
+#   ("group", groupId)     a group's name, description and members
+#   ("activity", groupId)  a group's lastActivityAt (the sidebar order)
+#   ("storage", groupId)   a group's storage counters (and its owner's)
+#
+# A read that overlaps an invalidation is served but not stored, so a write
+# can't be undone by a slower read putting back what it saw before. The TTL
+# bounds staleness for anything not invalidated here, like the relative
+# "5 minutes ago" text and writes served by another worker process.
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "5000"))
+
+
+class ResponseCache:
+    def __init__(self, ttl: int = RESPONSE_CACHE_TTL, max_size: int = RESPONSE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        # key -> (expires at, tags, response)
+        self.entries = OrderedDict()
+        # tag -> keys of the entries carrying it
+        self.tagged = {}
+        # Bumped by every invalidation; see token()
+        self.generation = 0
+        self.stats = Counter()
+
+    def get(self, key: tuple):
+        """(found, response). Cached responses are shared: don't mutate them."""
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            self._drop(key)
+            self.stats["expired"] += 1
+            entry = None
+        if entry is None:
+            self.stats["misses"] += 1
+            return False, None
+        self.entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return True, entry[2]
+
+    def token(self):
+        """Taken before reading from Mongo and handed back to put()."""
+        return self.generation
+
+    def put(self, key: tuple, response, tags, token: int):
+        if self.max_size <= 0:
+            return
+        if token != self.generation:
+            self.stats["skipped"] += 1
+            return
+        if key in self.entries:
+            self._drop(key)
+        tags = frozenset(tags)
+        self.entries[key] = (time.monotonic() + self.ttl, tags, response)
+        for tag in tags:
+            self.tagged.setdefault(tag, set()).add(key)
+        while len(self.entries) > self.max_size:
+            self._drop(next(iter(self.entries)))
+            self.stats["evictions"] += 1
+
+    def _drop(self, key: tuple):
+        _, tags, _ = self.entries.pop(key)
+        for tag in tags:
+            keys = self.tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tagged[tag]
+
+    def invalidate(self, *tags):
+        self.generation += 1
+        for tag in tags:
+            for key in list(self.tagged.get(tag, ())):
+                self._drop(key)
+                self.stats["invalidated"] += 1
+
+    def invalidate_group(self, group_id: str):
+        """Everything built from a group, for writes that remove or reset it."""
+        self.invalidate(("group", group_id), ("activity", group_id), ("storage", group_id))
+
+    def clear(self):
+        self.generation += 1
+        self.entries.clear()
+        self.tagged.clear()
+
+    def metrics(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "entries": len(self.entries),
+            "maxEntries": self.max_size,
+            "ttlSeconds": self.ttl,
+            "hits": self.stats["hits"],
+            "misses": self.stats["misses"],
+            "hitRate": round(self.stats["hits"] / lookups, 4) if lookups else None,
+            "expired": self.stats["expired"],
+            "evictions": self.stats["evictions"],
+            "invalidated": self.stats["invalidated"],
+            "skippedFills": self.stats["skipped"]
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,222 @@
+from fastapi import HTTPException
+from bson import Binary
+from datetime import datetime, timezone, timedelta
+import asyncio
+import math
+import os
+import re
+import uuid
+
+from app.utils.file_utils import stream_to_storage, commit_file
+
+# Resumable uploads are staged chunk by chunk in `uploadSessions` /
+# `uploadChunks` and only become a real file when the client completes the
+# session. Chunks are small enough to live in a single BSON document.
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 5 * 1024 * 1024
+
+SESSION_TTL = timedelta(hours=int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24")))
+CLEANUP_INTERVAL_SECONDS = 3600
+
+
+def chunk_key(session_id: str, index: int):
+    return f"{session_id}:{index}"
+
+
+def chunk_prefix_filter(session_id: str):
+    # Anchored prefix match on _id, so it is served by the _id index
+    return {"_id": {"$regex": f"^{re.escape(session_id)}:"}}
+
+
+def expected_chunk_size(upload_session: dict, index: int):
+    if index < upload_session["totalChunks"] - 1:
+        return upload_session["chunkSize"]
+    return upload_session["size"] - upload_session["chunkSize"] * (upload_session["totalChunks"] - 1)
+
+
+async def create_session(db, user_id: str, group_id: str, filename: str, content_type: str, size: int, chunk_size: int = None):
+    if chunk_size is None:
+        chunk_size = DEFAULT_CHUNK_SIZE
+    if size < 0:
+        raise HTTPException(status_code=400, detail="size must not be negative")
+    if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"chunkSize must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE} bytes"
+        )
+
+    now = datetime.now(timezone.utc)
+    upload_session = {
+        "_id": uuid.uuid4().hex,
+        "userId": user_id,
+        "groupId": group_id,
+        "filename": filename,
+        "contentType": content_type,
+        "size": size,
+        "chunkSize": chunk_size,
+        "totalChunks": math.ceil(size / chunk_size),
+        "status": "open",
+        "fileId": None,
+        "createdAt": now,
+        "updatedAt": now
+    }
+    await db.uploadSessions.insert_one(upload_session)
+    return upload_session
+
+
+async def get_session(db, session_id: str, user_id: str):
+    upload_session = await db.uploadSessions.find_one({"_id": session_id})
+    if upload_session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    if upload_session["userId"] != user_id:
+        raise HTTPException(status_code=403, detail="unauthorized access to action")
+    return upload_session
+
+
+async def store_chunk(db, upload_session: dict, index: int, data: bytes):
+    """Stage one chunk. Re-sending a chunk simply overwrites it."""
+    if upload_session["status"] != "open":
+        raise HTTPException(status_code=409, detail="Upload session is not open for chunks")
+    if not 0 <= index < upload_session["totalChunks"]:
+        raise HTTPException(status_code=400, detail="Chunk index out of range")
+
+    expected = expected_chunk_size(upload_session, index)
+    if len(data) != expected:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Chunk {index} must be {expected} bytes, got {len(data)}"
+        )
+
+    now = datetime.now(timezone.utc)
+    await db.uploadChunks.update_one(
+        {"_id": chunk_key(upload_session["_id"], index)},
+        {"$set": {
+            "sessionId": upload_session["_id"],
+            "index": index,
+            "data": Binary(data),
+            "receivedAt": now
+        }},
+        upsert=True
+    )
+    await db.uploadSessions.update_one(
+        {"_id": upload_session["_id"]},
+        {"$set": {"updatedAt": now}}
+    )
+
+
+async def received_chunks(db, session_id: str):
+    cursor = db.uploadChunks.find(chunk_prefix_filter(session_id), {"_id": 0, "index": 1})
+    return sorted(doc["index"] async for doc in cursor)
+
+
+async def iter_staged_chunks(db, upload_session: dict):
+    # One chunk document in memory at a time
+    for index in range(upload_session["totalChunks"]):
+        doc = await db.uploadChunks.find_one({"_id": chunk_key(upload_session["_id"], index)})
+        if doc is None:
+            raise HTTPException(status_code=409, detail=f"Chunk {index} is missing")
+        yield bytes(doc["data"])
+
+
+async def complete_session(db, storage, upload_session: dict):
+    """Assemble the staged chunks into a blob and commit the file.
+
+    The session is `completing` while its chunks are read, which keeps the
+    cleanup sweep away from them, and is flipped to `completed` inside the
+    same transaction that inserts the file, so a retried or concurrent
+    complete cannot commit twice. A failed attempt reopens it.
+    """
+    if upload_session["status"] == "completed":
+        return {
+            "file_id": str(upload_session["fileId"]),
+            "filename": upload_session["filename"],
+            "size": upload_session["size"]
+        }
+
+    missing = set(range(upload_session["totalChunks"])) - set(await received_chunks(db, upload_session["_id"]))
+    if missing:
+        raise HTTPException(status_code=409, detail=f"Missing chunks: {sorted(missing)}")
+
+    claimed = await db.uploadSessions.find_one_and_update(
+        {"_id": upload_session["_id"], "status": {"$in": ["open", "completing"]}},
+        {"$set": {"status": "completing", "updatedAt": datetime.now(timezone.utc)}}
+    )
+    if claimed is None:
+        raise HTTPException(status_code=409, detail="Upload session is already completed or expired")
+
+    async def mark_completed(session, file_id):
+        result = await db.uploadSessions.update_one(
+            {"_id": upload_session["_id"], "status": "completing"},
+            {"$set": {
+                "status": "completed",
+                "fileId": file_id,
+                "updatedAt": datetime.now(timezone.utc)
+            }},
+            session=session
+        )
+        if result.modified_count == 0:
+            raise HTTPException(status_code=409, detail="Upload session is already completed")
+
+    try:
+        stored = await stream_to_storage(
+            storage,
+            iter_staged_chunks(db, upload_session),
+            upload_session["filename"],
+            upload_session["contentType"]
+        )
+
+        response = await commit_file(
+            db,
+            storage,
+            stored,
+            filename=upload_session["filename"],
+            content_type=upload_session["contentType"],
+            user_id=upload_session["userId"],
+            group_id=upload_session["groupId"],
+            on_commit=mark_completed
+        )
+    except BaseException:
+        await db.uploadSessions.update_one(
+            {"_id": upload_session["_id"], "status": "completing"},
+            {"$set": {"status": "open", "updatedAt": datetime.now(timezone.utc)}}
+        )
+        raise
+
+    await db.uploadChunks.delete_many(chunk_prefix_filter(upload_session["_id"]))
+    return response
+
+
+async def cleanup_upload_sessions(db, max_age: timedelta = SESSION_TTL):
+    """Drop sessions (and their staged chunks) untouched for `max_age`.
+
+    Sessions being completed are left alone: completing bumps `updatedAt`,
+    and the session is deleted before its chunks, conditionally, so a
+    complete that starts in between finds it gone instead of losing chunks.
+    """
+    cutoff = datetime.now(timezone.utc) - max_age
+    # A completion that died with its worker is retried by the client's next
+    # complete; one still `completing` after twice the TTL never will be
+    expired = {"$or": [
+        {"updatedAt": {"$lt": cutoff}, "status": {"$ne": "completing"}},
+        {"updatedAt": {"$lt": cutoff - max_age}, "status": "completing"}
+    ]}
+    removed = 0
+    async for upload_session in db.uploadSessions.find(expired, {"_id": 1}):
+        result = await db.uploadSessions.delete_one({"_id": upload_session["_id"], **expired})
+        if result.deleted_count == 0:
+            continue
+        await db.uploadChunks.delete_many(chunk_prefix_filter(upload_session["_id"]))
+        removed += 1
+    return removed
+
+
+async def run_upload_session_cleanup(db):
+    while True:
+        try:
+            removed = await cleanup_upload_sessions(db)
+            if removed:
+                print(f"Removed {removed} abandoned upload sessions")
+        except Exception as e:
+            print(f"Upload session cleanup failed: {e}")
+        await asyncio.sleep(CLEANUP_INTERVAL_SECONDS)
@@ -0,0 +1,59 @@
+from collections import OrderedDict
+import os
+import time
+
+# In-process cache of user display names, shared by everything that renders
+# other people's names (chat history, ...). Names rarely change, so a short
+# TTL is all the invalidation they need. Unknown ids are cached too.
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+
+class UserCache:
+    def __init__(self, ttl: int = USER_CACHE_TTL, max_size: int = USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        # user_id -> (expires at, name or None)
+        self.entries = OrderedDict()
+
+    def _get(self, user_id: str, now: float):
+        entry = self.entries.get(user_id)
+        if entry is None or entry[0] < now:
+            return False, None
+        self.entries.move_to_end(user_id)
+        return True, entry[1]
+
+    def _put(self, user_id: str, name, now: float):
+        self.entries[user_id] = (now + self.ttl, name)
+        self.entries.move_to_end(user_id)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    async def get_names(self, db, user_ids):
+        """Map each of `user_ids` to its name (None for unknown users), with
+        one `$in` query for whatever isn't cached."""
+        now = time.monotonic()
+        names = {}
+        missing = []
+        for user_id in set(user_ids):
+            found, name = self._get(user_id, now)
+            if found:
+                names[user_id] = name
+            else:
+                missing.append(user_id)
+
+        if missing:
+            fetched = {
+                doc["_id"]: doc.get("name")
+                async for doc in db.user.find({"_id": {"$in": missing}}, {"name": 1})
+            }
+            for user_id in missing:
+                names[user_id] = fetched.get(user_id)
+                self._put(user_id, names[user_id], now)
+        return names
+
+    def invalidate(self, user_id: str):
+        self.entries.pop(user_id, None)
+
+
+user_cache = UserCache()
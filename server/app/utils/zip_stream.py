@@ -0,0 +1,75 @@
+import os
+import zipfile
+
+# File documents read (and their downloads recorded) at a time while an
+# archive streams, so a request for a whole group holds one batch of
+# metadata, not all of it. Only the central directory grows with the count.
+ZIP_BATCH_SIZE = 200
+
+
+class _ZipBuffer:
+    """Write-only sink for ZipFile. It has no seek(), so ZipFile writes local
+    headers with data descriptors and never rewinds; whatever it has written
+    is handed out by drain() and forgotten."""
+
+    def __init__(self):
+        self._parts = []
+        self._offset = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def unique_name(name: str, seen: set):
+    """Archive member names must be unique; suffix repeats like a file manager would."""
+    candidate = name
+    base, ext = os.path.splitext(name)
+    counter = 1
+    while candidate in seen:
+        candidate = f"{base} ({counter}){ext}"
+        counter += 1
+    seen.add(candidate)
+    return candidate
+
+
+async def iter_zip(entries):
+    """Build a ZIP archive on the fly.
+
+    `entries` is an async iterable of (name, size, modified datetime, chunks) where
+    `chunks` is an async iterable of the member's bytes. Members are stored
+    uncompressed: most uploads are already compressed media, and storing
+    keeps the stream CPU-light. At most one chunk is buffered at a time.
+    """
+    buffer = _ZipBuffer()
+    seen = set()
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        async for name, size, modified, chunks in entries:
+            info = zipfile.ZipInfo(unique_name(name, seen), date_time=modified.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            # Known up front so ZipFile picks zip64 headers for large members
+            info.file_size = size
+            with archive.open(info, mode="w") as member:
+                async for chunk in chunks:
+                    member.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+
+    # Central directory
+    yield buffer.drain()
@@ -0,0 +1,147 @@
+"""Check that chat messages reach every client exactly once across workers.
+
+    python -m benchmarks.chat_delivery --workers 3 --clients 4 --messages 50
+
+Starts `--workers` separate uvicorn processes (each on its own port, all on
+the mongo backplane against MONGO_URI / MONGO_DB_NAME), connects `--clients`
+websockets to each of them in one group, has every client send
+`--messages` messages, then checks that every client received every
+message exactly once. The clients are made members of the group for the
+run, since the websocket only accepts members. Exits non-zero on any missing or duplicate delivery.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import websockets
+from pymongo import MongoClient
+
+
+def start_workers(count, base_port):
+    env = {**os.environ, "CHAT_BACKPLANE": "mongo"}
+    return [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(base_port + i)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        for i in range(count)
+    ]
+
+
+async def connect(port, group_id, user_id, deadline):
+    while True:
+        try:
+            return await websockets.connect(f"ws://127.0.0.1:{port}/chat/ws/{group_id}?userId={user_id}&username={user_id}")
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def receive_messages(ws, received, expected, done):
+    async for frame in ws:
+        event = json.loads(frame)
+        if event.get("type") == "message":
+            received[event["message"]] += 1
+            if sum(received.values()) >= expected:
+                done.set()
+
+
+async def run(workers, clients, messages, base_port):
+    processes = start_workers(workers, base_port)
+    group_id = f"delivery-{uuid.uuid4().hex[:8]}"
+    mongo = MongoClient(os.environ["MONGO_URI"])
+    members = mongo[os.environ["MONGO_DB_NAME"]].groupMembers
+    members.insert_many([
+        {"groupId": group_id, "userId": f"client-{index}", "role": "viewer"}
+        for index in range(workers * clients)
+    ])
+    try:
+        deadline = time.monotonic() + 30
+        sockets = [
+            await connect(base_port + index // clients, group_id, f"client-{index}", deadline)
+            for index in range(workers * clients)
+        ]
+        # Let every worker's change stream settle before sending
+        await asyncio.sleep(1)
+
+        expected = len(sockets) * messages
+        received = [collections.Counter() for _ in sockets]
+        done = [asyncio.Event() for _ in sockets]
+        readers = [
+            asyncio.create_task(receive_messages(ws, counts, expected, event))
+            for ws, counts, event in zip(sockets, received, done)
+        ]
+
+        started = time.perf_counter()
+        for seq in range(messages):
+            for index, ws in enumerate(sockets):
+                await ws.send(json.dumps({
+                    "type": "message",
+                    "user": f"client-{index}",
+                    "username": f"client-{index}",
+                    "message": f"{index}:{seq}"
+                }))
+
+        try:
+            await asyncio.wait_for(asyncio.gather(*(event.wait() for event in done)), timeout=60)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - started
+
+        # Give stragglers (duplicates) a moment to show up
+        await asyncio.sleep(1)
+        for reader in readers:
+            reader.cancel()
+        for ws in sockets:
+            await ws.close()
+
+        sent = {f"{index}:{seq}" for index in range(len(sockets)) for seq in range(messages)}
+        failures = 0
+        for index, counts in enumerate(received):
+            missing = len(sent - set(counts))
+            duplicated = sum(1 for count in counts.values() if count > 1)
+            if missing or duplicated:
+                failures += 1
+                print(f"client {index}: {missing} missing, {duplicated} duplicated")
+
+        print(json.dumps({
+            "workers": workers,
+            "clients": len(sockets),
+            "messages": len(sent),
+            "deliveries": sum(sum(counts.values()) for counts in received),
+            "seconds": round(elapsed, 3),
+            "failedClients": failures
+        }, indent=2))
+        return failures == 0
+
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        members.delete_many({"groupId": group_id})
+        mongo.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--clients", type=int, default=4, help="clients per worker")
+    parser.add_argument("--messages", type=int, default=50, help="messages per client")
+    parser.add_argument("--base-port", type=int, default=8100)
+    args = parser.parse_args()
+    ok = asyncio.run(run(args.workers, args.clients, args.messages, args.base_port))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
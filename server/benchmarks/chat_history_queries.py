@@ -0,0 +1,87 @@
+"""Count the Mongo commands one chat history request costs.
+
+    python -m benchmarks.chat_history_queries --messages 300 --senders 40
+
+Seeds a scratch group with legacy messages (no senderName) from
+`--senders` users, then loads the newest page and pages back through the
+rest, counting the commands each request sends. A page should cost one
+chat query (plus finding the `before` message when paging back) and at
+most one batched user lookup, however many senders it shows. Exits
+non-zero otherwise. Uses MONGO_URI / MONGO_DB_NAME.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import sys
+import uuid
+from datetime import datetime, timezone, timedelta
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from app.db.connection import MONGO_URI, DB_NAME
+from app.chat.history import history_page, recent_messages
+from app.utils.user_cache import user_cache
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = collections.Counter()
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self.commands[f"{event.command_name} {collection}"] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def main(messages, senders):
+    counter = CommandCounter()
+    db = AsyncIOMotorClient(MONGO_URI, event_listeners=[counter])[DB_NAME]
+    group_id = f"history-bench-{uuid.uuid4().hex[:8]}"
+    started = datetime.now(timezone.utc)
+    await db.chat.insert_many([
+        {
+            "_id": ObjectId(),
+            "groupId": group_id,
+            "senderId": f"legacy-user-{i % senders}",
+            "message": f"message {i}",
+            "timestamp": started + timedelta(milliseconds=i)
+        }
+        for i in range(messages)
+    ])
+
+    requests = []
+    try:
+        before = None
+        while True:
+            counter.commands.clear()
+            # Measure Mongo, not the caches from the previous request
+            recent_messages.groups.clear()
+            recent_messages.size = 0
+            user_cache.entries.clear()
+
+            items, has_older = await history_page(db, group_id, before)
+            requests.append({"before": before, "messages": len(items), "commands": dict(counter.commands)})
+            if not has_older or not items:
+                break
+            before = items[0]["id"]
+    finally:
+        await db.chat.delete_many({"groupId": group_id})
+
+    print(json.dumps(requests, indent=2))
+    return all(sum(r["commands"].values()) <= 3 for r in requests)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--senders", type=int, default=40)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args.messages, args.senders)) else 1)
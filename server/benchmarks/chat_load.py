@@ -0,0 +1,291 @@
+"""Chat load generator: fan-out latency, throughput and server cost.
+
+    python -m benchmarks.chat_load --clients 500 --groups 20 --rate 200 --duration 30
+    python -m benchmarks.chat_load --mongod mongod --output results/chat_load.json
+
+Starts the app with uvicorn in a subprocess, opens `--clients` websocket
+clients spread evenly over `--groups` groups, and sends `--rate` messages
+per second in total (round robin over the clients) for `--duration`
+seconds. Every client timestamps what it sends and what it receives, which
+gives the end-to-end fan-out latency of each delivery.
+
+Mongo is either a throwaway single-node replica set started from the
+`--mongod` binary in a temporary directory, or MONGO_URI. Either way the
+run uses a fresh database that is dropped afterwards.
+
+The result is one JSON document (stdout, and `--output` if given):
+latency percentiles, sent / delivered messages per second, deliveries
+missing, server CPU and peak RSS (from /proc, Linux only) and the
+server's /chat/metrics.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+
+import websockets
+from pymongo import MongoClient
+
+API_KEY = "chat-load-benchmark"
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def start_mongod(binary, port):
+    dbpath = tempfile.mkdtemp(prefix="chat-load-mongod-")
+    process = subprocess.Popen(
+        [binary, "--dbpath", dbpath, "--port", str(port), "--replSet", "rs0", "--bind_ip", "127.0.0.1"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    uri = f"mongodb://127.0.0.1:{port}/?directConnection=true"
+    client = MongoClient(uri, serverSelectionTimeoutMS=30000)
+    client.admin.command("ping")
+    # Transactions and change streams need a replica set, even of one
+    client.admin.command("replSetInitiate", {"_id": "rs0", "members": [{"_id": 0, "host": f"127.0.0.1:{port}"}]})
+    deadline = time.monotonic() + 30
+    while not client.admin.command("hello").get("isWritablePrimary"):
+        if time.monotonic() > deadline:
+            raise RuntimeError("mongod did not become primary")
+        time.sleep(0.2)
+    client.close()
+    return process, dbpath, uri
+
+
+def start_server(uri, db_name, port, backplane):
+    env = {
+        **os.environ,
+        "MONGO_URI": uri,
+        "MONGO_DB_NAME": db_name,
+        "CHAT_API_KEY": API_KEY,
+        "CHAT_BACKPLANE": backplane,
+        "SESSION_SECRET": os.environ.get("SESSION_SECRET", uuid.uuid4().hex)
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+
+def process_usage(pid):
+    """(CPU seconds, RSS bytes) of a process, or (None, None) off Linux."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/statm") as f:
+            rss_pages = int(f.read().split()[1])
+    except OSError:
+        return None, None
+    # utime and stime are fields 14 and 15 of stat; the split starts at field 3
+    return (int(fields[11]) + int(fields[12])) / CLK_TCK, rss_pages * PAGE_SIZE
+
+
+def fetch_metrics(port):
+    request = urllib.request.Request(f"http://127.0.0.1:{port}/chat/metrics", headers={"x-api-key": API_KEY})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return json.loads(response.read())
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+class Client:
+    def __init__(self, index, group_id):
+        self.index = index
+        self.group_id = group_id
+        self.user_id = f"load-user-{index}"
+        self.ws = None
+        self.latencies = []
+        self.received = 0
+
+    async def connect(self, port):
+        self.ws = await websockets.connect(f"ws://127.0.0.1:{port}/chat/ws/{self.group_id}", max_queue=None)
+        await self.ws.send(json.dumps({"type": "identify", "user": self.user_id, "username": self.user_id}))
+
+    async def receive(self):
+        try:
+            async for frame in self.ws:
+                event = json.loads(frame)
+                if event.get("type") == "message" and event["message"].startswith("load:"):
+                    sent_ns = int(event["message"].rsplit(":", 1)[1])
+                    self.latencies.append((time.perf_counter_ns() - sent_ns) / 1e6)
+                    self.received += 1
+        except websockets.ConnectionClosed:
+            pass
+
+    async def send(self, seq):
+        await self.ws.send(json.dumps({
+            "type": "message",
+            "user": self.user_id,
+            "username": self.user_id,
+            "message": f"load:{self.index}:{seq}:{time.perf_counter_ns()}"
+        }))
+
+
+async def run_load(port, clients, groups, rate, duration, server_pid):
+    group_ids = [f"load-group-{g}" for g in range(groups)]
+    members = [Client(i, group_ids[i % groups]) for i in range(clients)]
+    for client in members:
+        await client.connect(port)
+    readers = [asyncio.create_task(client.receive()) for client in members]
+    # Let joins and presence settle
+    await asyncio.sleep(1)
+
+    group_sizes = {g: sum(1 for c in members if c.group_id == g) for g in group_ids}
+    cpu_start, _ = process_usage(server_pid)
+    peak_rss = 0
+    sent = 0
+    expected = 0
+    senders = itertools.cycle(members)
+    interval = 1 / rate
+    started = time.perf_counter()
+    next_send = started
+    next_sample = started
+
+    while (now := time.perf_counter()) - started < duration:
+        # Catch up in a burst if we fell behind schedule
+        while next_send <= now:
+            client = next(senders)
+            await client.send(sent)
+            sent += 1
+            expected += group_sizes[client.group_id]
+            next_send += interval
+        if now >= next_sample:
+            _, rss = process_usage(server_pid)
+            peak_rss = max(peak_rss, rss or 0)
+            next_sample = now + 0.5
+        await asyncio.sleep(max(0, min(next_send, next_sample) - time.perf_counter()))
+    send_seconds = time.perf_counter() - started
+
+    # Drain: wait until deliveries stop arriving
+    last = -1
+    while (delivered := sum(c.received for c in members)) != last and delivered < expected:
+        last = delivered
+        await asyncio.sleep(1)
+    elapsed = time.perf_counter() - started
+
+    cpu_end, rss = process_usage(server_pid)
+    peak_rss = max(peak_rss, rss or 0)
+    metrics = fetch_metrics(port)
+    for client in members:
+        await client.ws.close()
+    for reader in readers:
+        reader.cancel()
+
+    latencies = sorted(itertools.chain.from_iterable(c.latencies for c in members))
+    return {
+        "sent": sent,
+        "sentPerSecond": round(sent / send_seconds, 1),
+        "expectedDeliveries": expected,
+        "delivered": len(latencies),
+        "missing": expected - len(latencies),
+        "deliveriesPerSecond": round(len(latencies) / elapsed, 1),
+        "latencyMs": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None
+        },
+        "server": {
+            "cpuSeconds": round(cpu_end - cpu_start, 3) if cpu_start is not None else None,
+            "cpuPercent": round(100 * (cpu_end - cpu_start) / elapsed, 1) if cpu_start is not None else None,
+            "peakRssMb": round(peak_rss / 2**20, 1) if peak_rss else None
+        },
+        "chatMetrics": metrics
+    }
+
+
+async def wait_for_server(port, process):
+    deadline = time.monotonic() + 30
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            await asyncio.open_connection("127.0.0.1", port)
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--groups", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=100, help="messages per second, all clients together")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of sending")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--backplane", choices=["local", "mongo"], default="local")
+    parser.add_argument("--mongod", help="mongod binary for a throwaway server; default is MONGO_URI")
+    parser.add_argument("--mongod-port", type=int, default=27999)
+    parser.add_argument("--output", help="also write the JSON result here")
+    args = parser.parse_args()
+
+    mongod = dbpath = None
+    if args.mongod:
+        mongod, dbpath, uri = start_mongod(args.mongod, args.mongod_port)
+    else:
+        uri = os.environ["MONGO_URI"]
+    db_name = f"chat_load_{uuid.uuid4().hex[:8]}"
+
+    # Benchmark users are members of their groups
+    mongo = MongoClient(uri)
+    mongo[db_name].groupMembers.insert_many([
+        {"groupId": f"load-group-{i % args.groups}", "userId": f"load-user-{i}", "role": "viewer"}
+        for i in range(args.clients)
+    ])
+
+    server = start_server(uri, db_name, args.port, args.backplane)
+    try:
+        asyncio.run(wait_for_server(args.port, server))
+        result = asyncio.run(run_load(args.port, args.clients, args.groups, args.rate, args.duration, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+        mongo.drop_database(db_name)
+        mongo.close()
+        if mongod is not None:
+            mongod.terminate()
+            mongod.wait()
+            shutil.rmtree(dbpath, ignore_errors=True)
+
+    report = {
+        "benchmark": "chat_load",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            "clients": args.clients,
+            "groups": args.groups,
+            "rate": args.rate,
+            "duration": args.duration,
+            "backplane": args.backplane
+        },
+        **result
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Chat message persistence: one insert_one per message vs write-behind.
+
+    python -m benchmarks.chat_persistence --messages 20000 --senders 50
+
+`--senders` concurrent tasks each save their share of `--messages` chat
+documents, first with an awaited insert_one per message (the old path),
+then through MessageWriter. Runs against a scratch collection in the
+MONGO_URI / MONGO_DB_NAME database, dropped afterwards.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from app.db.connection import db
+from app.chat.persistence import MessageWriter
+
+COLLECTION = "chat_benchmark"
+
+
+def chat_doc(sender, seq):
+    return {
+        "_id": ObjectId(),
+        "groupId": "benchmark",
+        "senderId": f"user-{sender}",
+        "senderName": f"User {sender}",
+        "message": f"message {seq} from {sender}",
+        "timestamp": datetime.now(timezone.utc)
+    }
+
+
+async def run_senders(save, senders, per_sender):
+    async def sender(index):
+        for seq in range(per_sender):
+            await save(chat_doc(index, seq))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender(i) for i in range(senders)))
+    return time.perf_counter() - started
+
+
+async def main(messages, senders):
+    collection = db[COLLECTION]
+    per_sender = messages // senders
+    total = per_sender * senders
+    try:
+        await collection.drop()
+        direct = await run_senders(collection.insert_one, senders, per_sender)
+
+        await collection.drop()
+        writer = MessageWriter(collection)
+        writer.start()
+        # Timed until everything is written, not just until the senders are done
+        started = time.perf_counter()
+        await run_senders(writer.add, senders, per_sender)
+        await writer.close()
+        durable = time.perf_counter() - started
+        saved = await collection.count_documents({})
+    finally:
+        await collection.drop()
+
+    print(json.dumps({
+        "messages": total,
+        "senders": senders,
+        "insertOne": {"seconds": round(direct, 3), "messagesPerSecond": round(total / direct)},
+        "writeBehind": {"seconds": round(durable, 3), "messagesPerSecond": round(total / durable), "saved": saved}
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--senders", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.senders))
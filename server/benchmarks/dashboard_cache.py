@@ -0,0 +1,247 @@
+"""Dashboard read cache: coherence after every kind of write, and hit rate.
+
+    python -m benchmarks.dashboard_cache --mongod mongod
+    python -m benchmarks.dashboard_cache --reads 2000 --output results/dashboard_cache.json
+
+Starts two copies of the app on the same fresh database: one with the
+response cache (app.utils.response_cache) and a reference with it turned
+off (RESPONSE_CACHE_SIZE=0). The cached reads are warmed, then every write
+route that invalidates them runs once against the cached server, and after
+each one the four dashboard reads of every user must come back identical
+from both servers. The relative lastModified text is ignored; the order it
+sorts by is not.
+
+Then a read-only phase times the same reads on both servers and reports
+latency and the cache's /group/cachemetrics. Exits non-zero on any mismatch.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+from bson import Int64
+from pymongo import MongoClient
+
+from benchmarks.chat_load import start_mongod, wait_for_server, percentile
+
+API_KEY = "dashboard-cache-benchmark"
+USERS = ["cache-user-1", "cache-user-2", "cache-user-3"]
+
+
+def start_server(uri, db_name, port, cache_size):
+    env = {
+        **os.environ,
+        "MONGO_URI": uri,
+        "MONGO_DB_NAME": db_name,
+        "GROUP_API_KEY": API_KEY,
+        "USERSERVICES_API_KEY": API_KEY,
+        "FILE_API_KEY": API_KEY,
+        "RESPONSE_CACHE_SIZE": str(cache_size),
+        "SESSION_SECRET": os.environ.get("SESSION_SECRET", uuid.uuid4().hex)
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+
+class Dashboard:
+    """The writes and reads of the test, against one server."""
+
+    def __init__(self, port):
+        self.http = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", headers={"x-api-key": API_KEY}, timeout=30)
+        self.groups = []
+
+    async def reads(self):
+        """Every dashboard read of every user, as (status, body)."""
+        results = {}
+        for user_id in USERS:
+            results[f"search {user_id}"] = await self.http.get(f"/group/search/{user_id}/__empty__")
+            results[f"userstorage {user_id}"] = await self.http.get(f"/group/userstorage/{user_id}")
+            for group_id in self.groups:
+                results[f"getgroup {user_id} {group_id}"] = await self.http.get(f"/group/getgroup/{user_id}/{group_id}")
+        for group_id in self.groups:
+            results[f"displayuser {group_id}"] = await self.http.get("/user/displayuser", params={"groupId": group_id})
+
+        normalized = {}
+        for name, response in results.items():
+            body = response.json()
+            if name.startswith("search") and isinstance(body, dict):
+                for item in body.get("items", []):
+                    item["lastModified"] = None
+            normalized[name] = (response.status_code, body)
+        return normalized
+
+    async def create_group(self, user_id, name):
+        response = await self.http.post("/group/create", json={"userId": user_id, "name": name, "description": "cache test"})
+        response.raise_for_status()
+        group_id = response.json()["groupId"]
+        self.groups.append(group_id)
+        return group_id
+
+    async def post(self, path, body):
+        response = await self.http.post(path, json=body)
+        response.raise_for_status()
+        return response.json()
+
+    async def upload(self, user_id, group_id):
+        response = await self.http.post(
+            "/file/upload",
+            data={"contentType": "text/plain", "userId": user_id, "groupId": group_id},
+            files={"file": ("notes.txt", b"dashboard cache " * 512, "text/plain")}
+        )
+        response.raise_for_status()
+        return response.json()["file_id"]
+
+    async def download(self, user_id, file_id):
+        response = await self.http.get(f"/file/download/{file_id}", params={"userId": user_id})
+        response.raise_for_status()
+
+    async def delete(self, user_id, file_id):
+        response = await self.http.request("DELETE", "/file/delete", json={"userId": user_id, "fileId": file_id})
+        response.raise_for_status()
+
+
+async def check_coherence(cached, reference):
+    owner, member, guest = USERS
+    group_id = await cached.create_group(owner, "cache-test")
+    reference.groups = cached.groups
+    file_id = None
+
+    async def upload():
+        nonlocal file_id
+        file_id = await cached.upload(member, group_id)
+
+    async def create_second_group():
+        await cached.create_group(guest, "cache-other")
+
+    async def delete_second_group():
+        second = cached.groups[-1]
+        await cached.post("/user/deletegroup", {"userId": guest, "groupId": second, "role": "owner"})
+
+    writes = [
+        ("adduser", lambda: cached.post("/user/adduser", [
+            {"userId": member, "groupId": group_id, "role": "editor"},
+            {"userId": guest, "groupId": group_id, "role": "viewer"}
+        ])),
+        ("upload", upload),
+        ("download", lambda: cached.download(member, file_id)),
+        ("rename", lambda: cached.http.patch("/group/rename", json={
+            "userId": owner, "groupId": group_id, "fieldToUpdate": "gname", "newContent": "cache-renamed"
+        })),
+        ("describe", lambda: cached.http.patch("/group/rename", json={
+            "userId": owner, "groupId": group_id, "fieldToUpdate": "description", "newContent": "changed"
+        })),
+        ("star", lambda: cached.post("/group/staragroup", {"userId": member, "groupId": group_id})),
+        ("unstar", lambda: cached.http.request("DELETE", "/group/unstaragroup", json={"userId": member, "groupId": group_id})),
+        ("delete", lambda: cached.delete(owner, file_id)),
+        ("create group", create_second_group),
+        ("exitgroup", lambda: cached.post("/user/exitgroup", {"userId": guest, "groupId": group_id, "role": "viewer"})),
+        ("removeuser", lambda: cached.post("/user/removeuser", {"userId": member, "groupId": group_id, "role": "editor"})),
+        ("deletegroup", delete_second_group),
+    ]
+
+    checks = []
+    for name, write in writes:
+        # Warm (and re-warm) the cache so the write has something to invalidate
+        await cached.reads()
+        await cached.reads()
+        await write()
+        got, expected = await cached.reads(), await reference.reads()
+        stale = sorted(key for key in expected if got.get(key) != expected[key])
+        checks.append({"write": name, "coherent": not stale, "stale": stale})
+    return checks
+
+
+async def time_reads(dashboard, rounds):
+    latencies = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await dashboard.reads()
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95), "max": latencies[-1]}
+
+
+async def run(cached_port, reference_port, rounds):
+    cached, reference = Dashboard(cached_port), Dashboard(reference_port)
+    try:
+        checks = await check_coherence(cached, reference)
+        reference.groups = cached.groups
+        timings = {
+            "cachedMs": await time_reads(cached, rounds),
+            "uncachedMs": await time_reads(reference, rounds)
+        }
+        metrics = (await cached.http.get("/group/cachemetrics")).json()
+    finally:
+        await cached.http.aclose()
+        await reference.http.aclose()
+    return {"coherence": checks, "readRoundLatency": timings, "cacheMetrics": metrics}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reads", type=int, default=200, help="rounds of dashboard reads to time per server")
+    parser.add_argument("--port", type=int, default=8300)
+    parser.add_argument("--mongod", help="mongod binary for a throwaway server; default is MONGO_URI")
+    parser.add_argument("--mongod-port", type=int, default=27998)
+    parser.add_argument("--output", help="also write the JSON result here")
+    args = parser.parse_args()
+
+    mongod = dbpath = None
+    if args.mongod:
+        mongod, dbpath, uri = start_mongod(args.mongod, args.mongod_port)
+    else:
+        uri = os.environ["MONGO_URI"]
+    db_name = f"dashboard_cache_{uuid.uuid4().hex[:8]}"
+
+    mongo = MongoClient(uri)
+    mongo[db_name].user.insert_many([
+        {"_id": user_id, "name": user_id, "email": f"{user_id}@example.com", "storageUsed": Int64(0)}
+        for user_id in USERS
+    ])
+
+    servers = [
+        start_server(uri, db_name, args.port, os.environ.get("RESPONSE_CACHE_SIZE", "5000")),
+        start_server(uri, db_name, args.port + 1, 0)
+    ]
+    try:
+        for port, server in zip((args.port, args.port + 1), servers):
+            asyncio.run(wait_for_server(port, server))
+        result = asyncio.run(run(args.port, args.port + 1, args.reads))
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+        mongo.drop_database(db_name)
+        mongo.close()
+        if mongod is not None:
+            mongod.terminate()
+            mongod.wait()
+            shutil.rmtree(dbpath, ignore_errors=True)
+
+    report = {
+        "benchmark": "dashboard_cache",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        **result
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    if not all(check["coherent"] for check in result["coherence"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
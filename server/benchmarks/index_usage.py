@@ -0,0 +1,241 @@
+"""Check with explain() that the hot queries run on indexes.
+
+    python -m benchmarks.index_usage --mongod mongod
+    python -m benchmarks.index_usage --output results/index_usage.json
+
+Creates the registered indexes (app.db.indexes) in a fresh database, seeds
+every collection with a little data so the planner has something to
+choose between, and explains the queries the route modules send, in the
+same shape they send them (aggregations as aggregations). Each one must
+run as an index scan on one of the indexes it is meant to use, with no
+COLLSCAN anywhere in the winning plan; the listings in INDEX_ORDERED must
+also take their order from the index, with no blocking sort. Exits
+non-zero otherwise.
+
+Mongo is either a throwaway server started from the `--mongod` binary or
+MONGO_URI; the database is dropped afterwards.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.db.indexes import ensure_indexes
+from app.utils.file_search import build_name_match, search_pipeline
+from app.chat.search import chat_search_pipeline, search_terms
+from benchmarks.chat_load import start_mongod
+
+GROUPS = 20
+PER_GROUP = 25
+# Paged listings whose sort must come from the index: a blocking sort here
+# means every page reads the whole group
+INDEX_ORDERED = {
+    "member listing (/user/displayuser)",
+    "file listing (/file/{group})",
+    "chat history",
+}
+
+
+async def seed(db):
+    now = datetime.now(timezone.utc)
+    users = [f"index-user-{i}" for i in range(GROUPS * 2)]
+    groups = [f"index-group-{g}" for g in range(GROUPS)]
+    await db.user.insert_many([{"_id": u, "name": u, "email": f"{u}@example.com"} for u in users])
+    await db.groupMembers.insert_many([
+        {"userId": users[(g + i) % len(users)], "groupId": group, "role": "owner" if i == 0 else "viewer"}
+        for g, group in enumerate(groups)
+        for i in range(5)
+    ])
+    await db.files.insert_many([
+        {"groupId": group, "name": f"report {i}.pdf", "nameLower": f"report {i}.pdf", "nameGrams": [f"rep{i}"], "size": i}
+        for group in groups
+        for i in range(PER_GROUP)
+    ])
+    await db.chat.insert_many([
+        {"groupId": group, "senderId": users[0], "message": f"hello number {i}", "timestamp": now + timedelta(seconds=i)}
+        for group in groups
+        for i in range(PER_GROUP)
+    ])
+    await db.activities.insert_many([
+        {"groupId": group, "userId": users[0], "activityType": "FILE_UPLOADED", "timestamp": now + timedelta(seconds=i)}
+        for group in groups
+        for i in range(PER_GROUP)
+    ])
+    await db.starred.insert_many([{"userId": users[g], "groupId": group} for g, group in enumerate(groups)])
+    await db.previews.insert_many([{"_id": ObjectId(), "groupId": group} for group in groups])
+    await db.otp_store.insert_many([{"email": f"{u}@example.com", "otp": "123456", "createdAt": now} for u in users])
+    await db.uploadSessions.insert_many([{"groupId": groups[0], "updatedAt": now - timedelta(minutes=i)} for i in range(50)])
+
+
+def hot_queries():
+    """(name, explain command, index names that may serve it)."""
+    user, group = "index-user-3", "index-group-3"
+    find = lambda collection, query, **extra: {"find": collection, "filter": query, **extra}
+    delete = lambda collection, query: {"delete": collection, "deletes": [{"q": query, "limit": 0}]}
+    return [
+        ("role check (verify_role, chat join)", find("groupMembers", {"userId": user, "groupId": group}, limit=1),
+         {"userId_groupId", "userId_role_groupId"}),
+        ("group owner (upload, delete)", find("groupMembers", {"groupId": group, "role": "owner"}, limit=1),
+         {"groupId_role"}),
+        ("group listing memberships (/group/search)", find("groupMembers", {"userId": user}),
+         {"userId_groupId", "userId_role_groupId"}),
+        ("owned groups (/group/groupstorage)", find("groupMembers", {"userId": user, "role": "owner"}, sort={"groupId": 1}),
+         {"userId_role_groupId"}),
+        ("owned group ids (/group/userstorage)", {"distinct": "groupMembers", "key": "groupId", "query": {"userId": user, "role": "owner"}},
+         {"userId_role_groupId"}),
+        ("member listing (/user/displayuser)", find("groupMembers", {"groupId": group}, sort={"_id": 1}, limit=51),
+         {"groupId_id"}),
+        ("group deletion members", delete("groupMembers", {"groupId": group}),
+         {"groupId_id", "groupId_role"}),
+        ("file listing (/file/{group})", {"aggregate": "files", "pipeline": search_pipeline("", group_id=group), "cursor": {}},
+         {"groupId_id"}),
+        ("file name search", find("files", build_name_match("report", group)[0]),
+         {"groupId_nameLower", "groupId_nameGrams"}),
+        ("group deletion files", delete("files", {"groupId": group}),
+         {"groupId_id", "groupId_nameLower", "groupId_nameGrams"}),
+        ("chat history", find("chat", {"groupId": group}, sort={"timestamp": -1, "_id": -1}, limit=101),
+         {"groupId_timestamp_id"}),
+        ("chat search", find("chat", chat_search_pipeline(group, search_terms("hello"))[0]["$match"]),
+         {"groupId_message_text"}),
+        ("latest group activity", find("activities", {"groupId": group}, sort={"timestamp": -1}, limit=1),
+         {"groupId_timestamp"}),
+        ("star lookup", find("starred", {"userId": user, "groupId": group}, limit=1),
+         {"userId_groupId"}),
+        ("group deletion stars", delete("starred", {"groupId": group}),
+         {"groupId"}),
+        ("group deletion previews", delete("previews", {"groupId": group}),
+         {"groupId"}),
+        ("otp verify", find("otp_store", {"email": f"{user}@example.com", "otp": "123456"}, limit=1),
+         {"email"}),
+        ("otp send", {"update": "otp_store", "updates": [{"q": {"email": f"{user}@example.com"}, "u": {"$set": {"otp": "654321"}}, "upsert": True}]},
+         {"email"}),
+        ("login by email", find("user", {"email": f"{user}@example.com"}, limit=1),
+         {"email"}),
+        ("upload session cleanup", find("uploadSessions", {"updatedAt": {"$lt": datetime.now(timezone.utc) - timedelta(minutes=30)}}),
+         {"updatedAt"}),
+    ]
+
+
+def plan_nodes(node, stages, indexes):
+    """Collect every stage and index name in an explain plan, whatever
+    engine (classic or slot based) produced it."""
+    if isinstance(node, dict):
+        if "stage" in node:
+            stages.add(node["stage"])
+        if "indexName" in node:
+            indexes.add(node["indexName"])
+        for value in node.values():
+            plan_nodes(value, stages, indexes)
+    elif isinstance(node, list):
+        for value in node:
+            plan_nodes(value, stages, indexes)
+
+
+def find_planner(node):
+    """The queryPlanner section, wherever the explain output nests it
+    (top level, sharded, or under an aggregation's $cursor stage)."""
+    if isinstance(node, dict):
+        if "queryPlanner" in node:
+            return node["queryPlanner"]
+        node = list(node.values())
+    if isinstance(node, list):
+        for value in node:
+            planner = find_planner(value)
+            if planner is not None:
+                return planner
+    return None
+
+
+def winning_plan(explain):
+    return find_planner(explain)["winningPlan"]
+
+
+def blocking_sort(explain, stages):
+    """Whether the query sorts in memory, in the plan or as a pipeline
+    $sort the planner couldn't absorb."""
+    pipeline_stages = explain.get("stages", [])
+    return "SORT" in stages or any("$sort" in stage for stage in pipeline_stages)
+
+
+async def run(db):
+    report = await ensure_indexes(db)
+    if report:
+        raise RuntimeError(f"indexes not in place: {report}")
+    await seed(db)
+
+    results = []
+    for name, command, expected in hot_queries():
+        explain = await db.command("explain", command, verbosity="queryPlanner")
+        stages, indexes = set(), set()
+        plan_nodes(winning_plan(explain), stages, indexes)
+        sorted_in_memory = blocking_sort(explain, stages)
+        ok = "COLLSCAN" not in stages and bool(indexes & expected)
+        if name in INDEX_ORDERED:
+            ok = ok and not sorted_in_memory
+        results.append({
+            "query": name,
+            "ok": ok,
+            "blockingSort": sorted_in_memory,
+            "stages": sorted(stages),
+            "indexes": sorted(indexes),
+            "expected": sorted(expected)
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongod", help="mongod binary for a throwaway server; default is MONGO_URI")
+    parser.add_argument("--mongod-port", type=int, default=27997)
+    parser.add_argument("--output", help="also write the JSON result here")
+    args = parser.parse_args()
+
+    mongod = dbpath = None
+    if args.mongod:
+        mongod, dbpath, uri = start_mongod(args.mongod, args.mongod_port)
+    else:
+        uri = os.environ["MONGO_URI"]
+    db_name = f"index_usage_{uuid.uuid4().hex[:8]}"
+
+    async def checked():
+        client = AsyncIOMotorClient(uri)
+        try:
+            return await run(client[db_name])
+        finally:
+            await client.drop_database(db_name)
+            client.close()
+
+    try:
+        results = asyncio.run(checked())
+    finally:
+        if mongod is not None:
+            mongod.terminate()
+            mongod.wait()
+            shutil.rmtree(dbpath, ignore_errors=True)
+
+    report = {
+        "benchmark": "index_usage",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "failed": [result["query"] for result in results if not result["ok"]],
+        "queries": results
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    if report["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Connect/disconnect churn of the chat presence bookkeeping.
+
+    python -m benchmarks.presence_churn --connections 10000 --groups 50 --tabs 3
+
+Opens `--connections` fake sockets spread over `--groups` groups, with
+each user holding `--tabs` of them, then closes them in random order.
+It does this with the old per-group list plus f-string keyed user_info
+and with PresenceIndex, and reports operations per second and the final
+online counts.
+"""
+import argparse
+import collections
+import json
+import random
+import time
+
+from app.chat.presence import PresenceIndex
+
+
+class FakeSocket:
+    pass
+
+
+def plan(connections, groups, tabs):
+    sockets = []
+    for i in range(connections):
+        user = f"user-{i // tabs}"
+        group = f"group-{(i // tabs) % groups}"
+        sockets.append((FakeSocket(), group, user))
+    order = sockets[:]
+    random.shuffle(order)
+    return sockets, order
+
+
+def run_lists(sockets, order):
+    groups = collections.defaultdict(list)
+    user_info = {}
+
+    started = time.perf_counter()
+    for ws, group, user in sockets:
+        groups[group].append(ws)
+        user_info[f"{group}_{id(ws)}"] = {"user_id": user, "group_id": group}
+    connected = time.perf_counter() - started
+    online = sum(len(members) for members in groups.values())
+
+    started = time.perf_counter()
+    for ws, group, user in order:
+        if ws in groups[group]:
+            groups[group].remove(ws)
+            del user_info[f"{group}_{id(ws)}"]
+    return connected, time.perf_counter() - started, online
+
+
+def run_presence(sockets, order):
+    groups = collections.defaultdict(dict)
+    presence = PresenceIndex()
+
+    started = time.perf_counter()
+    for ws, group, user in sockets:
+        groups[group][ws] = None
+        presence.add(ws, group, user, user)
+    connected = time.perf_counter() - started
+    online = sum(len(presence.users(group)) for group in groups)
+
+    started = time.perf_counter()
+    for ws, group, user in order:
+        if ws in groups[group]:
+            del groups[group][ws]
+            presence.remove(ws)
+    return connected, time.perf_counter() - started, online
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--tabs", type=int, default=3, help="connections per user")
+    args = parser.parse_args()
+
+    sockets, order = plan(args.connections, args.groups, args.tabs)
+    results = {}
+    for name, run in (("lists", run_lists), ("presenceIndex", run_presence)):
+        connected, disconnected, online = run(sockets, order)
+        results[name] = {
+            "connectsPerSecond": round(args.connections / connected),
+            "disconnectsPerSecond": round(args.connections / disconnected),
+            "onlineCounted": online
+        }
+    print(json.dumps({"connections": args.connections, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Upload/download throughput of each storage backend.
+
+    python -m benchmarks.storage_throughput --size-mb 256 --runs 3
+
+Writes a random blob through the same streaming path uploads use, reads
+it back through the backend reader, then deletes it. GridFS needs the
+MONGO_URI / MONGO_DB_NAME of a test database; the local backend writes
+under LOCAL_STORAGE_ROOT.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from app.storage import get_backend
+from app.utils.file_utils import stream_to_storage, UPLOAD_READ_SIZE
+
+
+async def random_chunks(size):
+    block = os.urandom(UPLOAD_READ_SIZE)
+    remaining = size
+    while remaining > 0:
+        yield block[:min(remaining, len(block))]
+        remaining -= len(block)
+
+
+async def run_backend(name, size, runs):
+    storage = get_backend(name)
+    results = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        stored = await stream_to_storage(storage, random_chunks(size), "benchmark.bin")
+        blob_id, written = stored["blobId"], stored["size"]
+        upload_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        reader = await storage.open_reader(blob_id)
+        read = 0
+        async for chunk in reader.iter_range(0, reader.length - 1):
+            read += len(chunk)
+        download_seconds = time.perf_counter() - started
+
+        await storage.delete(blob_id)
+        assert read == written == size
+        results.append({
+            "upload_mb_s": size / upload_seconds / 2**20,
+            "download_mb_s": size / download_seconds / 2**20
+        })
+
+    return {
+        "backend": name,
+        "size_mb": size / 2**20,
+        "runs": results,
+        "best_upload_mb_s": max(r["upload_mb_s"] for r in results),
+        "best_download_mb_s": max(r["download_mb_s"] for r in results)
+    }
+
+
+async def main(args):
+    report = [await run_backend(name, args.size_mb * 2**20, args.runs) for name in args.backends]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", default=["gridfs", "local"], choices=["gridfs", "local"])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,122 @@
+"""Peak memory of concurrent large uploads.
+
+    python -m benchmarks.upload_memory
+    python -m benchmarks.upload_memory --uploads 8 --size-mb 512 --backend gridfs
+
+Streams several large files at once through the upload path
+(iter_upload_file over an UploadFile, into stream_to_storage) and checks
+that the process's peak RSS grows by no more than --max-growth-mb,
+however large the files are: memory per upload is a few read buffers, not
+the file. Exits non-zero if the bound is exceeded or a blob comes back
+with the wrong size or hash.
+
+The files are read from one temporary file on disk, as a spooled multipart
+upload would be. The local backend writes under a temporary directory;
+GridFS needs the MONGO_URI / MONGO_DB_NAME of a test database.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from starlette.datastructures import UploadFile
+
+from app.storage import get_backend
+from app.storage.local_storage import LocalStorage
+from app.utils.file_utils import iter_upload_file, stream_to_storage, UPLOAD_READ_SIZE
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_source(path, size):
+    digest = hashlib.sha256()
+    block = os.urandom(UPLOAD_READ_SIZE)
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            data = block[:min(remaining, len(block))]
+            f.write(data)
+            digest.update(data)
+            remaining -= len(data)
+    return digest.hexdigest()
+
+
+async def upload(storage, path, index, content_type):
+    with open(path, "rb") as f:
+        file = UploadFile(f, filename=f"upload-{index}.bin")
+        return await stream_to_storage(storage, iter_upload_file(file), file.filename, content_type)
+
+
+async def run(storage, path, uploads, content_type):
+    started = time.perf_counter()
+    results = await asyncio.gather(*(upload(storage, path, index, content_type) for index in range(uploads)))
+    elapsed = time.perf_counter() - started
+    for stored in results:
+        await storage.delete(stored["blobId"])
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=4, help="files uploaded at once")
+    parser.add_argument("--size-mb", type=int, default=256, help="size of each file")
+    parser.add_argument("--backend", choices=["local", "gridfs"], default="local")
+    parser.add_argument("--content-type", default="application/octet-stream")
+    parser.add_argument("--max-growth-mb", type=float, default=64, help="allowed growth of peak RSS over the baseline")
+    parser.add_argument("--output", help="also write the JSON result here")
+    args = parser.parse_args()
+
+    size = args.size_mb * 2**20
+    workdir = tempfile.mkdtemp(prefix="upload_memory_")
+    try:
+        source = os.path.join(workdir, "source.bin")
+        expected_hash = write_source(source, size)
+        if args.backend == "local":
+            storage = LocalStorage(os.path.join(workdir, "blobs"))
+        else:
+            storage = get_backend("gridfs")
+
+        baseline = peak_rss_mb()
+        results, elapsed = asyncio.run(run(storage, source, args.uploads, args.content_type))
+        peak = peak_rss_mb()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    growth = peak - baseline
+    intact = all(stored["size"] == size and stored["contentHash"] == expected_hash for stored in results)
+    report = {
+        "benchmark": "upload_memory",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "backend": args.backend,
+        "uploads": args.uploads,
+        "sizeMb": args.size_mb,
+        "totalMb": args.uploads * args.size_mb,
+        "throughputMbS": round(args.uploads * size / elapsed / 2**20, 1),
+        "baselineRssMb": round(baseline, 1),
+        "peakRssMb": round(peak, 1),
+        "growthMb": round(growth, 1),
+        "maxGrowthMb": args.max_growth_mb,
+        "intact": intact,
+        "ok": intact and growth <= args.max_growth_mb
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    if not report["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,21 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 import os
+import asyncio
 
 from app.db.connection import db
+from app.db.indexes import ensure_indexes
 from app.routes.file_services import file_engine
-from app.routes.chat_services import chat_engine
+from app.routes.chat_services import chat_engine, manager as chat_manager, message_writer as chat_writer
 from app.routes.auth import file_engine as auth_engine
 from app.routes.group_services import group_engine
 from app.routes.user_services import file_engine as user_services_engine
+from app.utils.upload_sessions import run_upload_session_cleanup
+from app.utils.previews import shutdown_preview_pool
 import secrets
+from typing import Optional
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, paginate, page_response
 
 app = FastAPI()
 
@@ -30,6 +36,26 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def start_background_jobs():
+    # Missing or clashing indexes slow queries down but don't stop the app;
+    # scripts/manage_indexes.py repairs them
+    for collection, problems in (await ensure_indexes(db)).items():
+        for name, issues in problems.items():
+            print(f"Index {collection}.{name}: {'; '.join(issues)}")
+    app.state.upload_cleanup_task = asyncio.create_task(run_upload_session_cleanup(db))
+    app.state.chat_task = asyncio.create_task(chat_manager.run())
+    chat_writer.start()
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    app.state.upload_cleanup_task.cancel()
+    await chat_manager.close()
+    app.state.chat_task.cancel()
+    await chat_writer.close()
+    shutdown_preview_pool()
+
+
 @app.get('/hello')
 def hello_world():
     return {"test_msg": "Hello world!"}
@@ -40,9 +66,17 @@ async def list_collections():
     return {"collections": collection_names}
 
 @app.get("/users")
-async def list_users():
-    users = await db.user.find().to_list(length=None)
-    return {"users": users}
+async def list_users(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    match = {}
+    position = decode_cursor(cursor)
+    if position is not None:
+        match["_id"] = {"$gt": position.get("id")}
+    users = await db.user.find(match).sort("_id", 1).to_list(length=limit + 1)
+    page, next_cursor = paginate(users, limit, lambda doc: {"id": doc["_id"]})
+    return page_response(page, next_cursor)
 # ✅ Include all routers
 app.include_router(file_engine)
 app.include_router(chat_engine)
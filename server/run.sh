@@ -1,3 +1,4 @@
 #!/bin/bash
 set -e
-uvicorn main:app --host 0.0.0.0 --port 8000 --reload
\ No newline at end of file
+# CHAT_WS_DEFLATE=false turns off permessage-deflate on websockets
+uvicorn main:app --host 0.0.0.0 --port 8000 --reload --ws-per-message-deflate "${CHAT_WS_DEFLATE:-true}"
\ No newline at end of file
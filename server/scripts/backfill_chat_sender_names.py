@@ -0,0 +1,49 @@
+"""Write senderName onto chat messages saved before it was stored.
+
+    python -m scripts.backfill_chat_sender_names
+
+Reads the messages without a name once and updates each by _id, looking up
+each sender's name the first time it is seen. Messages from users that no
+longer exist get "Anonymous", which is what history showed for them anyway.
+"""
+import asyncio
+
+from pymongo import UpdateOne
+
+from app.db.connection import db
+
+BATCH_SIZE = 500
+
+
+async def write_batch(batch, names):
+    missing = list({doc["senderId"] for doc in batch} - names.keys())
+    if missing:
+        found = {
+            doc["_id"]: doc.get("name")
+            async for doc in db.user.find({"_id": {"$in": missing}}, {"name": 1})
+        }
+        names.update({sender_id: found.get(sender_id) or "Anonymous" for sender_id in missing})
+    result = await db.chat.bulk_write([
+        UpdateOne({"_id": doc["_id"]}, {"$set": {"senderName": names[doc["senderId"]]}})
+        for doc in batch
+    ], ordered=False)
+    return result.modified_count
+
+
+async def main():
+    names = {}
+    updated = 0
+    batch = []
+    async for doc in db.chat.find({"senderName": {"$in": [None, ""]}}, {"senderId": 1}):
+        doc.setdefault("senderId", None)
+        batch.append(doc)
+        if len(batch) >= BATCH_SIZE:
+            updated += await write_batch(batch, names)
+            batch = []
+    if batch:
+        updated += await write_batch(batch, names)
+    print(f"updated {updated} messages from {len(names)} senders")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,29 @@
+"""Fill in the name search fields on files uploaded before they existed.
+
+    python -m scripts.backfill_file_search
+"""
+import asyncio
+
+from pymongo import UpdateOne
+
+from app.db.connection import db
+from app.utils.file_search import name_search_fields
+
+BATCH_SIZE = 500
+
+
+async def main():
+    updated = 0
+    batch = []
+    async for doc in db.files.find({"nameGrams": {"$exists": False}}, {"name": 1}):
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": name_search_fields(doc["name"])}))
+        if len(batch) >= BATCH_SIZE:
+            updated += (await db.files.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        updated += (await db.files.bulk_write(batch, ordered=False)).modified_count
+    print(f"updated {updated} files")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
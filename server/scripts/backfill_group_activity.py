@@ -0,0 +1,35 @@
+"""Set lastActivityAt on groups created before it was maintained.
+
+    python -m scripts.backfill_group_activity
+
+Takes the newest activity of each group, falling back to the group's
+createdAt. Uses $max, so it is safe to run while the app is writing.
+"""
+import asyncio
+
+from app.db.connection import db
+
+
+async def main():
+    latest = db.activities.aggregate([
+        {"$group": {"_id": "$groupId", "at": {"$max": "$timestamp"}}}
+    ])
+    updated = 0
+    async for doc in latest:
+        if doc["_id"] is None or doc["at"] is None:
+            continue
+        result = await db.group.update_one({"_id": doc["_id"]}, {"$max": {"lastActivityAt": doc["at"]}})
+        updated += result.modified_count
+
+    # Groups without any activity at all
+    async for group in db.group.find({"lastActivityAt": {"$exists": False}}, {"createdAt": 1}):
+        result = await db.group.update_one(
+            {"_id": group["_id"], "lastActivityAt": {"$exists": False}},
+            {"$set": {"lastActivityAt": group["createdAt"]}}
+        )
+        updated += result.modified_count
+    print(f"updated {updated} groups")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,34 @@
+"""Render previews for files uploaded before previews existed.
+
+    python -m scripts.backfill_previews
+"""
+import asyncio
+
+from app.db.connection import db
+from app.utils.previews import IMAGE_TYPES, PDF_TYPE, PREVIEW_WORKERS, MAX_SOURCE_SIZE, generate_preview, shutdown_preview_pool
+
+
+async def main():
+    query = {
+        "preview": {"$exists": False},
+        "contentType": {"$in": sorted(IMAGE_TYPES) + [PDF_TYPE]},
+        "size": {"$lte": MAX_SOURCE_SIZE}
+    }
+    pending = set()
+    done = 0
+    try:
+        async for doc in db.files.find(query, {"_id": 1}):
+            pending.add(asyncio.create_task(generate_preview(db, doc["_id"])))
+            if len(pending) >= PREVIEW_WORKERS * 2:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                done += len(finished)
+        if pending:
+            await asyncio.wait(pending)
+            done += len(pending)
+    finally:
+        shutdown_preview_pool()
+    print(f"processed {done} files")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,24 @@
+"""Set storedBytes on users and groups created before it was maintained.
+
+    python -m scripts.backfill_stored_bytes
+
+Starts it from storageUsed, like the upload and delete paths do for any
+document they touch first (app.utils.file_utils.seed_stored_bytes). Only
+documents still without it are written, so it is safe to run while the app
+is writing.
+"""
+import asyncio
+
+from app.db.connection import db
+
+SEED = [{"$set": {"storedBytes": {"$toLong": {"$ifNull": ["$storageUsed", 0]}}}}]
+
+
+async def main():
+    for collection in (db.user, db.group):
+        result = await collection.update_many({"storedBytes": {"$exists": False}}, SEED)
+        print(f"{collection.name}: updated {result.modified_count}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
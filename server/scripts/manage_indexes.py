@@ -0,0 +1,64 @@
+"""Create and check the indexes registered in app.db.indexes.
+
+    python -m scripts.manage_indexes apply
+    python -m scripts.manage_indexes apply --drop-conflicting
+    python -m scripts.manage_indexes verify
+    python -m scripts.manage_indexes list
+
+`apply` does what app startup does: creates whatever is missing. With
+--drop-conflicting it also rebuilds indexes whose name or keys clash with a
+different definition (on a large collection, run it off-peak). `verify`
+changes nothing. Both exit non-zero if anything is still missing or
+different. `list` prints the registry next to what the database has,
+including indexes the registry doesn't know about.
+"""
+import argparse
+import asyncio
+import sys
+
+from app.db.connection import db
+from app.db.indexes import INDEXES, ensure_indexes, verify_indexes
+
+
+def print_report(report):
+    for collection, problems in report.items():
+        for name, issues in problems.items():
+            print(f"{collection}.{name}: {'; '.join(issues)}")
+    if not report:
+        print("all registered indexes are in place")
+
+
+async def list_indexes():
+    collections = set(INDEXES) | set(await db.list_collection_names())
+    for collection in sorted(collections):
+        registered = {index.document["name"] for index in INDEXES.get(collection, [])}
+        existing = {doc["name"]: doc async for doc in db[collection].list_indexes()}
+        print(collection)
+        for name in sorted(registered | set(existing)):
+            if name in existing:
+                state = "registered" if name in registered else "unregistered"
+                print(f"  {name} {dict(existing[name]['key'])} ({state})")
+            else:
+                print(f"  {name} (missing)")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["apply", "verify", "list"])
+    parser.add_argument("--drop-conflicting", action="store_true", help="apply: rebuild indexes defined differently")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        await list_indexes()
+        return
+    if args.command == "apply":
+        report = await ensure_indexes(db, drop_conflicting=args.drop_conflicting)
+    else:
+        report = await verify_indexes(db)
+    print_report(report)
+    if report:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
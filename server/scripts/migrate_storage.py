@@ -0,0 +1,141 @@
+"""Move stored file content from one storage backend to another.
+
+    python -m scripts.migrate_storage --to local
+    python -m scripts.migrate_storage --to gridfs --limit 100 --dry-run
+
+Each blob is copied byte for byte (compressed content stays compressed),
+then read back from the target and checked: its content, inflated first if
+it is stored gzip-compressed, must hash to the blob's sha256 key. Only then
+are the `blobs` / `files` documents repointed in one transaction before the source copy is
+deleted. Safe to interrupt and re-run: anything already on the target is
+skipped.
+"""
+import argparse
+import asyncio
+import hashlib
+import sys
+
+from app.db.connection import db
+from app.storage import get_backend
+from app.utils.compression import iter_decompressed_range
+from app.utils.file_utils import stream_to_storage
+
+
+async def copy_blob(source, target, blob_id, filename):
+    """Copy the stored bytes as they are (compressed blobs stay compressed)."""
+    reader = await source.open_reader(blob_id)
+    stored = await stream_to_storage(target, reader.iter_range(0, reader.length - 1), filename)
+    if stored["size"] != reader.length:
+        await target.delete(stored["blobId"])
+        raise ValueError(f"short copy of blob {blob_id}")
+    return stored
+
+
+async def content_hash(storage, blob_id, compression):
+    """SHA-256 and length of the content a stored blob holds, inflating
+    gzip-compressed blobs, as downloads would."""
+    reader = await storage.open_reader(blob_id)
+    chunks = reader.iter_range(0, reader.length - 1)
+    if compression == "gzip":
+        chunks = iter_decompressed_range(chunks, 0, sys.maxsize)
+    digest = hashlib.sha256()
+    size = 0
+    async for chunk in chunks:
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+async def migrate_shared_blob(source, target, blob_doc):
+    old_id = blob_doc["GridFSId"]
+    new_id = (await copy_blob(source, target, old_id, blob_doc["_id"]))["blobId"]
+    # Blobs are keyed by the hash of their content, compressed or not
+    try:
+        digest, size = await content_hash(target, new_id, blob_doc.get("compression"))
+    except Exception:
+        await target.delete(new_id)
+        raise
+    if digest != blob_doc["_id"] or ("size" in blob_doc and size != blob_doc["size"]):
+        await target.delete(new_id)
+        raise ValueError(f"content mismatch for blob {blob_doc['_id']}")
+
+    try:
+        async with await db.client.start_session() as session:
+            async with session.start_transaction():
+                await db.blobs.update_one(
+                    {"_id": blob_doc["_id"], "GridFSId": old_id},
+                    {"$set": {"GridFSId": new_id, "storage": target.name}},
+                    session=session
+                )
+                await db.files.update_many(
+                    {"contentHash": blob_doc["_id"], "GridFSId": old_id},
+                    {"$set": {"GridFSId": new_id, "storage": target.name}},
+                    session=session
+                )
+    except Exception:
+        await target.delete(new_id)
+        raise
+
+    await source.delete(old_id)
+
+
+async def migrate_legacy_file(source, target, file_doc):
+    old_id = file_doc["GridFSId"]
+    new_id = (await copy_blob(source, target, old_id, file_doc["name"]))["blobId"]
+    try:
+        await db.files.update_one(
+            {"_id": file_doc["_id"], "GridFSId": old_id},
+            {"$set": {"GridFSId": new_id, "storage": target.name}}
+        )
+    except Exception:
+        await target.delete(new_id)
+        raise
+
+    await source.delete(old_id)
+
+
+def on_backend(name):
+    # Documents written before backends existed have no `storage` field
+    if name == "gridfs":
+        return {"$in": ["gridfs", None]}
+    return name
+
+
+async def main(args):
+    source = get_backend(args.source)
+    target = get_backend(args.to)
+    migrated = failed = 0
+
+    blob_cursor = db.blobs.find({"storage": on_backend(source.name)})
+    legacy_cursor = db.files.find({"contentHash": None, "storage": on_backend(source.name)})
+
+    for cursor, migrate in ((blob_cursor, migrate_shared_blob), (legacy_cursor, migrate_legacy_file)):
+        async for doc in cursor:
+            if args.limit is not None and migrated + failed >= args.limit:
+                break
+            if args.dry_run:
+                print(f"would migrate {doc['_id']}")
+                migrated += 1
+                continue
+            try:
+                await migrate(source, target, doc)
+                migrated += 1
+            except Exception as e:
+                print(f"failed to migrate {doc['_id']}: {e}")
+                failed += 1
+
+    print(f"migrated {migrated}, failed {failed}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="source", default="gridfs", choices=["gridfs", "local"])
+    parser.add_argument("--to", required=True, choices=["gridfs", "local"])
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many blobs")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    if args.source == args.to:
+        parser.error("--from and --to must differ")
+    asyncio.run(main(args))
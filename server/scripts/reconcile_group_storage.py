@@ -0,0 +1,79 @@
+"""Rebuild the per-category storage counters of groups from their files.
+
+    python -m scripts.reconcile_group_storage
+    python -m scripts.reconcile_group_storage --group <groupId> --dry-run
+
+The counters under `frequency` on each group document are maintained
+incrementally by uploads and deletes (app.utils.group_utils). This recounts
+them from the files collection, for groups created before the counters
+existed or after a manual edit. Each group is recounted and written in one
+transaction, so an upload racing with it conflicts instead of being lost;
+re-run to pick up groups that reported an error.
+"""
+import argparse
+import asyncio
+
+from bson import Int64
+
+from app.db.connection import db
+from app.utils.group_utils import STORAGE_CATEGORIES, empty_frequency, storage_category
+
+
+async def count_group(group_id, session):
+    frequency = empty_frequency()
+    totals = db.files.aggregate([
+        {"$match": {"groupId": group_id}},
+        {"$group": {"_id": "$contentType", "count": {"$sum": 1}, "size": {"$sum": "$size"}}}
+    ], session=session)
+    async for row in totals:
+        counter = frequency[storage_category(row["_id"])]
+        counter["count"] = Int64(counter["count"] + row["count"])
+        counter["size"] = Int64(counter["size"] + row["size"])
+    return frequency
+
+
+def differs(current, frequency):
+    current = current or {}
+    return any(
+        (current.get(category) or {}).get(key, 0) != frequency[category][key]
+        for category in STORAGE_CATEGORIES
+        for key in ("count", "size")
+    )
+
+
+async def reconcile(group_id, dry_run):
+    async with await db.client.start_session() as session:
+        async with session.start_transaction():
+            group_doc = await db.group.find_one({"_id": group_id}, {"frequency": 1}, session=session)
+            if group_doc is None:
+                return False
+            frequency = await count_group(group_id, session)
+            if not differs(group_doc.get("frequency"), frequency):
+                return False
+            if not dry_run:
+                await db.group.update_one({"_id": group_id}, {"$set": {"frequency": frequency}}, session=session)
+            return True
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--group", help="only this group")
+    parser.add_argument("--dry-run", action="store_true", help="report groups that are off, change nothing")
+    args = parser.parse_args()
+
+    query = {"_id": args.group} if args.group else {}
+    checked = fixed = failed = 0
+    async for group_doc in db.group.find(query, {"_id": 1}):
+        checked += 1
+        try:
+            if await reconcile(group_doc["_id"], args.dry_run):
+                fixed += 1
+                print(f"{'would fix' if args.dry_run else 'fixed'} {group_doc['_id']}")
+        except Exception as e:
+            failed += 1
+            print(f"error on {group_doc['_id']}: {e}")
+    print(f"checked {checked} groups, {'off' if args.dry_run else 'fixed'} {fixed}, errors {failed}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())